@@ -26,24 +26,24 @@ def actualizar_paises_noticias():
     cursor = connection.cursor()
     
     try:
-        # Obtener todas las fuentes
-        cursor.execute("SELECT id, url FROM fuentes")
-        fuentes = cursor.fetchall()
-        
-        print(f"📋 Encontradas {len(fuentes)} fuentes")
+        # Recorrer las fuentes en streaming (cursor del servidor, otra conexión)
+        fuentes = db.iterar_consulta("SELECT id, url FROM fuentes ORDER BY id", como_dict=False)
         
+        revisadas = 0
         actualizadas = 0
         for fuente_id, url in fuentes:
+            revisadas += 1
             # Detectar país de la fuente
             pais = scraper._detectar_pais(url)
             
             if pais:
                 # Actualizar todas las noticias de esta fuente
+                pais_id = db._ids_dimension(cursor, 'paises', [pais])[pais]
                 cursor.execute("""
-                    UPDATE noticias 
-                    SET pais = %s 
-                    WHERE fuente_id = %s AND (pais IS NULL OR pais = '')
-                """, (pais, fuente_id))
+                    UPDATE noticias_usuario 
+                    SET pais_id = %s 
+                    WHERE fuente_id = %s AND pais_id IS NULL
+                """, (pais_id, fuente_id))
                 
                 count = cursor.rowcount
                 if count > 0:
@@ -55,16 +55,22 @@ def actualizar_paises_noticias():
 
 
         connection.commit()
-        print(f"\n✅ Actualización completada: {actualizadas} noticias actualizadas")
+        print(f"\n📋 Revisadas {revisadas} fuentes")
+        print(f"✅ Actualización completada: {actualizadas} noticias actualizadas")
         
         # Mostrar estadísticas
-        cursor.execute("SELECT pais, COUNT(*) FROM noticias WHERE pais IS NOT NULL GROUP BY pais ORDER BY COUNT(*) DESC")
-        stats = cursor.fetchall()
+        stats = db.iterar_consulta(
+            """
+            SELECT p.nombre, COUNT(*) FROM noticias_usuario nu
+            JOIN paises p ON p.id = nu.pais_id
+            GROUP BY p.nombre ORDER BY COUNT(*) DESC
+            """,
+            como_dict=False
+        )
         
-        if stats:
-            print("\n📊 Distribución de noticias por país:")
-            for pais, count in stats:
-                print(f"  {pais}: {count} noticias")
+        print("\n📊 Distribución de noticias por país:")
+        for pais, count in stats:
+            print(f"  {pais}: {count} noticias")
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request, Response
+from flask import Flask, jsonify, request, Response, g
 from flask_swagger_ui import get_swaggerui_blueprint
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
@@ -7,10 +7,14 @@ from scheduler import ScraperScheduler
 from estadisticas import Estadisticas
 from busqueda import BusquedaAvanzada
 from exportar import Exportador
+from borrado_noticias import BorradoNoticias
+from cliente_http import cliente_http
 from auth import AuthManager
 from payments import PaymentFactory, PaymentConfig
 from middleware import admin_required, get_user_info, verificar_limite_fuentes, verificar_limite_scraping
+from unidad_trabajo import registrar_unidad_trabajo
 import json
+import itertools
 from datetime import timedelta
 
 
@@ -25,6 +29,9 @@ CORS(app, resources={
     }
 })
 
+# Una sola conexión del pool por petición, devuelta en teardown_appcontext
+registrar_unidad_trabajo(app)
+
 # Configuración JWT
 app.config['JWT_SECRET_KEY'] = 'tu-super-secreto-cambiar-en-produccion-2025'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
@@ -38,6 +45,7 @@ scheduler = ScraperScheduler(scraper)
 estadisticas_module = Estadisticas()
 busqueda_module = BusquedaAvanzada()
 exportador = Exportador()
+borrado_noticias = BorradoNoticias(scraper.db)
 auth_manager = AuthManager()
 from chatbot import ChatBot
 chatbot_module = ChatBot(scraper.db)
@@ -98,7 +106,10 @@ def home():
                 'usuarios_recientes': 'GET /api/v1/admin/usuarios/recientes (requiere admin)',
                 'pagos_recientes': 'GET /api/v1/admin/pagos/recientes (requiere admin)',
                 'pagos_pendientes': 'GET /api/v1/admin/pagos/pendientes (requiere admin)',
-                'aprobar_pago': 'POST /api/v1/admin/pagos/{id}/aprobar (requiere admin)'
+                'aprobar_pago': 'POST /api/v1/admin/pagos/{id}/aprobar (requiere admin)',
+                'estado_pool': 'GET /api/v1/admin/db/pool (requiere admin)',
+                'consultas_sql': 'GET /api/v1/admin/db/consultas (requiere admin)',
+                'estado_http': 'GET /api/v1/admin/http (requiere admin)'
             },
             'scraping': {
                 'scrapear_ahora': 'POST /api/v1/scraping/ejecutar (requiere JWT)',
@@ -128,9 +139,12 @@ def home():
             'noticias': {
                 'listar_guardadas': 'GET /api/v1/noticias',
                 'listar_con_paginacion': 'GET /api/v1/noticias?limite=20&offset=0',
+                'listar_con_cursor': 'GET /api/v1/noticias?limite=20&paginacion=cursor (luego &cursor=<next_cursor>)',
                 'filtrar_categoria': 'GET /api/v1/noticias?categoria=Política',
                 'contar': 'GET /api/v1/noticias/contar',
-                'limpiar': 'DELETE /api/v1/noticias'
+                'facetas': 'GET /api/v1/noticias/facetas',
+                'limpiar': 'DELETE /api/v1/noticias',
+                'estado_limpieza': 'GET /api/v1/noticias/limpiar/{job_id}'
             },
             'categorias': {
                 'listar': 'GET /api/v1/categorias'
@@ -364,16 +378,26 @@ def ejecutar_scraping():
             noticias = scraper.scrape_todas_fuentes(limite, guardar, solo_activas=True, user_id=usuario_id)
             mensaje = 'Scraping completado de todas las fuentes'
         
-        cantidad_scrapeada = len(noticias)
-        if cantidad_scrapeada > 0:
-            scraper.db.incrementar_scraping_diario(usuario_id, cantidad_scrapeada)
-            print(f"📊 Contador actualizado: +{cantidad_scrapeada} noticias para usuario {usuario_id}")
+        estados = [n.get('estado_guardado') for n in noticias]
+        resumen_guardado = {
+            'insertadas': estados.count('insertada'),
+            'actualizadas': estados.count('actualizada'),
+            'sin_cambios': estados.count('sin_cambios')
+        }
+        
+        # La cuota se reservó en el decorador; aquí solo se informa lo usado.
+        # Al guardar, solo cuentan las noticias nuevas o que cambiaron
+        if guardar:
+            g.scraping_usado = resumen_guardado['insertadas'] + resumen_guardado['actualizadas']
+        else:
+            g.scraping_usado = len(noticias)
         
         return jsonify({
             'success': True,
             'mensaje': mensaje,
             'total_noticias': len(noticias),
             'guardadas_en_bd': guardar,
+            'resumen_guardado': resumen_guardado,
             'usuario_id': usuario_id,
             'noticias': noticias
         }), 200
@@ -429,12 +453,29 @@ def obtener_noticias():
         - fuente_id: ID de fuente específica (opcional)
         - categoria: filtrar por categoría (opcional)
         - pais: filtrar por país (opcional)
+        - paginacion: 'offset' (default) o 'cursor'
+        - cursor: valor de next_cursor de la página anterior (activa el modo cursor)
+        - conteo: cómo calcular total: 'exacto' (default), 'estimado' (planner) o 'cache' (contadores)
+    
+    En modo cursor la respuesta incluye next_cursor (null en la última página)
+    y cada página cuesta lo mismo sin importar la profundidad. El total solo
+    se calcula en modo cursor si se pide explícitamente con `conteo`.
     """
     limite = request.args.get('limite', default=50, type=int)
     offset = request.args.get('offset', default=0, type=int)
     fuente_id = request.args.get('fuente_id', type=int)
     categoria = request.args.get('categoria', type=str)
     pais = request.args.get('pais', type=str)
+    cursor = request.args.get('cursor', type=str)
+    modo_cursor = cursor is not None or request.args.get('paginacion', type=str) == 'cursor'
+    conteo = request.args.get('conteo', type=str)
+    
+    if conteo is not None and conteo not in scraper.db.ESTRATEGIAS_CONTEO:
+        return jsonify({
+            'success': False,
+            'error': f'Estrategia de conteo inválida. Opciones: {", ".join(scraper.db.ESTRATEGIAS_CONTEO)}',
+            'noticias': []
+        }), 400
     
     usuario_id = None
     es_admin = False
@@ -448,6 +489,41 @@ def obtener_noticias():
         pass
     
     try:
+        if modo_cursor:
+            try:
+                noticias, next_cursor = scraper.obtener_noticias_por_cursor(
+                    limite=limite,
+                    cursor=cursor or None,
+                    fuente_id=fuente_id,
+                    categoria=categoria,
+                    pais=pais,
+                    user_id=usuario_id,
+                    es_admin=es_admin
+                )
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e),
+                    'noticias': []
+                }), 400
+            
+            respuesta = {
+                'success': True,
+                'paginacion': 'cursor',
+                'limite': limite,
+                'next_cursor': next_cursor,
+                'tiene_mas': next_cursor is not None,
+                'mensaje': 'Noticias obtenidas desde la base de datos',
+                'noticias': noticias
+            }
+            if conteo:
+                respuesta['conteo'] = conteo
+                respuesta['total'] = scraper.db.contar_noticias_filtradas(
+                    conteo, fuente_id, categoria, pais, usuario_id, es_admin
+                )
+            return jsonify(respuesta), 200
+        
+        conteo = conteo or 'exacto'
         noticias, total = scraper.obtener_noticias_guardadas(
             limite=limite,
             offset=offset,
@@ -455,12 +531,14 @@ def obtener_noticias():
             categoria=categoria,
             pais=pais,
             user_id=usuario_id,
-            es_admin=es_admin
+            es_admin=es_admin,
+            conteo=conteo
         )
         
         return jsonify({
             'success': True,
             'total': total,
+            'conteo': conteo,
             'limite': limite,
             'offset': offset,
             'total_paginas': (total + limite - 1) // limite if limite > 0 else 0,
@@ -481,6 +559,53 @@ def obtener_noticias():
             'total': 0
         }), 500
 
+@app.route('/api/v1/noticias/facetas', methods=['GET'])
+@jwt_required(optional=True)
+def obtener_facetas_noticias():
+    """
+    Conteos por fuente, categoría y país para los filtros del listado de noticias
+    🔐 Si hay JWT, cuenta las noticias del usuario. Admin ve todas.
+    
+    Query params (los mismos filtros que GET /api/v1/noticias):
+        - fuente_id, categoria, pais
+    
+    Cada faceta respeta los demás filtros pero no el suyo (muestra las alternativas).
+    """
+    fuente_id = request.args.get('fuente_id', type=int)
+    categoria = request.args.get('categoria', type=str)
+    pais = request.args.get('pais', type=str)
+    
+    usuario_id = None
+    es_admin = False
+    try:
+        usuario_id = get_jwt_identity()
+        from flask_jwt_extended import get_jwt
+        claims = get_jwt()
+        rol = claims.get('rol', 'usuario')
+        es_admin = (rol == 'admin')
+    except:
+        pass
+    
+    try:
+        facetas = scraper.db.obtener_facetas_noticias(
+            fuente_id=fuente_id,
+            categoria=categoria,
+            pais=pais,
+            user_id=usuario_id,
+            es_admin=es_admin
+        )
+        return jsonify({
+            'success': True,
+            'filtros': {'fuente_id': fuente_id, 'categoria': categoria, 'pais': pais},
+            **facetas
+        }), 200
+    except Exception as e:
+        print(f"❌ Error obteniendo facetas: {e}")
+        return jsonify({
+            'error': 'Error obteniendo facetas',
+            'detalle': str(e)
+        }), 500
+
 @app.route('/api/v1/noticias/contar', methods=['GET'])
 def contar_noticias():
     """Cuenta el total de noticias en la BD"""
@@ -499,7 +624,10 @@ def contar_noticias():
 @app.route('/api/v1/noticias', methods=['DELETE'])
 @jwt_required()
 def limpiar_noticias():
-    """Elimina noticias de la BD (del usuario autenticado o todas si es admin)"""
+    """
+    Lanza el borrado por lotes en segundo plano (del usuario autenticado o todas si es admin).
+    Responde 202 con el job_id para consultar el progreso.
+    """
     try:
         usuario_id = get_jwt_identity()
         from flask_jwt_extended import get_jwt
@@ -507,20 +635,40 @@ def limpiar_noticias():
         rol = claims.get('rol', 'usuario')
         es_admin = (rol == 'admin')
         
-        scraper.limpiar_noticias(user_id=usuario_id, es_admin=es_admin)
+        trabajo = borrado_noticias.iniciar(user_id=usuario_id, es_admin=es_admin)
         
-        mensaje = 'Todas las noticias han sido eliminadas' if es_admin else 'Tus noticias han sido eliminadas'
+        mensaje = 'Eliminando todas las noticias' if es_admin else 'Eliminando tus noticias'
         
         return jsonify({
             'success': True,
-            'mensaje': mensaje
-        }), 200
+            'mensaje': mensaje,
+            'job_id': trabajo['id'],
+            'estado': trabajo['estado'],
+            'progreso': f"/api/v1/noticias/limpiar/{trabajo['id']}"
+        }), 202
     except Exception as e:
         return jsonify({
             'error': 'Error limpiando noticias',
             'detalle': str(e)
         }), 500
 
+@app.route('/api/v1/noticias/limpiar/<job_id>', methods=['GET'])
+@jwt_required()
+def estado_limpieza_noticias(job_id):
+    """Progreso de un borrado de noticias (solo su dueño o un admin)"""
+    usuario_id = get_jwt_identity()
+    from flask_jwt_extended import get_jwt
+    es_admin = get_jwt().get('rol', 'usuario') == 'admin'
+    
+    trabajo = borrado_noticias.obtener(job_id)
+    if not trabajo or (not es_admin and str(trabajo['user_id']) != str(usuario_id)):
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify({
+        'success': True,
+        'trabajo': trabajo
+    }), 200
+
 # ==================== ENDPOINTS DE CATEGORIAS ====================
 
 @app.route('/api/v1/categorias', methods=['GET'])
@@ -1236,34 +1384,45 @@ def exportar_noticias():
         pass
     
     try:
-        noticias, total = scraper.obtener_noticias_guardadas(
-            limite=limite,
-            offset=0,
+        # Lectura en streaming (cursor del servidor): la exportación no carga todo en memoria
+        noticias = scraper.db.iterar_noticias(
             fuente_id=fuente_id,
             user_id=usuario_id,
-            es_admin=es_admin
+            es_admin=es_admin,
+            limite=limite
         )
         
-        if not noticias or len(noticias) == 0:
+        primera = next(noticias, None)
+        if primera is None:
             return jsonify({
                 'error': 'No hay noticias para exportar'
             }), 404
+        noticias = itertools.chain([primera], noticias)
+        
+        def cortar_si_falla(partes):
+            # Un error a mitad del streaming corta la respuesta (sin el chunk final),
+            # así el cliente no recibe como completo un archivo truncado
+            try:
+                yield from partes
+            except Exception as e:
+                print(f"❌ Exportación interrumpida: {e}")
+                raise
         
         if formato == 'csv':
-            contenido = exportador.exportar_csv(noticias)
+            contenido = exportador.generar_csv(noticias)
             mimetype = 'text/csv'
             extension = 'csv'
         elif formato == 'json':
-            contenido = exportador.exportar_json(noticias)
+            contenido = exportador.generar_json(noticias)
             mimetype = 'application/json'
             extension = 'json'
         else:
-            contenido = exportador.exportar_txt(noticias)
+            contenido = exportador.generar_txt(noticias)
             mimetype = 'text/plain'
             extension = 'txt'
         
         return Response(
-            contenido,
+            cortar_si_falla(contenido),
             mimetype=mimetype,
             headers={
                 'Content-Disposition': f'attachment; filename=noticias.{extension}'
@@ -1845,26 +2004,27 @@ def admin_aprobar_pago(pago_id):
         
         # Crear/actualizar suscripción
         from datetime import datetime, timedelta
-        connection = scraper.db.get_connection()
-        cursor = connection.cursor()
-        
         fecha_inicio = datetime.now()
         fecha_vencimiento = fecha_inicio + timedelta(days=365)
         
-        cursor.execute("""
-            INSERT INTO suscripciones (user_id, plan_id, fecha_inicio, fecha_vencimiento, activo, cancelado)
-            VALUES (%s, %s, %s, %s, TRUE, FALSE)
-            ON CONFLICT (user_id) DO UPDATE
-            SET plan_id = EXCLUDED.plan_id,
-                fecha_inicio = EXCLUDED.fecha_inicio,
-                fecha_vencimiento = EXCLUDED.fecha_vencimiento,
-                activo = TRUE,
-                cancelado = FALSE
-        """, (pago['user_id'], pago['plan_id'], fecha_inicio, fecha_vencimiento))
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with scraper.db.conexion() as connection:
+            cursor = connection.cursor()
+            
+            cursor.execute("""
+                INSERT INTO suscripciones (user_id, plan_id, fecha_inicio, fecha_vencimiento, activo, cancelado)
+                VALUES (%s, %s, %s, %s, TRUE, FALSE)
+                ON CONFLICT (user_id) DO UPDATE
+                SET plan_id = EXCLUDED.plan_id,
+                    fecha_inicio = EXCLUDED.fecha_inicio,
+                    fecha_vencimiento = EXCLUDED.fecha_vencimiento,
+                    activo = TRUE,
+                    cancelado = FALSE
+            """, (pago['user_id'], pago['plan_id'], fecha_inicio, fecha_vencimiento))
+            
+            connection.commit()
+            cursor.close()
+        
+        scraper.db.invalidar_cache_planes(pago['user_id'])
         
         print(f"✅ Admin {usuario_id} aprobó pago {pago_id} para usuario {pago['user_id']}")
         
@@ -1882,6 +2042,75 @@ def admin_aprobar_pago(pago_id):
             'detalle': str(e)
         }), 500
 
+@app.route('/api/v1/admin/db/pool', methods=['GET'])
+@admin_required
+def admin_estado_pool():
+    """🔌 Estado del pool de conexiones a PostgreSQL (SOLO ADMIN)"""
+    try:
+        return jsonify({
+            'success': True,
+            'pool': scraper.db.estadisticas_pool(),
+            'cache_planes': scraper.db.estadisticas_cache_planes()
+        }), 200
+    except Exception as e:
+        print(f"❌ Error obteniendo estado del pool: {e}")
+        return jsonify({
+            'error': 'Error obteniendo estado del pool',
+            'detalle': str(e)
+        }), 500
+
+@app.route('/api/v1/admin/http', methods=['GET'])
+@admin_required
+def admin_estado_http():
+    """🌐 Conexiones HTTP del scraping: reutilización, tiempo de conexión y caché de DNS (SOLO ADMIN)"""
+    try:
+        return jsonify({
+            'success': True,
+            'http': cliente_http.estadisticas()
+        }), 200
+    except Exception as e:
+        print(f"❌ Error obteniendo estado HTTP: {e}")
+        return jsonify({
+            'error': 'Error obteniendo estado HTTP',
+            'detalle': str(e)
+        }), 500
+
+@app.route('/api/v1/admin/db/consultas', methods=['GET'])
+@admin_required
+def admin_estadisticas_consultas():
+    """
+    ⏱️ Tiempos por consulta SQL y consultas lentas de este proceso (SOLO ADMIN)
+    
+    Query params:
+        - orden: total_ms (default), promedio_ms, max_ms, llamadas, filas, lentas, errores
+        - limite: cuántas consultas devolver (default: 20)
+    """
+    orden = request.args.get('orden', default='total_ms')
+    limite = request.args.get('limite', default=20, type=int)
+    try:
+        return jsonify({
+            'success': True,
+            **scraper.db.estadisticas_consultas(orden, limite)
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error obteniendo estadísticas de consultas: {e}")
+        return jsonify({
+            'error': 'Error obteniendo estadísticas de consultas',
+            'detalle': str(e)
+        }), 500
+
+@app.route('/api/v1/admin/db/consultas', methods=['DELETE'])
+@admin_required
+def admin_reiniciar_consultas():
+    """Reinicia las estadísticas de consultas (p.ej. antes de medir un cambio)"""
+    scraper.db.reiniciar_estadisticas_consultas()
+    return jsonify({
+        'success': True,
+        'mensaje': 'Estadísticas de consultas reiniciadas'
+    }), 200
+
 # ==================== MANEJADORES DE ERRORES JWT ====================
 
 @jwt.expired_token_loader
@@ -0,0 +1,116 @@
+"""
+Borrado de noticias en segundo plano
+Elimina por lotes acotados (transacciones cortas) con una pausa entre lotes,
+para no retener locks ni generar picos de WAL, y expone el progreso por job_id.
+El registro de trabajos es en memoria: es por proceso y se pierde al reiniciar.
+Los trabajos terminados se consultan durante `retencion` segundos y luego se descartan.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from database import Database
+
+
+class BorradoNoticias:
+    """
+    Args:
+        db: Instancia de Database
+        tamano_lote: Noticias borradas por transacción
+        pausa: Segundos de espera entre lotes
+        retencion: Segundos que se conserva un trabajo terminado
+    """
+
+    def __init__(self, db: Database, tamano_lote: int = 5000, pausa: float = 0.2, retencion: float = 3600):
+        self.db = db
+        self.tamano_lote = tamano_lote
+        self.pausa = pausa
+        self.retencion = retencion
+        self.trabajos: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, user_id: Optional[int] = None, es_admin: bool = False) -> Dict:
+        """
+        Lanza el borrado y retorna el trabajo sin esperar a que termine.
+        Si ya hay uno en curso con el mismo alcance, retorna ese.
+        """
+        alcance = 'todas' if es_admin else f"usuario:{user_id}"
+
+        with self._lock:
+            self._purgar_finalizados()
+            for trabajo in self.trabajos.values():
+                if trabajo['alcance'] == alcance and trabajo['estado'] in ('pendiente', 'en_progreso'):
+                    return dict(trabajo)
+
+            try:
+                total_estimado = self.db.contar_noticias_filtradas('cache', user_id=user_id, es_admin=es_admin)
+            except Exception:
+                total_estimado = None
+
+            trabajo = {
+                'id': uuid.uuid4().hex,
+                'estado': 'pendiente',
+                'alcance': alcance,
+                'user_id': user_id,
+                'total_estimado': total_estimado,
+                'borradas': 0,
+                'articulos_purgados': 0,
+                'lotes': 0,
+                'iniciado': datetime.now().isoformat(),
+                'finalizado': None,
+                'error': None
+            }
+            self.trabajos[trabajo['id']] = trabajo
+
+        hilo = threading.Thread(
+            target=self._ejecutar,
+            args=(trabajo['id'], user_id, es_admin),
+            name=f"borrado-{trabajo['id'][:8]}",
+            daemon=True
+        )
+        hilo.start()
+        return dict(trabajo)
+
+    def obtener(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._purgar_finalizados()
+            trabajo = self.trabajos.get(job_id)
+            return dict(trabajo) if trabajo else None
+
+    def _purgar_finalizados(self):
+        """Descarta los trabajos terminados hace más de `retencion` segundos (llamar con el lock)"""
+        limite = (datetime.now() - timedelta(seconds=self.retencion)).isoformat()
+        vencidos = [
+            job_id for job_id, trabajo in self.trabajos.items()
+            if trabajo['finalizado'] and trabajo['finalizado'] < limite
+        ]
+        for job_id in vencidos:
+            del self.trabajos[job_id]
+
+    def _actualizar(self, job_id: str, **cambios):
+        with self._lock:
+            self.trabajos[job_id].update(cambios)
+
+    def _ejecutar(self, job_id: str, user_id: Optional[int], es_admin: bool):
+        self._actualizar(job_id, estado='en_progreso')
+        print(f"🗑️  Borrado {job_id[:8]} iniciado ({self.trabajos[job_id]['alcance']})")
+
+        try:
+            while True:
+                resultado = self.db.borrar_noticias_lote(user_id, es_admin, self.tamano_lote)
+                with self._lock:
+                    trabajo = self.trabajos[job_id]
+                    trabajo['borradas'] += resultado['borradas']
+                    trabajo['articulos_purgados'] += resultado['articulos_purgados']
+                    trabajo['lotes'] += 1
+                if resultado['borradas'] < self.tamano_lote:
+                    break
+                time.sleep(self.pausa)
+
+            self._actualizar(job_id, estado='completado', finalizado=datetime.now().isoformat())
+            print(f"✅ Borrado {job_id[:8]} completado: {self.trabajos[job_id]['borradas']} noticias")
+        except Exception as e:
+            print(f"❌ Error en borrado {job_id[:8]}: {e}")
+            self._actualizar(job_id, estado='error', error=str(e), finalizado=datetime.now().isoformat())
@@ -26,7 +26,7 @@ class BusquedaAvanzada:
             limite: Número máximo de resultados
             orden: Orden de resultados (ASC o DESC)
         """
-        connection = self.db.get_connection()
+        connection = self.db.get_connection(lectura=True)
         if not connection:
             return []
         
@@ -67,12 +67,13 @@ class BusquedaAvanzada:
         
         # Filtro por fecha desde
         if fecha_desde:
-            sql_query += " AND DATE(n.fecha_scraping) >= %s"
+            # Rango sobre la columna (no DATE(columna)) para usar índices y particiones
+            sql_query += " AND n.fecha_scraping >= %s::date"
             parametros.append(fecha_desde)
         
         # Filtro por fecha hasta
         if fecha_hasta:
-            sql_query += " AND DATE(n.fecha_scraping) <= %s"
+            sql_query += " AND n.fecha_scraping < %s::date + 1"
             parametros.append(fecha_hasta)
         
         # Orden y límite
@@ -106,7 +107,7 @@ class BusquedaAvanzada:
     
     def buscar_por_palabras_clave(self, palabras: List[str], limite: int = 50) -> List[Dict]:
         """Busca noticias que contengan cualquiera de las palabras clave"""
-        connection = self.db.get_connection()
+        connection = self.db.get_connection(lectura=True)
         if not connection:
             return []
         
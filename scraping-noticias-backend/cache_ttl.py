@@ -0,0 +1,97 @@
+"""
+Caché en memoria con expiración (TTL)
+Para datos que cambian poco y se leen en casi cada petición (planes, suscripciones).
+Es por proceso: cada worker tiene la suya y el TTL acota cuánto puede quedar desactualizada.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable
+
+
+class CacheTTL:
+    """
+    Caché thread-safe con expiración por entrada e invalidación explícita.
+
+    Args:
+        ttl: Segundos que vive cada entrada
+        max_entradas: Tamaño máximo; al superarlo se descartan primero las vencidas y luego las más antiguas
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entradas: int = 10000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+        self._stats = {'aciertos': 0, 'fallos': 0, 'invalidaciones': 0}
+
+    def obtener(self, clave: Hashable, cargar: Callable[[], Any], cachear_si: Callable[[Any], bool] = None) -> Any:
+        """
+        Retorna el valor de `clave` o lo calcula con `cargar()` si no está o venció.
+        `cachear_si(valor)` permite no guardar resultados de error.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None and entrada[0] > ahora:
+                self._stats['aciertos'] += 1
+                return entrada[1]
+            self._stats['fallos'] += 1
+
+        valor = cargar()
+        if cachear_si is None or cachear_si(valor):
+            self.guardar(clave, valor)
+        return valor
+
+    def contiene(self, clave: Hashable) -> bool:
+        """True si `clave` tiene una entrada vigente (no cuenta como acierto ni fallo)"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            return entrada is not None and entrada[0] > time.monotonic()
+
+    def guardar(self, clave: Hashable, valor: Any):
+        with self._lock:
+            if len(self._datos) >= self.max_entradas and clave not in self._datos:
+                self._purgar()
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+
+    def invalidar(self, *claves: Hashable):
+        """Elimina claves concretas"""
+        with self._lock:
+            for clave in claves:
+                if self._datos.pop(clave, None) is not None:
+                    self._stats['invalidaciones'] += 1
+
+    def invalidar_prefijo(self, prefijo: Hashable):
+        """Elimina todas las claves tupla cuyo primer elemento es `prefijo`"""
+        with self._lock:
+            claves = [c for c in self._datos if isinstance(c, tuple) and c and c[0] == prefijo]
+            for clave in claves:
+                del self._datos[clave]
+            self._stats['invalidaciones'] += len(claves)
+
+    def limpiar(self):
+        with self._lock:
+            self._stats['invalidaciones'] += len(self._datos)
+            self._datos.clear()
+
+    def _purgar(self):
+        """Descarta vencidas y, si no alcanza, la mitad más antigua (requiere el lock)"""
+        ahora = time.monotonic()
+        for clave in [c for c, (vence, _) in self._datos.items() if vence <= ahora]:
+            del self._datos[clave]
+        if len(self._datos) >= self.max_entradas:
+            antiguas = sorted(self._datos.items(), key=lambda item: item[1][0])
+            for clave, _ in antiguas[:len(antiguas) // 2]:
+                del self._datos[clave]
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            consultas = self._stats['aciertos'] + self._stats['fallos']
+            return {
+                'entradas': len(self._datos),
+                'ttl': self.ttl,
+                'aciertos': self._stats['aciertos'],
+                'fallos': self._stats['fallos'],
+                'invalidaciones': self._stats['invalidaciones'],
+                'tasa_acierto': round(self._stats['aciertos'] / consultas, 3) if consultas else 0.0
+            }
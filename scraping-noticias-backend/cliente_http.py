@@ -0,0 +1,472 @@
+"""
+Cliente HTTP asíncrono del scraping
+Todas las descargas (portadas, páginas de noticias, sitemaps, robots.txt) pasan por un único
+event loop que corre en un hilo propio. Ofrece:
+- conexiones keep-alive reutilizadas y compresión (gzip/deflate)
+- reintentos ante fallos de conexión y respuestas 429/5xx
+- caché de DNS propia (solo para las descargas de este cliente)
+- tope de descargas simultáneas por host
+- timeout por petición y plazo total por grupo de descargas
+
+Con httpx instalado (pip install -r requirements-opcional.txt) las descargas son asíncronas de verdad y puede haber miles
+en vuelo por proceso. Sin httpx se usa una requests.Session compartida en un pool de hilos, con
+adaptadores de conexiones por host. Ambos motores miden las conexiones nuevas y su tiempo de
+conexión (DNS + TCP + TLS); estadisticas() da la tasa de reutilización.
+
+Fachada síncrona para Flask y scripts:
+    respuesta = cliente_http.get(url, headers=..., timeout=15)
+    respuestas = cliente_http.get_varios(urls, timeout=15, plazo_total=60)
+Los errores se lanzan como excepciones de requests (Timeout, HTTPError, ConnectionError),
+así los manejadores existentes siguen funcionando.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.retry import Retry
+
+from cache_ttl import CacheTTL
+from cortesia_hosts import host_de
+
+try:
+    import httpcore
+    import httpx
+    HTTPX_DISPONIBLE = True
+except ImportError:
+    HTTPX_DISPONIBLE = False
+    print("⚠️ httpx no disponible, las descargas usan requests en hilos. Instala con: pip install -r requirements-opcional.txt")
+
+CABECERAS_POR_DEFECTO = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': 'gzip, deflate'
+}
+
+# Respuestas que se reintentan (con espera exponencial) y número de reintentos
+ESTADOS_REINTENTO = (429, 500, 502, 503, 504)
+REINTENTOS = 2
+
+
+# ==================== CACHÉ DE DNS ====================
+
+# Solo la usan los transportes de este cliente; socket.getaddrinfo del proceso no se toca.
+# getaddrinfo no informa el TTL real del registro: se usa uno corto y la entrada se
+# descarta en cuanto ninguna de sus direcciones acepta la conexión.
+TTL_DNS = 60.0
+cache_dns = CacheTTL(ttl=TTL_DNS, max_entradas=5000)
+
+
+def resolver_cacheado(host: str, port: int, familia: int = socket.AF_UNSPEC) -> List[str]:
+    """IPs de `host` (sin repetir, en el orden del resolver). Los errores no se cachean"""
+    def resolver():
+        infos = socket.getaddrinfo(host, port, familia, socket.SOCK_STREAM)
+        return list(dict.fromkeys(info[4][0] for info in infos))
+    return cache_dns.obtener((host, port, familia), resolver)
+
+
+class _BackendDNSCacheado:
+    """Backend de red de httpcore que conecta a las IPs de resolver_cacheado (SNI y Host no cambian)"""
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        clave = (host, port, socket.AF_UNSPEC)
+        try:
+            if cache_dns.contiene(clave):
+                direcciones = resolver_cacheado(host, port)
+            else:
+                direcciones = await asyncio.get_running_loop().run_in_executor(None, resolver_cacheado, host, port)
+        except OSError as e:
+            # Igual que el backend de httpcore: httpx lo entrega como ConnectError
+            raise httpcore.ConnectError(str(e)) from e
+        error = None
+        for ip in direcciones:
+            try:
+                return await self._backend.connect_tcp(
+                    ip, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+                )
+            except Exception as e:
+                error = e
+        cache_dns.invalidar(clave)
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+# ==================== ADAPTADOR DE REQUESTS ====================
+
+def _conexion_medida(clase_base: type, registrar: Callable[[float], None], usar_cache_dns: bool) -> type:
+    """
+    Subclase de conexión de urllib3 que informa el tiempo de cada conexión nueva.
+    Con usar_cache_dns, el socket se abre contra las IPs de resolver_cacheado.
+    """
+    class ConexionMedida(clase_base):
+        def connect(self):
+            inicio = time.perf_counter()
+            super().connect()
+            registrar(time.perf_counter() - inicio)
+
+        def _new_conn(self):
+            if not usar_cache_dns:
+                return super()._new_conn()
+            host = self._dns_host
+            try:
+                direcciones = resolver_cacheado(host, self.port, allowed_gai_family())
+            except OSError:
+                return super()._new_conn()  # urllib3 informa el fallo de resolución como siempre
+            # Solo el socket usa la IP: se restaura antes del TLS (SNI y certificado usan el host)
+            error = None
+            try:
+                for ip in direcciones:
+                    self._dns_host = ip
+                    try:
+                        return super()._new_conn()
+                    except ConnectTimeoutError as e:  # incluye NewConnectionError
+                        error = e
+            finally:
+                self._dns_host = host
+            cache_dns.invalidar((host, self.port, allowed_gai_family()))
+            raise error
+    return ConexionMedida
+
+
+class AdaptadorMedido(HTTPAdapter):
+    """HTTPAdapter con pools por host cuyas conexiones nuevas se miden con `registrar(segundos)`"""
+
+    def __init__(self, registrar: Callable[[float], None], cache_dns: bool = True, **kwargs):
+        self._registrar = registrar
+        self._cache_dns = cache_dns
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('PoolHTTPMedido', (HTTPConnectionPool,), {
+                'ConnectionCls': _conexion_medida(HTTPConnection, self._registrar, self._cache_dns)
+            }),
+            'https': type('PoolHTTPSMedido', (HTTPSConnectionPool,), {
+                'ConnectionCls': _conexion_medida(HTTPSConnection, self._registrar, self._cache_dns)
+            })
+        }
+
+
+class RespuestaHTTP:
+    """Respuesta ya descargada, con la parte de la interfaz de requests.Response que usa el scraper"""
+
+    def __init__(self, url: str, status_code: int, headers, content: bytes, encoding: Optional[str] = None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error para la url: {self.url}", response=self)
+
+
+def _convertir_error(error: Exception, url: str) -> Exception:
+    """Traduce los errores de httpx/asyncio a las excepciones de requests"""
+    if isinstance(error, requests.exceptions.RequestException):
+        return error
+    if isinstance(error, asyncio.TimeoutError) or (HTTPX_DISPONIBLE and isinstance(error, httpx.TimeoutException)):
+        return requests.exceptions.Timeout(f"Timeout en {url}")
+    if HTTPX_DISPONIBLE and isinstance(error, httpx.HTTPError):
+        return requests.exceptions.ConnectionError(f"{error} ({url})")
+    return error
+
+
+class ClienteHTTP:
+    """
+    Args:
+        max_por_host: Descargas simultáneas permitidas por host
+        max_conexiones: Conexiones abiertas en total (las demás descargas esperan turno)
+        timeout: Timeout por defecto de cada petición, en segundos
+        pool_hosts: Hosts con pool de conexiones propio (motor requests)
+        pool_por_host: Conexiones keep-alive que se conservan por host (motor requests)
+        cache_dns: Cachear la resolución de nombres de las descargas (solo en este cliente)
+    """
+
+    def __init__(
+        self,
+        max_por_host: int = 3,
+        max_conexiones: int = 200,
+        timeout: float = 15.0,
+        pool_hosts: int = 100,
+        pool_por_host: int = 10,
+        cache_dns: bool = True
+    ):
+        self.max_por_host = max(1, max_por_host)
+        self.max_conexiones = max_conexiones
+        self.timeout = timeout
+        self.pool_hosts = pool_hosts
+        self.pool_por_host = max(pool_por_host, self.max_por_host)
+        self.cache_dns = cache_dns
+        self._lock = threading.Lock()
+        self._lock_stats = threading.Lock()
+        self._loop = None
+        self._sesion = None
+        # Solo se usan desde el hilo del loop
+        self._cliente = None
+        self._semaforos: Dict[str, asyncio.Semaphore] = {}
+        self._stats = {
+            'peticiones': 0, 'errores': 0, 'reintentos': 0, 'en_vuelo': 0, 'max_en_vuelo': 0,
+            'conexiones_nuevas': 0, 'tiempo_conexion_total': 0.0, 'tiempo_conexion_max': 0.0
+        }
+
+    def _iniciar(self) -> asyncio.AbstractEventLoop:
+        """Arranca el event loop en su hilo la primera vez que se usa"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                if not HTTPX_DISPONIBLE:
+                    self._sesion = self._crear_sesion()
+                    loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(
+                        max_workers=min(self.max_conexiones, 32), thread_name_prefix='http'
+                    ))
+                threading.Thread(target=loop.run_forever, name='cliente-http', daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def _registrar_conexion(self, segundos: float):
+        with self._lock_stats:
+            self._stats['conexiones_nuevas'] += 1
+            self._stats['tiempo_conexion_total'] += segundos
+            self._stats['tiempo_conexion_max'] = max(self._stats['tiempo_conexion_max'], segundos)
+
+    def _crear_sesion(self) -> requests.Session:
+        """Session compartida (motor requests): pools por host, keep-alive y reintentos"""
+        sesion = requests.Session()
+        sesion.headers.update(CABECERAS_POR_DEFECTO)
+        adaptador = AdaptadorMedido(
+            self._registrar_conexion,
+            cache_dns=self.cache_dns,
+            pool_connections=self.pool_hosts,
+            pool_maxsize=self.pool_por_host,
+            max_retries=Retry(
+                total=REINTENTOS,
+                backoff_factor=0.5,
+                status_forcelist=ESTADOS_REINTENTO,
+                allowed_methods=('GET', 'HEAD'),
+                raise_on_status=False
+            )
+        )
+        sesion.mount('http://', adaptador)
+        sesion.mount('https://', adaptador)
+        return sesion
+
+    def _cliente_async(self):
+        if self._cliente is None:
+            transporte = httpx.AsyncHTTPTransport(
+                retries=REINTENTOS,  # httpx solo reintenta fallos de conexión; los 429/5xx, descargar
+                limits=httpx.Limits(
+                    max_connections=self.max_conexiones,
+                    max_keepalive_connections=self.max_conexiones // 2,
+                    keepalive_expiry=30.0
+                )
+            )
+            if self.cache_dns:
+                # httpx no expone el backend de red de httpcore: se envuelve el del pool del transporte
+                transporte._pool._network_backend = _BackendDNSCacheado(transporte._pool._network_backend)
+            self._cliente = httpx.AsyncClient(
+                headers=CABECERAS_POR_DEFECTO,
+                follow_redirects=True,
+                transport=transporte
+            )
+        return self._cliente
+
+    async def _pedir_httpx(self, metodo: str, url: str, headers: Optional[Dict], timeout: float):
+        """Petición con httpx, midiendo la conexión si hubo que abrir una nueva"""
+        conexion = {}
+
+        async def trazar(evento, info):
+            if evento == 'connection.connect_tcp.started':
+                conexion['inicio'] = time.perf_counter()
+            elif evento in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+                conexion['fin'] = time.perf_counter()
+
+        for intento in range(REINTENTOS + 1):
+            # pool=None: esperar una conexión libre no cuenta como timeout de la petición
+            r = await self._cliente_async().request(
+                metodo, url, headers=headers,
+                timeout=httpx.Timeout(timeout, pool=None),
+                extensions={'trace': trazar}
+            )
+            if 'fin' in conexion:
+                self._registrar_conexion(conexion.pop('fin') - conexion.pop('inicio'))
+            if r.status_code not in ESTADOS_REINTENTO or intento == REINTENTOS:
+                return r
+            with self._lock_stats:
+                self._stats['reintentos'] += 1
+            await asyncio.sleep(0.5 * 2 ** intento)
+
+    def _semaforo(self, url: str) -> asyncio.Semaphore:
+        host = host_de(url)
+        semaforo = self._semaforos.get(host)
+        if semaforo is None:
+            semaforo = self._semaforos[host] = asyncio.Semaphore(self.max_por_host)
+        return semaforo
+
+    # ==================== API ASÍNCRONA (dentro del loop) ====================
+
+    async def descargar(
+        self,
+        url: str,
+        metodo: str = 'GET',
+        headers: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> RespuestaHTTP:
+        """Descarga una URL respetando el tope por host. Lanza excepciones de requests"""
+        timeout = timeout or self.timeout
+        async with self._semaforo(url):
+            with self._lock_stats:
+                self._stats['peticiones'] += 1
+                self._stats['en_vuelo'] += 1
+                self._stats['max_en_vuelo'] = max(self._stats['max_en_vuelo'], self._stats['en_vuelo'])
+            try:
+                if HTTPX_DISPONIBLE:
+                    r = await self._pedir_httpx(metodo, url, headers, timeout)
+                    return RespuestaHTTP(str(r.url), r.status_code, r.headers, r.content, r.encoding)
+                r = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+                    self._sesion.request, metodo, url, headers=headers, timeout=timeout
+                ))
+                # urllib3 reintenta dentro del adaptador: su historial dice cuántas veces
+                reintentos = getattr(getattr(r.raw, 'retries', None), 'history', ())
+                if reintentos:
+                    with self._lock_stats:
+                        self._stats['reintentos'] += len(reintentos)
+                return RespuestaHTTP(r.url, r.status_code, r.headers, r.content, r.encoding)
+            except Exception as e:
+                with self._lock_stats:
+                    self._stats['errores'] += 1
+                raise _convertir_error(e, url) from e
+            finally:
+                with self._lock_stats:
+                    self._stats['en_vuelo'] -= 1
+
+    async def descargar_varios(
+        self,
+        urls: List[str],
+        metodo: str = 'GET',
+        headers: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        plazo_total: Optional[float] = None
+    ) -> List[Union[RespuestaHTTP, Exception]]:
+        """
+        Descarga todas las URLs a la vez (con el tope por host).
+        Retorna, en el mismo orden, la respuesta o la excepción de cada una;
+        las que no terminan dentro de `plazo_total` se cancelan y quedan como Timeout.
+        """
+        if not urls:
+            return []
+        tareas = [asyncio.ensure_future(self.descargar(url, metodo, headers, timeout)) for url in urls]
+        _, pendientes = await asyncio.wait(tareas, timeout=plazo_total)
+        for tarea in pendientes:
+            tarea.cancel()
+
+        resultados = []
+        for url, tarea in zip(urls, tareas):
+            if tarea in pendientes:
+                resultados.append(requests.exceptions.Timeout(f"Plazo total de {plazo_total}s agotado para {url}"))
+            else:
+                resultados.append(tarea.exception() or tarea.result())
+        return resultados
+
+    # ==================== FACHADA SÍNCRONA ====================
+
+    def _ejecutar(self, corrutina, plazo: Optional[float] = None):
+        futuro = asyncio.run_coroutine_threadsafe(corrutina, self._iniciar())
+        try:
+            return futuro.result(plazo)
+        except concurrent.futures.TimeoutError:
+            futuro.cancel()
+            raise requests.exceptions.Timeout(f"Plazo total de {plazo}s agotado")
+
+    def get(self, url: str, headers: Optional[Dict] = None, timeout: Optional[float] = None,
+            plazo: Optional[float] = None) -> RespuestaHTTP:
+        """GET bloqueante; `plazo` limita también la espera por el tope del host"""
+        return self._ejecutar(self.descargar(url, 'GET', headers, timeout), plazo)
+
+    def head(self, url: str, headers: Optional[Dict] = None, timeout: Optional[float] = None,
+             plazo: Optional[float] = None) -> RespuestaHTTP:
+        return self._ejecutar(self.descargar(url, 'HEAD', headers, timeout), plazo)
+
+    def get_varios(
+        self,
+        urls: List[str],
+        headers: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        plazo_total: Optional[float] = None,
+        metodo: str = 'GET'
+    ) -> List[Union[RespuestaHTTP, Exception]]:
+        """Versión bloqueante de descargar_varios"""
+        return self._ejecutar(self.descargar_varios(urls, metodo, headers, timeout, plazo_total))
+
+    def estadisticas(self) -> Dict:
+        """Contadores del proceso; reutilizacion = fracción de peticiones que no abrieron conexión"""
+        with self._lock_stats:
+            stats = dict(self._stats)
+        peticiones = stats['peticiones']
+        nuevas = stats['conexiones_nuevas']
+        return {
+            'motor': 'httpx' if HTTPX_DISPONIBLE else 'requests',
+            'max_por_host': self.max_por_host,
+            'max_conexiones': self.max_conexiones,
+            'hosts': len(self._semaforos),
+            'peticiones': peticiones,
+            'errores': stats['errores'],
+            'reintentos': stats['reintentos'],
+            'en_vuelo': stats['en_vuelo'],
+            'max_en_vuelo': stats['max_en_vuelo'],
+            'conexiones_nuevas': nuevas,
+            'reutilizacion': round(max(0.0, 1 - nuevas / peticiones), 3) if peticiones else 0.0,
+            'tiempo_conexion_ms_promedio': round(stats['tiempo_conexion_total'] * 1000 / nuevas, 2) if nuevas else 0.0,
+            'tiempo_conexion_ms_max': round(stats['tiempo_conexion_max'] * 1000, 2),
+            'cache_dns': cache_dns.estadisticas()
+        }
+
+    def cerrar(self):
+        """Cierra las conexiones y detiene el loop (p.ej. al terminar un script)"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._cliente is not None:
+            asyncio.run_coroutine_threadsafe(self._cliente.aclose(), loop).result(10)
+            self._cliente = None
+        if self._sesion is not None:
+            self._sesion.close()
+            self._sesion = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._semaforos = {}
+
+
+# Cliente compartido por todo el proceso
+cliente_http = ClienteHTTP(
+    max_por_host=int(os.getenv('SCRAPING_POR_HOST', '3')),
+    pool_hosts=int(os.getenv('HTTP_POOL_HOSTS', '100')),
+    pool_por_host=int(os.getenv('HTTP_POOL_POR_HOST', '10'))
+)
@@ -0,0 +1,50 @@
+"""
+Cortesía por host
+Espacia las peticiones HTTP al mismo host sin frenar las que van a hosts distintos:
+cada host tiene su propio turno, así varias fuentes se pueden scrapear a la vez
+sin que ningún sitio reciba más de una petición cada `intervalo` segundos.
+El tope de descargas simultáneas por host lo aplica cliente_http.
+"""
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+def host_de(url: str) -> str:
+    """Host normalizado de una URL ('www.' no cuenta como host distinto)"""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class CortesiaHosts:
+    """
+    Turnos por host (thread-safe).
+
+    Args:
+        intervalo: Segundos mínimos entre dos peticiones al mismo host
+    """
+
+    def __init__(self, intervalo: float = 2.0):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._proximo: Dict[str, float] = {}
+
+    def esperar(self, url: str) -> float:
+        """
+        Bloquea hasta que sea el turno del host de `url` y reserva el siguiente.
+        Retorna los segundos esperados.
+        """
+        host = host_de(url)
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._proximo.get(host, 0.0))
+            self._proximo[host] = turno + self.intervalo
+            # Los hosts cuyo turno ya pasó no necesitan seguir registrados
+            if len(self._proximo) > 1000:
+                self._proximo = {h: t for h, t in self._proximo.items() if t > ahora}
+
+        espera = turno - ahora
+        if espera > 0:
+            time.sleep(espera)
+        return espera
@@ -1,12 +1,95 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from typing import List, Dict, Optional
 import json
+import os
+import itertools
+import base64
+import hashlib
+import uuid
+from datetime import datetime, date
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from contextlib import contextmanager
 from werkzeug.security import generate_password_hash, check_password_hash
+from pool_conexiones import obtener_pool
+from unidad_trabajo import conexion_peticion
+from cache_ttl import CacheTTL
+from registro_consultas import registro_consultas
+
+
+# Caché compartida por todas las instancias de Database del proceso
+cache_planes = CacheTTL(ttl=300)
+
+# Lectura propia: tras escribir, las lecturas del usuario van a la primaria durante
+# estos segundos (debe superar el retraso de replicación). Es por proceso.
+VENTANA_LECTURA_PROPIA = 30
+escrituras_recientes = CacheTTL(ttl=VENTANA_LECTURA_PROPIA)
+
+# Nombre -> id de categorias y paises. Los ids no cambian (las dimensiones solo crecen),
+# así que solo se guardan ids ya confirmados en la BD.
+cache_dimensiones = CacheTTL(ttl=3600, max_entradas=20000)
+
+# Réplicas que fallaron al conectar: se saltan durante el TTL
+_replicas_caidas = CacheTTL(ttl=30)
+_turno_replicas = itertools.count()
+
+
+# Parámetros de seguimiento que no cambian el artículo
+_PARAMETROS_SEGUIMIENTO = ('utm_', 'fbclid', 'gclid', 'ocid', 'ref_src')
+
+
+def normalizar_url(url: str) -> str:
+    """
+    Forma canónica de la URL de un artículo (clave de la tabla articulos):
+    esquema y host en minúsculas, sin puerto por defecto, sin fragmento,
+    sin parámetros de seguimiento y sin '/' final.
+    """
+    partes = urlsplit(url.strip())
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or '').lower()
+    if partes.port and not ((esquema == 'http' and partes.port == 80) or (esquema == 'https' and partes.port == 443)):
+        host = f"{host}:{partes.port}"
+    ruta = partes.path.rstrip('/') or '/'
+    query = urlencode([
+        (clave, valor) for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if not clave.lower().startswith(_PARAMETROS_SEGUIMIENTO)
+    ])
+    return urlunsplit((esquema, host, ruta, query, ''))
+
+
+def hash_url(url_normalizada: str) -> int:
+    """
+    Hash de 64 bits (con signo, para BIGINT) de una URL ya normalizada.
+    Equivale en SQL a ('x' || substr(md5(url), 1, 16))::bit(64)::bigint
+    """
+    return int.from_bytes(hashlib.md5(url_normalizada.encode('utf-8')).digest()[:8], 'big', signed=True)
+
+
+def codificar_cursor(fecha_scraping: datetime, noticia_id: int) -> str:
+    """Codifica la posición (fecha_scraping, id) como cursor opaco para paginación keyset"""
+    crudo = json.dumps({'f': fecha_scraping.isoformat(), 'i': noticia_id})
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor: str):
+    """Decodifica un cursor opaco. Lanza ValueError si es inválido"""
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return datetime.fromisoformat(datos['f']), int(datos['i'])
+    except Exception:
+        raise ValueError('Cursor de paginación inválido')
+
 
 class Database:
-    def __init__(self):
-        """Configuración de conexión a PostgreSQL"""
+    def __init__(self, replicas: Optional[List[str]] = None):
+        """
+        Configuración de conexión a PostgreSQL.
+        
+        Args:
+            replicas: DSN libpq de réplicas de lectura (p.ej. "host=localhost port=5433 dbname=noticias_db user=postgres").
+                Por defecto se leen de la variable de entorno DB_REPLICAS, separadas por ';'.
+                Sin réplicas, todas las lecturas van a la primaria.
+        """
         self.config = {
             'host': 'localhost',
             'user': 'postgres',
@@ -14,243 +97,288 @@ class Database:
             'database': 'noticias_db',
             'port': 5432
         }
+        
+        # Pool compartido por todas las instancias de Database del proceso
+        self.pool_config = {
+            'minimo': 1,
+            'maximo': 10,
+            'timeout': 10.0,      # segundos de espera máxima por una conexión
+            'max_usos': 500,      # reciclar la conexión tras N préstamos
+            'ping_tras': 30.0     # verificar con SELECT 1 si estuvo inactiva más de N segundos
+        }
+        self.pool = obtener_pool(self.config, **self.pool_config)
+        
+        if replicas is None:
+            replicas = [dsn.strip() for dsn in os.getenv('DB_REPLICAS', '').split(';') if dsn.strip()]
+        self.pools_lectura = [obtener_pool({'dsn': dsn}, **self.pool_config) for dsn in replicas]
     
-    def get_connection(self):
-        """Crea y retorna una conexión a la base de datos"""
+    def get_connection(self, compartida: bool = True, lectura: bool = False, user_id: Optional[int] = None):
+        """
+        Obtiene una conexión del pool (connection.close() la devuelve al pool).
+        Dentro de una petición Flask se reutiliza la conexión de la unidad de trabajo;
+        compartida=False fuerza una conexión propia (p.ej. para lecturas que sobreviven a la petición).
+        
+        lectura=True indica que el llamador solo lee: va a una réplica si hay, salvo que
+        `user_id` haya escrito hace menos de VENTANA_LECTURA_PROPIA segundos (lee sus escrituras).
+        Si la réplica no responde se usa la primaria.
+        """
+        if lectura:
+            connection = self._conexion_replica(compartida, user_id)
+            if connection is not None:
+                return connection
         try:
-            connection = psycopg2.connect(**self.config)
-            return connection
+            return self._obtener_de(self.pool, compartida)
         except Exception as e:
             print(f"❌ Error conectando a PostgreSQL: {e}")
             return None
     
+    @staticmethod
+    def _obtener_de(pool, compartida: bool):
+        if compartida:
+            connection = conexion_peticion(pool)
+            if connection is not None:
+                return connection
+        return pool.obtener()
+    
+    def _conexion_replica(self, compartida: bool, user_id: Optional[int]):
+        """Conexión a una réplica disponible (por turnos), o None si corresponde la primaria"""
+        if not self.pools_lectura:
+            return None
+        if user_id is not None and escrituras_recientes.contiene(str(user_id)):
+            return None
+        
+        turno = next(_turno_replicas)
+        for i in range(len(self.pools_lectura)):
+            pool = self.pools_lectura[(turno + i) % len(self.pools_lectura)]
+            if _replicas_caidas.contiene(id(pool)):
+                continue
+            try:
+                return self._obtener_de(pool, compartida)
+            except Exception as e:
+                print(f"⚠️ Réplica de lectura no disponible, se usará otra o la primaria: {e}")
+                _replicas_caidas.guardar(id(pool), True)
+        return None
+    
+    @staticmethod
+    def marcar_escritura(user_id: Optional[int]):
+        """Registra que el usuario escribió: sus próximas lecturas irán a la primaria"""
+        if user_id is not None:
+            escrituras_recientes.guardar(str(user_id), True)
+    
+    @contextmanager
+    def conexion(self, lectura: bool = False, user_id: Optional[int] = None):
+        """
+        Presta una conexión del pool durante el bloque `with` y la devuelve al salir.
+        Entrega None si no se pudo obtener una conexión. Ver get_connection para `lectura`.
+        """
+        connection = self.get_connection(lectura=lectura, user_id=user_id)
+        try:
+            yield connection
+        finally:
+            if connection:
+                connection.close()
+    
+    def estadisticas_pool(self) -> Dict:
+        """Retorna el estado del pool de conexiones (para monitoreo)"""
+        estadisticas = self.pool.estadisticas()
+        if self.pools_lectura:
+            estadisticas['replicas'] = [
+                dict(pool.estadisticas(), caida=_replicas_caidas.contiene(id(pool)))
+                for pool in self.pools_lectura
+            ]
+        return estadisticas
+    
+    def estadisticas_consultas(self, orden: str = 'total_ms', limite: int = 20) -> Dict:
+        """Tiempos por consulta y consultas lentas del proceso (lanza ValueError si el orden no existe)"""
+        return registro_consultas.estadisticas(orden, limite)
+    
+    def reiniciar_estadisticas_consultas(self):
+        registro_consultas.reiniciar()
+    
     # ==================== OPERACIONES DE ESQUEMA ====================
     
     def crear_tablas(self):
-        """Crea las tablas necesarias si no existen (usuarios, fuentes, noticias, planes, suscripciones, pagos, scraping_diario)"""
+        """
+        Lleva el esquema a la última versión aplicando las migraciones pendientes.
+        No se llama al arrancar la API: ejecutar `python migrar_bd.py` en cada despliegue.
+        """
+        from migraciones import aplicar_migraciones
+        return aplicar_migraciones(self)
+    
+    def verificar_esquema(self) -> bool:
+        """Comprueba (sin ejecutar DDL) que el esquema esté en la última versión de migraciones"""
+        from migraciones import version_esquema, ULTIMA_VERSION
+        
+        version = version_esquema(self)
+        if version is None:
+            print("❌ No se pudo leer la versión del esquema")
+            return False
+        if version < ULTIMA_VERSION:
+            print(f"⚠️ Esquema en versión {version}, se esperaba {ULTIMA_VERSION}. Ejecuta: python migrar_bd.py")
+            return False
+        print(f"✅ Esquema de base de datos en versión {version}")
+        return True
+    
+    @staticmethod
+    def _sql_aplicar_deltas(origen: str) -> str:
+        """
+        Sentencia que suma a conteo_noticias y facetas_usuario los deltas de `origen`,
+        una consulta con columnas (user_id, fuente_id, categoria_id, pais_id, delta).
+        Los NULL se guardan como 0 para que formen parte de la clave.
+        """
+        return f"""
+            WITH deltas AS (
+                SELECT COALESCE(user_id, 0) AS u, COALESCE(fuente_id, 0) AS f,
+                       COALESCE(categoria_id, 0) AS cat, COALESCE(pais_id, 0) AS p, SUM(delta) AS total
+                FROM ({origen}) cambios
+                GROUP BY 1, 2, 3, 4
+                HAVING SUM(delta) <> 0
+            ), conteos AS (
+                INSERT INTO conteo_noticias AS c (user_id, fuente_id, categoria_id, pais_id, total)
+                SELECT u, f, cat, p, total FROM deltas
+                ON CONFLICT (user_id, fuente_id, categoria_id, pais_id)
+                DO UPDATE SET total = c.total + EXCLUDED.total
+            )
+            INSERT INTO facetas_usuario AS fu (user_id, tipo, valor_id, total)
+            SELECT u, 'categoria', cat, SUM(total) FROM deltas WHERE cat <> 0 GROUP BY u, cat
+            UNION ALL
+            SELECT u, 'pais', p, SUM(total) FROM deltas WHERE p <> 0 GROUP BY u, p
+            ON CONFLICT (user_id, tipo, valor_id)
+            DO UPDATE SET total = fu.total + EXCLUDED.total
+        """
+    
+    def _descontar_conteos(self, cursor, tabla: str):
+        """Resta las filas de `tabla` (p.ej. una partición ya desvinculada, sin triggers) de los contadores"""
+        cursor.execute(self._sql_aplicar_deltas(
+            f"SELECT user_id, fuente_id, categoria_id, pais_id, -1 AS delta FROM {tabla}"
+        ))
+    
+    def _recalcular_conteos(self, cursor):
+        """Reconstruye conteo_noticias y facetas_usuario desde cero a partir de noticias_usuario"""
+        cursor.execute("LOCK TABLE conteo_noticias, facetas_usuario IN EXCLUSIVE MODE")
+        cursor.execute("DELETE FROM conteo_noticias")
+        cursor.execute("DELETE FROM facetas_usuario")
+        cursor.execute(self._sql_aplicar_deltas(
+            "SELECT user_id, fuente_id, categoria_id, pais_id, 1 AS delta FROM noticias_usuario"
+        ))
+    
+    def recalcular_conteos(self) -> bool:
+        """Reconstruye los contadores cacheados de noticias (mantenimiento)"""
         connection = self.get_connection()
         if not connection:
-            print("❌ No se pudo conectar a la base de datos")
             return False
         
         cursor = connection.cursor()
         
         try:
-            # --- TABLA: usuarios
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id SERIAL PRIMARY KEY,
-                    nombre_usuario VARCHAR(100) NOT NULL UNIQUE,
-                    email VARCHAR(255) NOT NULL UNIQUE,
-                    contrasena_hash VARCHAR(255) NOT NULL,
-                    rol VARCHAR(20) DEFAULT 'usuario' CHECK (rol IN ('admin', 'usuario')),
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    activo BOOLEAN DEFAULT TRUE
-                )
-            """)
-            
-            # Agregado de columna rol si no existe (para bases de datos existentes)
-            try:
-                cursor.execute("""
-                    ALTER TABLE usuarios 
-                    ADD COLUMN IF NOT EXISTS rol VARCHAR(20) DEFAULT 'usuario'
-                """)
-                cursor.execute("UPDATE usuarios SET rol = 'usuario' WHERE rol IS NULL")
-                try:
-                    cursor.execute("""
-                        ALTER TABLE usuarios 
-                        ADD CONSTRAINT check_rol 
-                        CHECK (rol IN ('admin', 'usuario'))
-                    """)
-                except:
-                    pass
-            except Exception as e:
-                print(f"⚠️ Advertencia al agregar columna rol a usuarios: {e}")
-                pass
-            
-            # --- TABLA: planes
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS planes (
-                    id SERIAL PRIMARY KEY,
-                    nombre VARCHAR(100) NOT NULL UNIQUE,
-                    precio NUMERIC(10, 2) NOT NULL,
-                    limite_fuentes INTEGER NOT NULL DEFAULT 5,
-                    limite_scraping_diario INTEGER NOT NULL DEFAULT 30,
-                    descripcion TEXT,
-                    activo BOOLEAN DEFAULT TRUE,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Agregar columna limite_scraping_diario si no existe
-            try:
-                cursor.execute("""
-                    ALTER TABLE planes 
-                    ADD COLUMN IF NOT EXISTS limite_scraping_diario INTEGER NOT NULL DEFAULT 30
-                """)
-            except Exception as e:
-                print(f"⚠️ Advertencia al agregar columna limite_scraping_diario: {e}")
-                pass
-            
-            # --- TABLA: suscripciones
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS suscripciones (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
-                    plan_id INTEGER REFERENCES planes(id) ON DELETE RESTRICT,
-                    fecha_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fecha_vencimiento TIMESTAMP NOT NULL,
-                    activo BOOLEAN DEFAULT TRUE,
-                    cancelado BOOLEAN DEFAULT FALSE,
-                    UNIQUE(user_id, activo)
-                )
-            """)
-            
-            # --- TABLA: pagos
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS pagos (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
-                    plan_id INTEGER REFERENCES planes(id) ON DELETE RESTRICT,
-                    metodo_pago VARCHAR(50) NOT NULL,
-                    monto NUMERIC(10, 2) NOT NULL,
-                    referencia_pago VARCHAR(255) UNIQUE,
-                    datos_pago JSONB,
-                    estado VARCHAR(20) DEFAULT 'pendiente' CHECK (estado IN ('pendiente', 'completado', 'fallido', 'reembolsado')),
-                    fecha_pago TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fecha_verificacion TIMESTAMP,
-                    verificado_por INTEGER REFERENCES usuarios(id) ON DELETE SET NULL
-                )
-            """)
-            
-            # --- TABLA: fuentes
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS fuentes (
-                    id SERIAL PRIMARY KEY,
-                    nombre VARCHAR(255) NOT NULL,
-                    url VARCHAR(512) NOT NULL,
-                    selector_contenedor JSONB NOT NULL,
-                    selector_titulo JSONB NOT NULL,
-                    selector_resumen JSONB NOT NULL,
-                    selector_link JSONB,
-                    selector_imagen JSONB,
-                    selector_categoria JSONB,
-                    user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
-                    activo BOOLEAN DEFAULT TRUE,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Agregado de columna user_id si no existe a fuentes
-            try:
-                cursor.execute("""
-                    ALTER TABLE fuentes 
-                    ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE
-                """)
-                cursor.execute("""
-                    UPDATE fuentes 
-                    SET user_id = (SELECT id FROM usuarios WHERE rol = 'admin' LIMIT 1)
-                    WHERE user_id IS NULL AND EXISTS (SELECT 1 FROM usuarios WHERE rol = 'admin')
-                """)
-            except Exception as e:
-                print(f"⚠️ Advertencia al agregar columna user_id a fuentes: {e}")
-                pass
-            
-            # --- TABLA: noticias
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS noticias (
-                    id SERIAL PRIMARY KEY,
-                    titulo VARCHAR(512) NOT NULL,
-                    url VARCHAR(1024) NOT NULL,
-                    resumen TEXT,
-                    imagen_url VARCHAR(1024),
-                    categoria VARCHAR(255),
-                    pais VARCHAR(100),
-                    fuente_id INTEGER REFERENCES fuentes(id) ON DELETE CASCADE,
-                    user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
-                    fecha_publicacion TIMESTAMP,
-                    fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(url, user_id)
-                )
-            """)
-            
-            # Agregado de columna user_id y UNIQUE constraint si no existe a noticias
-            try:
-                cursor.execute("""
-                    ALTER TABLE noticias 
-                    ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE
-                """)
-                try:
-                    cursor.execute("""
-                        ALTER TABLE noticias 
-                        DROP CONSTRAINT IF EXISTS noticias_url_key
-                    """)
-                except:
-                    pass
-                cursor.execute("""
-                    CREATE UNIQUE INDEX IF NOT EXISTS idx_noticias_url_user 
-                    ON noticias(url, user_id)
-                """)
-            except:
-                pass
-            
-            # Agregado de columna fecha_publicacion si no existe a noticias
-            try:
-                cursor.execute("""
-                    ALTER TABLE noticias 
-                    ADD COLUMN IF NOT EXISTS fecha_publicacion TIMESTAMP
-                """)
-            except:
-                pass
-            
-            # Agregado de columna pais si no existe a noticias
-            try:
-                cursor.execute("""
-                    ALTER TABLE noticias 
-                    ADD COLUMN IF NOT EXISTS pais VARCHAR(100)
-                """)
-            except:
-                pass
-            
-            # --- TABLA: scraping_diario (✅ NUEVO)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS scraping_diario (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
-                    fecha DATE NOT NULL DEFAULT CURRENT_DATE,
-                    cantidad INTEGER NOT NULL DEFAULT 0,
-                    plan_id INTEGER REFERENCES planes(id) ON DELETE SET NULL,
-                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, fecha)
-                )
-            """)
-            
-            # --- Índices ---
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_fuentes_user_id ON fuentes(user_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_fuente ON noticias(fuente_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_fecha ON noticias(fecha_scraping DESC)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_url ON noticias(url)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_categoria ON noticias(categoria)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_pais ON noticias(pais)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_user_id ON noticias(user_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_nombre_usuario ON usuarios(nombre_usuario)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios(email)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_suscripciones_user_active ON suscripciones(user_id, activo)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_scraping_diario_user_fecha ON scraping_diario(user_id, fecha)")
-            
+            self._recalcular_conteos(cursor)
             connection.commit()
-            print("✅ Tablas creadas exitosamente (incluyendo usuarios, planes, suscripciones, pagos y scraping_diario)")
+            print("✅ Contadores de noticias recalculados")
             return True
-            
         except Exception as e:
-            print(f"❌ Error creando tablas: {e}")
+            print(f"❌ Error recalculando contadores: {e}")
             connection.rollback()
             return False
         finally:
             cursor.close()
             connection.close()
     
+    # ==================== PARTICIONES DE NOTICIAS ====================
+    # noticias_usuario está particionada por rango mensual de fecha_scraping (migración 006).
+    # Las particiones se crean por adelantado; la de respaldo (default) recibe lo que quede fuera.
+    
+    @staticmethod
+    def _inicio_mes(fecha: date, desplazamiento: int = 0) -> date:
+        """Primer día del mes de `fecha` desplazado `desplazamiento` meses"""
+        indice = fecha.year * 12 + (fecha.month - 1) + desplazamiento
+        return date(indice // 12, indice % 12 + 1, 1)
+    
+    @staticmethod
+    def nombre_particion_noticias(inicio: date) -> str:
+        return f"noticias_usuario_p{inicio.year:04d}_{inicio.month:02d}"
+    
+    def _crear_particion_noticias(self, cursor, inicio: date) -> Optional[str]:
+        """
+        Crea la partición del mes que empieza en `inicio` si no existe.
+        Si la partición default ya tiene filas de ese mes, las mueve antes de adjuntarla.
+        """
+        nombre = self.nombre_particion_noticias(inicio)
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (nombre,))
+        if cursor.fetchone()[0]:
+            return None
+        
+        fin = self._inicio_mes(inicio, 1)
+        cursor.execute(f"CREATE TABLE {nombre} (LIKE noticias_usuario INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute("SELECT to_regclass('noticias_usuario_default') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            cursor.execute(f"""
+                WITH movidas AS (
+                    DELETE FROM noticias_usuario_default
+                    WHERE fecha_scraping >= %s AND fecha_scraping < %s
+                    RETURNING *
+                )
+                INSERT INTO {nombre} SELECT * FROM movidas
+            """, (inicio, fin))
+        cursor.execute(f"""
+            ALTER TABLE noticias_usuario ATTACH PARTITION {nombre}
+            FOR VALUES FROM (%s) TO (%s)
+        """, (inicio, fin))
+        return nombre
+    
+    def asegurar_particiones_noticias(self, meses_adelante: int = 3) -> List[str]:
+        """Crea las particiones del mes actual y los `meses_adelante` siguientes. Retorna las creadas"""
+        connection = self.get_connection()
+        if not connection:
+            return []
+        
+        cursor = connection.cursor()
+        
+        try:
+            hoy = date.today()
+            creadas = []
+            for desplazamiento in range(meses_adelante + 1):
+                nombre = self._crear_particion_noticias(cursor, self._inicio_mes(hoy, desplazamiento))
+                if nombre:
+                    creadas.append(nombre)
+            connection.commit()
+            for nombre in creadas:
+                print(f"✅ Partición {nombre} creada")
+            return creadas
+        except Exception as e:
+            print(f"❌ Error creando particiones: {e}")
+            connection.rollback()
+            return []
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def listar_particiones_noticias(self) -> List[Dict]:
+        """Particiones de noticias_usuario con su rango y filas estimadas"""
+        connection = self.get_connection()
+        if not connection:
+            return []
+        
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        
+        try:
+            cursor.execute("""
+                SELECT c.relname AS nombre,
+                       pg_get_expr(c.relpartbound, c.oid) AS rango,
+                       c.reltuples::BIGINT AS filas_estimadas,
+                       pg_total_relation_size(c.oid) AS bytes
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'noticias_usuario'::regclass
+                ORDER BY c.relname
+            """)
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"❌ Error listando particiones: {e}")
+            return []
+        finally:
+            cursor.close()
+            connection.close()
+    
     # ==================== OPERACIONES DE USUARIOS ====================
     
     def crear_usuario(self, nombre_usuario: str, email: str, contrasena: str) -> Optional[Dict]:
@@ -385,77 +513,79 @@ class Database:
 
     # ==================== OPERACIONES DE PLANES ====================
 
+    # Planes y suscripciones activas se leen en casi cada petición autenticada y solo
+    # cambian al aprobar un pago o suscribirse: se cachean por proceso con TTL.
+    # Toda escritura sobre planes/suscripciones debe llamar a invalidar_cache_planes.
+    
+    def _consultar(self, query: str, parametros=None, uno: bool = False):
+        """Ejecuta una lectura simple; a diferencia del resto, propaga los errores"""
+        with self.conexion() as connection:
+            if not connection:
+                raise ConnectionError("Sin conexión a la base de datos")
+            cursor = connection.cursor(cursor_factory=RealDictCursor)
+            try:
+                cursor.execute(query, parametros)
+                if uno:
+                    fila = cursor.fetchone()
+                    return dict(fila) if fila else None
+                return [dict(row) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+    
+    def invalidar_cache_planes(self, user_id: Optional[int] = None):
+        """Invalida la suscripción cacheada de un usuario, o todo (planes incluidos) si user_id es None"""
+        if user_id is None:
+            cache_planes.limpiar()
+        else:
+            cache_planes.invalidar(('suscripcion', int(user_id)))
+    
+    def estadisticas_cache_planes(self) -> Dict:
+        """Retorna aciertos/fallos de la caché de planes y suscripciones"""
+        return cache_planes.estadisticas()
+
     def obtener_planes(self) -> List[Dict]:
-        """Obtiene todos los planes disponibles"""
-        connection = self.get_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
+        """Obtiene todos los planes disponibles (cacheado)"""
         try:
-            cursor.execute("""
+            planes = cache_planes.obtener(('planes',), lambda: self._consultar("""
                 SELECT id, nombre, precio, limite_fuentes, limite_scraping_diario, descripcion, activo
                 FROM planes 
                 WHERE activo = TRUE
                 ORDER BY precio ASC
-            """)
-            planes = [dict(row) for row in cursor.fetchall()]
-            return planes
+            """))
+            return [dict(plan) for plan in planes]
         except Exception as e:
             print(f"❌ Error obteniendo planes: {e}")
             return []
-        finally:
-            cursor.close()
-            connection.close()
 
     def obtener_plan(self, plan_id: int) -> Optional[Dict]:
-        """Obtiene un plan por ID"""
-        connection = self.get_connection()
-        if not connection:
-            return None
-        
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
+        """Obtiene un plan por ID (cacheado)"""
         try:
-            cursor.execute("SELECT * FROM planes WHERE id = %s", (plan_id,))
-            plan = cursor.fetchone()
+            plan = cache_planes.obtener(
+                ('plan', int(plan_id)),
+                lambda: self._consultar("SELECT * FROM planes WHERE id = %s", (plan_id,), uno=True)
+            )
             return dict(plan) if plan else None
         except Exception as e:
             print(f"❌ Error obteniendo plan: {e}")
             return None
-        finally:
-            cursor.close()
-            connection.close()
 
     # ==================== OPERACIONES DE SUSCRIPCIONES ====================
 
     def obtener_suscripcion_activa(self, user_id: int) -> Optional[Dict]:
-        """Obtiene la suscripción activa de un usuario"""
-        connection = self.get_connection()
-        if not connection:
-            return None
-    
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-    
+        """Obtiene la suscripción activa de un usuario (cacheado; también se cachea 'sin suscripción')"""
         try:
-            cursor.execute("""
+            suscripcion = cache_planes.obtener(('suscripcion', int(user_id)), lambda: self._consultar("""
                 SELECT s.*, p.nombre as plan_nombre, p.precio, p.limite_fuentes, p.limite_scraping_diario, p.descripcion
                 FROM suscripciones s
                 JOIN planes p ON s.plan_id = p.id
                 WHERE s.user_id = %s AND s.activo = TRUE AND s.cancelado = FALSE
                 ORDER BY s.fecha_inicio DESC
                 LIMIT 1
-            """, (user_id,))
-            
-            suscripcion = cursor.fetchone()
+            """, (user_id,), uno=True))
             return dict(suscripcion) if suscripcion else None
         except Exception as e:
             print(f"❌ Error obteniendo suscripción: {e}")
             return None
-        finally:
-            cursor.close()
-            connection.close()
 
     def crear_suscripcion(self, user_id: int, plan_id: int, meses: int = 1) -> Optional[Dict]:
         """Crea o actualiza la suscripción de un usuario"""
@@ -482,6 +612,7 @@ class Database:
             
             nueva_suscripcion = dict(cursor.fetchone())
             connection.commit()
+            self.invalidar_cache_planes(user_id)
             print(f"✅ Suscripción creada para usuario {user_id} al plan {plan_id}")
             return nueva_suscripcion
         except Exception as e:
@@ -494,6 +625,9 @@ class Database:
 
     def verificar_limite_fuentes(self, user_id: int) -> Dict:
         """Verifica si el usuario puede agregar más fuentes según su plan"""
+        # Obtener suscripción activa (antes de tomar otra conexión del pool)
+        suscripcion = self.obtener_suscripcion_activa(user_id)
+        
         connection = self.get_connection()
         if not connection:
             return {'puede_agregar': False, 'mensaje': 'Error de conexión'}
@@ -501,9 +635,6 @@ class Database:
         cursor = connection.cursor(cursor_factory=RealDictCursor)
         
         try:
-            # Obtener suscripción activa
-            suscripcion = self.obtener_suscripcion_activa(user_id)
-            
             # ✅ SI NO HAY SUSCRIPCIÓN ACTIVA, USAR PLAN GRATUITO POR DEFECTO
             if not suscripcion:
                 print(f"ℹ️ Usuario {user_id} sin suscripción activa, aplicando plan Gratuito por defecto")
@@ -613,9 +744,13 @@ class Database:
                     fecha_verificacion = CURRENT_TIMESTAMP,
                     verificado_por = %s
                 WHERE id = %s
+                RETURNING user_id
             """, (estado, verificado_por, pago_id))
+            pago = cursor.fetchone()
             
             connection.commit()
+            if pago:
+                self.invalidar_cache_planes(pago[0])
             print(f"✅ Pago {pago_id} actualizado a estado: {estado}")
             return True
         except Exception as e:
@@ -736,6 +871,7 @@ class Database:
             cursor.execute(query, values)
             nueva_fuente = dict(cursor.fetchone())
             connection.commit()
+            self.marcar_escritura(user_id)
             print(f"✅ Fuente '{fuente['nombre']}' agregada")
             return nueva_fuente
         except Exception as e:
@@ -748,7 +884,7 @@ class Database:
     
     def obtener_fuentes(self, solo_activas: bool = False, user_id: Optional[int] = None, es_admin: bool = False) -> List[Dict]:
         """Obtiene fuentes (filtradas por usuario si no es admin)"""
-        connection = self.get_connection()
+        connection = self.get_connection(lectura=True, user_id=user_id)
         if not connection:
             return []
         
@@ -782,7 +918,7 @@ class Database:
     
     def obtener_fuente(self, fuente_id: int, user_id: Optional[int] = None, es_admin: bool = False) -> Optional[Dict]:
         """Obtiene una fuente por ID (verifica que pertenezca al usuario si no es admin)"""
-        connection = self.get_connection()
+        connection = self.get_connection(lectura=True, user_id=user_id)
         if not connection:
             return None
         
@@ -816,10 +952,16 @@ class Database:
         cursor = connection.cursor()
         
         if not es_admin and user_id is not None:
-            cursor.execute("SELECT user_id FROM fuentes WHERE id = %s", (fuente_id,))
-            resultado = cursor.fetchone()
+            try:
+                cursor.execute("SELECT user_id FROM fuentes WHERE id = %s", (fuente_id,))
+                resultado = cursor.fetchone()
+            except Exception as e:
+                print(f"❌ Error verificando fuente: {e}")
+                resultado = None
             if not resultado or resultado[0] != user_id:
                 print(f"❌ Usuario {user_id} no tiene permiso para actualizar fuente {fuente_id}")
+                cursor.close()
+                connection.close()
                 return None
         
         campos = []
@@ -854,6 +996,8 @@ class Database:
             valores.append(datos['activo'])
         
         if not campos:
+            cursor.close()
+            connection.close()
             return None
         
         campos.append("fecha_actualizacion = CURRENT_TIMESTAMP")
@@ -863,9 +1007,11 @@ class Database:
         
         try:
             cursor.execute(query, valores)
+            # Con otra URL o selectores, la portada "sin cambios" ya no implica noticias sin cambios
+            cursor.execute("DELETE FROM validadores_fuente WHERE fuente_id = %s", (fuente_id,))
             connection.commit()
+            self.marcar_escritura(user_id)
             print(f"✅ Fuente ID {fuente_id} actualizada")
-            return self.obtener_fuente(fuente_id, user_id, es_admin)
         except Exception as e:
             print(f"❌ Error actualizando fuente: {e}")
             connection.rollback()
@@ -873,6 +1019,8 @@ class Database:
         finally:
             cursor.close()
             connection.close()
+        
+        return self.obtener_fuente(fuente_id, user_id, es_admin)
     
     def eliminar_fuente(self, fuente_id: int, user_id: Optional[int] = None, es_admin: bool = False) -> bool:
         """Elimina una fuente (verifica que pertenezca al usuario si no es admin)"""
@@ -890,9 +1038,14 @@ class Database:
                     print(f"❌ Usuario {user_id} no tiene permiso para eliminar fuente {fuente_id}")
                     return False
             
+            # Las noticias de la fuente se borran en cascada; luego se purgan sus artículos sin otros usuarios
+            cursor.execute("DELETE FROM noticias_usuario WHERE fuente_id = %s RETURNING articulo_id", (fuente_id,))
+            articulo_ids = [row[0] for row in cursor.fetchall()]
             cursor.execute("DELETE FROM fuentes WHERE id = %s", (fuente_id,))
-            connection.commit()
             success = cursor.rowcount > 0
+            self._purgar_articulos_huerfanos(cursor, articulo_ids)
+            connection.commit()
+            self.marcar_escritura(user_id)
             if success:
                 print(f"✅ Fuente ID {fuente_id} eliminada")
             return success
@@ -904,121 +1057,630 @@ class Database:
             cursor.close()
             connection.close()
     
-    # ==================== OPERACIONES DE NOTICIAS ====================
-    
-    def guardar_noticia(self, noticia: Dict, user_id: int) -> Optional[int]:
-        """Guarda una noticia en la BD (evita duplicados por URL+user_id)"""
+    def obtener_validadores_fuente(self, fuente_id: int) -> Optional[Dict]:
+        """
+        ETag, Last-Modified y hash de la portada del último scraping guardado de la fuente,
+        y el límite con que se scrapeó. None si no hay (o ante error: se descarga completa).
+        """
         connection = self.get_connection()
         if not connection:
             return None
         
-        cursor = connection.cursor()
-        query = """
-            INSERT INTO noticias (titulo, url, resumen, imagen_url, categoria, pais, fuente_id, user_id, fecha_publicacion)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (url, user_id) DO UPDATE SET 
-                titulo = EXCLUDED.titulo,
-                resumen = EXCLUDED.resumen,
-                imagen_url = EXCLUDED.imagen_url,
-                categoria = EXCLUDED.categoria,
-                pais = EXCLUDED.pais,
-                fecha_publicacion = EXCLUDED.fecha_publicacion,
-                fecha_scraping = CURRENT_TIMESTAMP
-            RETURNING id
-        """
-        
-        values = (
-            noticia['titulo'],
-            noticia['url'],
-            noticia.get('resumen', ''),
-            noticia.get('imagen_url'),
-            noticia.get('categoria'),
-            noticia.get('pais'),
-            noticia.get('fuente_id'),
-            user_id,
-            noticia.get('fecha_publicacion')
-        )
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
         
         try:
-            cursor.execute(query, values)
-            noticia_id = cursor.fetchone()[0]
-            connection.commit()
-            return noticia_id
+            cursor.execute("""
+                SELECT etag, last_modified, hash_contenido, limite
+                FROM validadores_fuente WHERE fuente_id = %s
+            """, (fuente_id,))
+            fila = cursor.fetchone()
+            return dict(fila) if fila else None
         except Exception as e:
-            print(f"❌ Error guardando noticia: {e}")
-            connection.rollback()
+            print(f"⚠️ Error obteniendo validadores de la fuente {fuente_id}: {e}")
             return None
         finally:
             cursor.close()
             connection.close()
     
-    def obtener_noticias(
-        self, 
-        limite: int = 50, 
-        offset: int = 0,
-        fuente_id: Optional[int] = None,
-        categoria: Optional[str] = None,
-        pais: Optional[str] = None,
-        user_id: Optional[int] = None,
-        es_admin: bool = False
-    ):
-        """Obtiene noticias de la BD con paginación y filtros. Retorna (noticias, total)"""
+    def guardar_validadores_fuente(
+        self,
+        fuente_id: int,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        hash_contenido: str,
+        limite: int
+    ) -> bool:
+        """Registra los validadores de la portada tras guardar sus noticias"""
         connection = self.get_connection()
         if not connection:
-            return [], 0
-        
-        cursor = connection.cursor(cursor_factory=RealDictCursor)
-        
-        where_clause = "WHERE 1=1"
-        parametros = []
-        
-        if not es_admin and user_id is not None:
-            where_clause += " AND n.user_id = %s"
-            parametros.append(int(user_id))
+            return False
         
-        if fuente_id is not None:
-            where_clause += " AND n.fuente_id = %s"
-            parametros.append(int(fuente_id))
+        cursor = connection.cursor()
         
-        if categoria:
-            where_clause += " AND n.categoria = %s"
+        try:
+            cursor.execute("""
+                INSERT INTO validadores_fuente (fuente_id, etag, last_modified, hash_contenido, limite)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (fuente_id) DO UPDATE SET
+                    etag = EXCLUDED.etag,
+                    last_modified = EXCLUDED.last_modified,
+                    hash_contenido = EXCLUDED.hash_contenido,
+                    limite = EXCLUDED.limite,
+                    fecha_actualizacion = CURRENT_TIMESTAMP
+            """, (fuente_id, etag, last_modified, hash_contenido, limite))
+            connection.commit()
+            return True
+        except Exception as e:
+            print(f"⚠️ Error guardando validadores de la fuente {fuente_id}: {e}")
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    # ==================== OPERACIONES DE NOTICIAS ====================
+    
+    # Tablas de dimensión de noticias_usuario (categoria_id, pais_id)
+    DIMENSIONES = ('categorias', 'paises')
+    
+    def _ids_dimension(self, cursor, tabla: str, nombres) -> Dict[str, int]:
+        """
+        Ids de `nombres` en la tabla de dimensión, creando los que falten.
+        Solo inserta los que no existen: con ON CONFLICT a secas cada repetido
+        consumiría un valor de la secuencia SMALLSERIAL.
+        """
+        if tabla not in self.DIMENSIONES:
+            raise ValueError(f"Dimensión no válida: {tabla}")
+        
+        ids = {}
+        faltantes = []
+        for nombre in set(nombres):
+            if not nombre:
+                continue
+            encontrado = cache_dimensiones.obtener((tabla, nombre), lambda: None, cachear_si=lambda valor: False)
+            if encontrado is None:
+                faltantes.append(nombre)
+            else:
+                ids[nombre] = encontrado
+        
+        if faltantes:
+            # Orden fijo: dos lotes concurrentes bloquean los mismos nombres en el mismo orden
+            faltantes.sort()
+            cursor.execute(f"""
+                INSERT INTO {tabla} (nombre)
+                SELECT n.nombre FROM unnest(%s::varchar[]) AS n(nombre)
+                WHERE NOT EXISTS (SELECT 1 FROM {tabla} d WHERE d.nombre = n.nombre)
+                ON CONFLICT (nombre) DO NOTHING
+            """, (faltantes,))
+            cursor.execute(f"SELECT nombre, id FROM {tabla} WHERE nombre = ANY(%s)", (faltantes,))
+            ids.update(dict(cursor.fetchall()))
+        return ids
+    
+    @staticmethod
+    def _cachear_dimension(tabla: str, ids: Dict[str, int]):
+        """Guarda en caché ids de dimensión (llamar después del commit)"""
+        for nombre, dimension_id in ids.items():
+            cache_dimensiones.guardar((tabla, nombre), dimension_id)
+    
+    def guardar_noticia(self, noticia: Dict, user_id: int) -> Optional[int]:
+        """Guarda una noticia en la BD (evita duplicados por URL+user_id)"""
+        return self.guardar_noticias_batch([noticia], user_id)[0]
+    
+    def guardar_noticias_batch(self, noticias: List[Dict], user_id: int, tamano_pagina: int = 200) -> List[Optional[int]]:
+        """Guarda varias noticias y retorna sus ids en el mismo orden (None si no se pudo guardar)"""
+        return self.guardar_noticias_lote(noticias, user_id, tamano_pagina)['ids']
+    
+    # Clave (primer entero) del advisory lock que serializa la escritura de vínculos por usuario
+    LOCK_VINCULOS_USUARIO = 72_410_502
+    
+    def guardar_noticias_lote(self, noticias: List[Dict], user_id: int, tamano_pagina: int = 200) -> Dict:
+        """
+        Guarda varias noticias en una sola transacción.
+        El artículo se guarda una sola vez en articulos (por URL normalizada) y el
+        usuario lo referencia desde noticias_usuario; ambos con INSERT multi-fila.
+        Solo se escriben las filas cuyo contenido cambió: re-scrapear lo mismo no genera escrituras.
+        
+        Retorna:
+            ids: ids de noticias_usuario en el mismo orden que `noticias` (None si no se pudo guardar)
+            estados: 'insertada', 'actualizada', 'sin_cambios' o None, también en ese orden
+            insertadas, actualizadas, sin_cambios, errores: totales (URLs repetidas cuentan una vez)
+        """
+        resultado = {'ids': [], 'estados': [], 'insertadas': 0, 'actualizadas': 0, 'sin_cambios': 0, 'errores': 0}
+        if not noticias:
+            return resultado
+        
+        fallido = dict(resultado, ids=[None] * len(noticias), estados=[None] * len(noticias), errores=len(noticias))
+        
+        # Una URL inválida (puerto mal formado, None...) cuenta como error y queda con id None
+        urls = []
+        for noticia in noticias:
+            try:
+                urls.append(normalizar_url(noticia['url']))
+            except Exception as e:
+                print(f"⚠️ URL inválida, se omite: {noticia.get('url')!r} ({e})")
+                urls.append(None)
+        invalidas = urls.count(None)
+        
+        # Una URL repetida dentro del lote haría fallar ON CONFLICT; gana la última versión
+        por_url = {}
+        for url, noticia in zip(urls, noticias):
+            if url is not None:
+                por_url[url] = noticia
+        if not por_url:
+            return fallido
+        
+        # ON CONFLICT DO UPDATE bloquea cada fila en conflicto (aunque el WHERE no la actualice):
+        # ordenar por url_hash hace que lotes concurrentes (p.ej. dos secciones del mismo sitio
+        # scrapeadas a la vez) bloqueen los artículos compartidos en el mismo orden y no se interbloqueen
+        filas_articulos = sorted(
+            (
+                hash_url(url),
+                url,
+                noticia['titulo'],
+                noticia.get('resumen', ''),
+                noticia.get('imagen_url'),
+                noticia.get('fecha_publicacion')
+            )
+            for url, noticia in por_url.items()
+        )
+        
+        connection = self.get_connection()
+        if not connection:
+            return fallido
+        
+        cursor = connection.cursor()
+        
+        # Los textos de relleno del scraper no pisan datos reales ya guardados por otro usuario.
+        # El conflicto es por url_hash; ante una colisión (misma hash, otra URL) no se actualiza
+        # nada y esa noticia queda como no guardada. Si los valores finales coinciden con los
+        # guardados tampoco se actualiza (ni tupla muerta ni WAL) y la fila no vuelve en RETURNING.
+        query_articulos = """
+            INSERT INTO articulos AS a (url_hash, url, titulo, resumen, imagen_url, fecha_publicacion)
+            VALUES %s
+            ON CONFLICT (url_hash) DO UPDATE SET 
+                titulo = CASE WHEN EXCLUDED.titulo = 'Sin título' THEN a.titulo ELSE EXCLUDED.titulo END,
+                resumen = CASE WHEN COALESCE(EXCLUDED.resumen, '') IN ('', 'Sin resumen') THEN a.resumen ELSE EXCLUDED.resumen END,
+                imagen_url = COALESCE(EXCLUDED.imagen_url, a.imagen_url),
+                fecha_publicacion = COALESCE(EXCLUDED.fecha_publicacion, a.fecha_publicacion),
+                fecha_actualizacion = CURRENT_TIMESTAMP
+            WHERE a.url = EXCLUDED.url
+              AND (a.titulo, a.resumen, a.imagen_url, a.fecha_publicacion) IS DISTINCT FROM (
+                  CASE WHEN EXCLUDED.titulo = 'Sin título' THEN a.titulo ELSE EXCLUDED.titulo END,
+                  CASE WHEN COALESCE(EXCLUDED.resumen, '') IN ('', 'Sin resumen') THEN a.resumen ELSE EXCLUDED.resumen END,
+                  COALESCE(EXCLUDED.imagen_url, a.imagen_url),
+                  COALESCE(EXCLUDED.fecha_publicacion, a.fecha_publicacion)
+              )
+            RETURNING id, url
+        """
+        # noticias_usuario está particionada por fecha_scraping: no admite un índice único
+        # (user_id, articulo_id), así que se actualizan los vínculos existentes y se insertan
+        # los que faltan, serializando por usuario con un advisory lock de transacción.
+        # Solo se actualizan vínculos cuyo artículo cambió o con otra fuente/categoría/país;
+        # al refrescar fecha_scraping la fila se mueve a la partición del mes actual.
+        query_actualizar = """
+            UPDATE noticias_usuario nu SET 
+                fuente_id = v.fuente_id,
+                categoria_id = v.categoria_id,
+                pais_id = v.pais_id,
+                fecha_scraping = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(user_id, articulo_id, fuente_id, categoria_id, pais_id, articulo_cambiado)
+            WHERE nu.user_id = v.user_id AND nu.articulo_id = v.articulo_id
+              AND (v.articulo_cambiado
+                   OR (nu.fuente_id, nu.categoria_id, nu.pais_id) IS DISTINCT FROM (v.fuente_id, v.categoria_id, v.pais_id))
+            RETURNING nu.id, nu.articulo_id
+        """
+        query_insertar = """
+            INSERT INTO noticias_usuario (user_id, articulo_id, fuente_id, categoria_id, pais_id)
+            VALUES %s
+            RETURNING id, articulo_id
+        """
+        plantilla_vinculo = "(%s::integer, %s::integer, %s::integer, %s::smallint, %s::smallint)"
+        plantilla_actualizar = "(%s::integer, %s::integer, %s::integer, %s::smallint, %s::smallint, %s::boolean)"
+        
+        try:
+            filas = execute_values(cursor, query_articulos, filas_articulos, page_size=tamano_pagina, fetch=True)
+            articulo_por_url = {url: articulo_id for articulo_id, url in filas}
+            cambiados = set(articulo_por_url.values())
+            
+            categoria_ids = self._ids_dimension(cursor, 'categorias', [n.get('categoria') for n in por_url.values()])
+            pais_ids = self._ids_dimension(cursor, 'paises', [n.get('pais') for n in por_url.values()])
+            
+            # Los artículos sin cambios no vuelven en RETURNING: se buscan por el índice de url_hash
+            faltantes = [url for url in por_url if url not in articulo_por_url]
+            if faltantes:
+                cursor.execute(
+                    "SELECT id, url FROM articulos WHERE url_hash = ANY(%s) AND url = ANY(%s)",
+                    ([hash_url(url) for url in faltantes], faltantes)
+                )
+                articulo_por_url.update({url: articulo_id for articulo_id, url in cursor.fetchall()})
+            
+            vinculos = {
+                articulo_por_url[url]: (
+                    user_id,
+                    articulo_por_url[url],
+                    noticia.get('fuente_id'),
+                    categoria_ids.get(noticia.get('categoria')),
+                    pais_ids.get(noticia.get('pais'))
+                )
+                for url, noticia in por_url.items()
+                if url in articulo_por_url
+            }
+            
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", (self.LOCK_VINCULOS_USUARIO, int(user_id or 0)))
+            filas = execute_values(cursor, query_actualizar,
+                                   [v + (articulo_id in cambiados,) for articulo_id, v in vinculos.items()],
+                                   template=plantilla_actualizar, page_size=tamano_pagina, fetch=True)
+            id_por_articulo = {articulo_id: noticia_id for noticia_id, articulo_id in filas}
+            estado_por_articulo = dict.fromkeys(id_por_articulo, 'actualizada')
+            
+            restantes = [articulo_id for articulo_id in vinculos if articulo_id not in id_por_articulo]
+            if restantes:
+                cursor.execute(
+                    "SELECT id, articulo_id FROM noticias_usuario WHERE user_id = %s AND articulo_id = ANY(%s)",
+                    (user_id, restantes)
+                )
+                for noticia_id, articulo_id in cursor.fetchall():
+                    id_por_articulo[articulo_id] = noticia_id
+                    estado_por_articulo[articulo_id] = 'sin_cambios'
+            
+            nuevos = [v for articulo_id, v in vinculos.items() if articulo_id not in id_por_articulo]
+            if nuevos:
+                filas = execute_values(cursor, query_insertar, nuevos,
+                                       template=plantilla_vinculo, page_size=tamano_pagina, fetch=True)
+                for noticia_id, articulo_id in filas:
+                    id_por_articulo[articulo_id] = noticia_id
+                    estado_por_articulo[articulo_id] = 'insertada'
+            connection.commit()
+            self.marcar_escritura(user_id)
+            self._cachear_dimension('categorias', categoria_ids)
+            self._cachear_dimension('paises', pais_ids)
+            
+            articulos = [articulo_por_url.get(url) for url in urls]
+            resultado['ids'] = [id_por_articulo.get(articulo_id) for articulo_id in articulos]
+            resultado['estados'] = [estado_por_articulo.get(articulo_id) for articulo_id in articulos]
+            estados = list(estado_por_articulo.values())
+            resultado['insertadas'] = estados.count('insertada')
+            resultado['actualizadas'] = estados.count('actualizada')
+            resultado['sin_cambios'] = estados.count('sin_cambios')
+            resultado['errores'] = len(por_url) - len(estado_por_articulo) + invalidas
+            return resultado
+        except Exception as e:
+            print(f"❌ Error guardando lote de {len(noticias)} noticias: {e}")
+            connection.rollback()
+            return fallido
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def obtener_articulo_por_url(self, url: str, user_id: Optional[int] = None) -> Optional[Dict]:
+        """
+        Busca un artículo ya guardado (por cualquier usuario) por su URL normalizada.
+        Si se pasa user_id, indica además si ese usuario ya lo tiene ('vinculado').
+        Sirve para no volver a descargar páginas que ya están en el almacén compartido.
+        """
+        url_normalizada = normalizar_url(url)
+        connection = self.get_connection()
+        if not connection:
+            return None
+        
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        
+        try:
+            cursor.execute("""
+                SELECT a.id, a.url, a.titulo, a.resumen, a.imagen_url, a.fecha_publicacion,
+                       EXISTS (
+                           SELECT 1 FROM noticias_usuario nu
+                           WHERE nu.articulo_id = a.id AND nu.user_id = %s
+                       ) AS vinculado
+                FROM articulos a
+                WHERE a.url_hash = %s AND a.url = %s
+            """, (user_id, hash_url(url_normalizada), url_normalizada))
+            articulo = cursor.fetchone()
+            return dict(articulo) if articulo else None
+        except Exception as e:
+            print(f"❌ Error buscando artículo: {e}")
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def obtener_articulos_por_urls(self, urls: List[str], user_id: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Versión por lotes de obtener_articulo_por_url: una sola consulta para todas las URLs.
+        Retorna {url tal como se pasó: artículo} solo para las que ya están guardadas.
+        """
+        normalizadas = {}
+        for url in urls:
+            try:
+                normalizadas[url] = normalizar_url(url)
+            except Exception as e:
+                # Una URL inválida no se encuentra (se tratará como no guardada), sin perder el resto
+                print(f"⚠️ URL inválida, se omite: {url!r} ({e})")
+        if not normalizadas:
+            return {}
+        connection = self.get_connection()
+        if not connection:
+            return {}
+        
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        
+        try:
+            cursor.execute("""
+                SELECT a.id, a.url, a.titulo, a.resumen, a.imagen_url, a.fecha_publicacion,
+                       EXISTS (
+                           SELECT 1 FROM noticias_usuario nu
+                           WHERE nu.articulo_id = a.id AND nu.user_id = %s
+                       ) AS vinculado
+                FROM articulos a
+                WHERE a.url_hash = ANY(%s)
+            """, (user_id, list({hash_url(url) for url in normalizadas.values()})))
+            # Comparar la URL completa descarta colisiones del hash
+            por_url = {articulo['url']: dict(articulo) for articulo in cursor.fetchall()}
+            return {
+                url: por_url[normalizada]
+                for url, normalizada in normalizadas.items()
+                if normalizada in por_url
+            }
+        except Exception as e:
+            print(f"❌ Error buscando artículos: {e}")
+            return {}
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def _filtros_noticias(
+        self,
+        fuente_id: Optional[int] = None,
+        categoria: Optional[str] = None,
+        pais: Optional[str] = None,
+        user_id: Optional[int] = None,
+        es_admin: bool = False
+    ):
+        """Construye el WHERE compartido por los listados de noticias. Retorna (where_clause, parametros)"""
+        where_clause = "WHERE 1=1"
+        parametros = []
+        
+        if not es_admin and user_id is not None:
+            where_clause += " AND n.user_id = %s"
+            parametros.append(int(user_id))
+        
+        if fuente_id is not None:
+            where_clause += " AND n.fuente_id = %s"
+            parametros.append(int(fuente_id))
+        
+        if categoria:
+            where_clause += " AND n.categoria_id = (SELECT id FROM categorias WHERE nombre = %s)"
             parametros.append(categoria)
         
         if pais:
-            where_clause += " AND n.pais = %s"
+            where_clause += " AND n.pais_id = (SELECT id FROM paises WHERE nombre = %s)"
             parametros.append(pais)
         
-        count_query = f"""
-            SELECT COUNT(*) as total
-            FROM noticias n
-            LEFT JOIN fuentes f ON n.fuente_id = f.id
-            {where_clause}
+        return where_clause, parametros
+    
+    # Una noticia = vínculo del usuario (noticias_usuario) + artículo compartido (articulos).
+    # El alias n se mantiene para que _filtros_noticias sirva igual en listados y conteos.
+    _COLUMNAS_NOTICIAS = """
+        n.id, a.titulo, a.url, a.resumen, a.imagen_url, cat.nombre AS categoria, pa.nombre AS pais,
+        n.fuente_id, n.user_id, a.fecha_publicacion, n.fecha_scraping,
+        f.nombre as fuente_nombre
+    """
+    _FROM_NOTICIAS = """
+        FROM noticias_usuario n
+        JOIN articulos a ON a.id = n.articulo_id
+        LEFT JOIN fuentes f ON n.fuente_id = f.id
+        LEFT JOIN categorias cat ON cat.id = n.categoria_id
+        LEFT JOIN paises pa ON pa.id = n.pais_id
+    """
+    
+    def _formatear_noticia(self, row) -> Dict:
+        """Convierte una fila de noticias+fuentes al formato de la API"""
+        noticia = dict(row)
+        noticia['fuente'] = noticia.pop('fuente_nombre', 'Desconocida')
+        noticia['fecha_scraping'] = str(noticia['fecha_scraping'])
+        if noticia.get('fecha_publicacion'):
+            noticia['fecha_publicacion'] = str(noticia['fecha_publicacion'])
+        return noticia
+    
+    # Estrategias de conteo para listados paginados:
+    #   exacto   -> COUNT(*) con los mismos filtros (sin JOIN a fuentes)
+    #   estimado -> estimación de filas del planner (EXPLAIN), costo casi nulo
+    #   cache    -> suma de conteo_noticias, mantenida por triggers al insertar/borrar
+    ESTRATEGIAS_CONTEO = ('exacto', 'estimado', 'cache')
+    
+    def _contar_noticias_con_cursor(
+        self,
+        cursor,
+        estrategia: str,
+        fuente_id: Optional[int] = None,
+        categoria: Optional[str] = None,
+        pais: Optional[str] = None,
+        user_id: Optional[int] = None,
+        es_admin: bool = False
+    ) -> int:
+        """Cuenta noticias con los filtros dados usando la estrategia indicada"""
+        if estrategia == 'cache':
+            where_clause = "WHERE 1=1"
+            parametros = []
+            if not es_admin and user_id is not None:
+                where_clause += " AND c.user_id = %s"
+                parametros.append(int(user_id))
+            if fuente_id is not None:
+                where_clause += " AND c.fuente_id = %s"
+                parametros.append(int(fuente_id))
+            if categoria:
+                where_clause += " AND c.categoria_id = (SELECT id FROM categorias WHERE nombre = %s)"
+                parametros.append(categoria)
+            if pais:
+                where_clause += " AND c.pais_id = (SELECT id FROM paises WHERE nombre = %s)"
+                parametros.append(pais)
+            query = f"SELECT COALESCE(SUM(c.total), 0) FROM conteo_noticias c {where_clause}"
+        else:
+            # Todos los filtros están en el vínculo: el conteo no necesita JOIN a articulos ni fuentes
+            where_clause, parametros = self._filtros_noticias(fuente_id, categoria, pais, user_id, es_admin)
+            query = f"SELECT COUNT(*) FROM noticias_usuario n {where_clause}"
+            if estrategia == 'estimado':
+                query = f"EXPLAIN (FORMAT JSON) SELECT 1 FROM noticias_usuario n {where_clause}"
+        
+        cursor.execute(query, parametros)
+        fila = cursor.fetchone()
+        valor = next(iter(fila.values())) if isinstance(fila, dict) else fila[0]
+        
+        if estrategia == 'estimado':
+            if isinstance(valor, str):
+                valor = json.loads(valor)
+            return int(valor[0]['Plan']['Plan Rows'])
+        return int(valor)
+    
+    def contar_noticias_filtradas(
+        self,
+        estrategia: str = 'exacto',
+        fuente_id: Optional[int] = None,
+        categoria: Optional[str] = None,
+        pais: Optional[str] = None,
+        user_id: Optional[int] = None,
+        es_admin: bool = False
+    ) -> int:
+        """
+        Cuenta noticias con filtros usando una estrategia de ESTRATEGIAS_CONTEO.
+        Lanza ValueError si la estrategia no existe.
+        """
+        if estrategia not in self.ESTRATEGIAS_CONTEO:
+            raise ValueError(f"Estrategia de conteo inválida: {estrategia}. Opciones: {', '.join(self.ESTRATEGIAS_CONTEO)}")
+        
+        connection = self.get_connection(lectura=True, user_id=user_id)
+        if not connection:
+            return 0
+        
+        cursor = connection.cursor()
+        
+        try:
+            return self._contar_noticias_con_cursor(cursor, estrategia, fuente_id, categoria, pais, user_id, es_admin)
+        except Exception as e:
+            print(f"❌ Error contando noticias ({estrategia}): {e}")
+            return 0
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def obtener_facetas_noticias(
+        self,
+        fuente_id: Optional[int] = None,
+        categoria: Optional[str] = None,
+        pais: Optional[str] = None,
+        user_id: Optional[int] = None,
+        es_admin: bool = False
+    ) -> Dict:
+        """
+        Conteos por fuente, categoría y país para los filtros dados, en una sola consulta
+        GROUPING SETS sobre conteo_noticias (resumen por usuario mantenido por triggers).
+        Cada faceta aplica los filtros de las otras pero no el suyo, para que el desplegable
+        muestre también las alternativas al valor elegido. Las noticias sin categoría/país/fuente
+        cuentan en el total pero no aparecen como valor.
+        """
+        parametros = {
+            'user_id': int(user_id) if user_id is not None else None,
+            'fuente_id': fuente_id,
+            'categoria': categoria or None,
+            'pais': pais or None
+        }
+        por_fuente = "(%(fuente_id)s::integer IS NULL OR c.fuente_id = %(fuente_id)s)"
+        por_categoria = "(%(categoria)s::varchar IS NULL OR c.categoria_id = (SELECT id FROM categorias WHERE nombre = %(categoria)s))"
+        por_pais = "(%(pais)s::varchar IS NULL OR c.pais_id = (SELECT id FROM paises WHERE nombre = %(pais)s))"
+        filtro_usuario = "" if es_admin or user_id is None else "WHERE c.user_id = %(user_id)s"
+        
+        query = f"""
+            WITH grupos AS (
+                SELECT c.fuente_id, c.categoria_id, c.pais_id,
+                       GROUPING(c.fuente_id, c.categoria_id, c.pais_id) AS grupo,
+                       SUM(c.total) FILTER (WHERE {por_categoria} AND {por_pais}) AS total_fuente,
+                       SUM(c.total) FILTER (WHERE {por_fuente} AND {por_pais}) AS total_categoria,
+                       SUM(c.total) FILTER (WHERE {por_fuente} AND {por_categoria}) AS total_pais,
+                       SUM(c.total) FILTER (WHERE {por_fuente} AND {por_categoria} AND {por_pais}) AS total
+                FROM conteo_noticias c
+                {filtro_usuario}
+                GROUP BY GROUPING SETS ((c.fuente_id), (c.categoria_id), (c.pais_id), ())
+            )
+            SELECT g.grupo, g.fuente_id, f.nombre, g.categoria_id, cat.nombre, g.pais_id, pa.nombre,
+                   CASE g.grupo WHEN 3 THEN g.total_fuente WHEN 5 THEN g.total_categoria
+                                WHEN 6 THEN g.total_pais ELSE g.total END AS total
+            FROM grupos g
+            LEFT JOIN fuentes f ON f.id = g.fuente_id
+            LEFT JOIN categorias cat ON cat.id = g.categoria_id
+            LEFT JOIN paises pa ON pa.id = g.pais_id
+        """
+        
+        connection = self.get_connection(lectura=True, user_id=user_id)
+        if not connection:
+            raise ConnectionError("Sin conexión a la base de datos")
+        
+        cursor = connection.cursor()
+        
+        try:
+            cursor.execute(query, parametros)
+            facetas = {'total': 0, 'fuentes': [], 'categorias': [], 'paises': []}
+            # GROUPING(...) = 3 -> por fuente, 5 -> por categoría, 6 -> por país, 7 -> total
+            for grupo, f_id, f_nombre, cat_id, cat_nombre, p_id, p_nombre, total in cursor.fetchall():
+                total = int(total or 0)
+                if grupo == 7:
+                    facetas['total'] = total
+                elif total <= 0:
+                    continue
+                elif grupo == 3 and f_nombre:
+                    facetas['fuentes'].append({'id': f_id, 'nombre': f_nombre, 'total': total})
+                elif grupo == 5 and cat_nombre:
+                    facetas['categorias'].append({'nombre': cat_nombre, 'total': total})
+                elif grupo == 6 and p_nombre:
+                    facetas['paises'].append({'nombre': p_nombre, 'total': total})
+            for lista in (facetas['fuentes'], facetas['categorias'], facetas['paises']):
+                lista.sort(key=lambda valor: (-valor['total'], valor['nombre']))
+            return facetas
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def obtener_noticias(
+        self, 
+        limite: int = 50, 
+        offset: int = 0,
+        fuente_id: Optional[int] = None,
+        categoria: Optional[str] = None,
+        pais: Optional[str] = None,
+        user_id: Optional[int] = None,
+        es_admin: bool = False,
+        conteo: str = 'exacto'
+    ):
+        """
+        Obtiene noticias de la BD con paginación y filtros. Retorna (noticias, total)
+        `conteo` elige cómo se calcula total (ver ESTRATEGIAS_CONTEO).
+        Lanza ValueError si la estrategia no existe.
         """
+        if conteo not in self.ESTRATEGIAS_CONTEO:
+            raise ValueError(f"Estrategia de conteo inválida: {conteo}. Opciones: {', '.join(self.ESTRATEGIAS_CONTEO)}")
+        
+        connection = self.get_connection(lectura=True, user_id=user_id)
+        if not connection:
+            return [], 0
+        
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        
+        where_clause, parametros = self._filtros_noticias(fuente_id, categoria, pais, user_id, es_admin)
         
         try:
-            cursor.execute(count_query, parametros)
-            total = cursor.fetchone()['total']
+            total = self._contar_noticias_con_cursor(cursor, conteo, fuente_id, categoria, pais, user_id, es_admin)
             
             query = f"""
-                SELECT n.*, f.nombre as fuente_nombre
-                FROM noticias n
-                LEFT JOIN fuentes f ON n.fuente_id = f.id
+                SELECT {self._COLUMNAS_NOTICIAS}
+                {self._FROM_NOTICIAS}
                 {where_clause}
-                ORDER BY n.fecha_scraping DESC LIMIT %s OFFSET %s
+                ORDER BY n.fecha_scraping DESC, n.id DESC LIMIT %s OFFSET %s
             """
             query_params = parametros.copy()
             query_params.extend([limite, offset])
             
             cursor.execute(query, query_params)
             
-            noticias = []
-            for row in cursor.fetchall():
-                noticia = dict(row)
-                noticia['fuente'] = noticia.pop('fuente_nombre', 'Desconocida')
-                noticia['fecha_scraping'] = str(noticia['fecha_scraping'])
-                if noticia.get('fecha_publicacion'):
-                    noticia['fecha_publicacion'] = str(noticia['fecha_publicacion'])
-                noticias.append(noticia)
+            noticias = [self._formatear_noticia(row) for row in cursor.fetchall()]
             
             return noticias, total
         except Exception as e:
@@ -1028,15 +1690,141 @@ class Database:
             cursor.close()
             connection.close()
     
+    def obtener_noticias_por_cursor(
+        self,
+        limite: int = 50,
+        cursor_pagina: Optional[str] = None,
+        fuente_id: Optional[int] = None,
+        categoria: Optional[str] = None,
+        pais: Optional[str] = None,
+        user_id: Optional[int] = None,
+        es_admin: bool = False
+    ):
+        """
+        Obtiene noticias con paginación keyset sobre (fecha_scraping, id).
+        Cada página cuesta lo mismo sin importar la profundidad (no usa OFFSET ni COUNT).
+        Retorna (noticias, siguiente_cursor); siguiente_cursor es None en la última página.
+        Lanza ValueError si cursor_pagina es inválido.
+        """
+        posicion = decodificar_cursor(cursor_pagina) if cursor_pagina else None
+        
+        connection = self.get_connection(lectura=True, user_id=user_id)
+        if not connection:
+            return [], None
+        
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        
+        where_clause, parametros = self._filtros_noticias(fuente_id, categoria, pais, user_id, es_admin)
+        
+        if posicion:
+            where_clause += " AND (n.fecha_scraping, n.id) < (%s, %s)"
+            parametros.extend(posicion)
+        
+        query = f"""
+            SELECT {self._COLUMNAS_NOTICIAS}
+            {self._FROM_NOTICIAS}
+            {where_clause}
+            ORDER BY n.fecha_scraping DESC, n.id DESC
+            LIMIT %s
+        """
+        # Se pide una fila extra para saber si hay página siguiente
+        parametros.append(limite + 1)
+        
+        try:
+            cursor.execute(query, parametros)
+            filas = cursor.fetchall()
+            
+            siguiente_cursor = None
+            if len(filas) > limite:
+                filas = filas[:limite]
+                ultima = filas[-1]
+                siguiente_cursor = codificar_cursor(ultima['fecha_scraping'], ultima['id'])
+            
+            noticias = [self._formatear_noticia(row) for row in filas]
+            return noticias, siguiente_cursor
+        except Exception as e:
+            print(f"❌ Error obteniendo noticias por cursor: {e}")
+            return [], None
+        finally:
+            cursor.close()
+            connection.close()
+    
+    # ==================== LECTURAS EN STREAMING ====================
+    
+    def iterar_consulta(self, query: str, parametros=None, itersize: int = 2000, como_dict: bool = True,
+                        lectura: bool = False, user_id: Optional[int] = None):
+        """
+        Ejecuta una consulta con un cursor del lado del servidor (named cursor) y
+        entrega las filas de forma perezosa, trayéndolas en bloques de `itersize`.
+        La memoria se mantiene plana sin importar cuántas filas haya.
+        
+        La conexión queda prestada mientras se consume el generador; se devuelve
+        al pool al agotarlo o al cerrarlo (p.ej. al salir del for con break).
+        Es propia y no la de la petición: una respuesta en streaming sigue leyendo tras el teardown.
+        Con lectura=True puede ir a una réplica (ver get_connection).
+        
+        Los errores (sin conexión, al ejecutar o al leer) se lanzan al consumidor: un generador
+        que simplemente terminara se confundiría con "no hay filas" o con el final de los datos.
+        """
+        connection = self.get_connection(compartida=False, lectura=lectura, user_id=user_id)
+        if not connection:
+            raise ConnectionError("Sin conexión a la base de datos")
+        
+        cursor = connection.cursor(
+            name=f"stream_{uuid.uuid4().hex}",
+            cursor_factory=RealDictCursor if como_dict else None
+        )
+        cursor.itersize = itersize
+        
+        try:
+            cursor.execute(query, parametros)
+            for row in cursor:
+                yield row
+        except Exception as e:
+            print(f"❌ Error en lectura en streaming: {e}")
+            raise
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+            connection.close()
+    
+    def iterar_noticias(
+        self,
+        fuente_id: Optional[int] = None,
+        categoria: Optional[str] = None,
+        pais: Optional[str] = None,
+        user_id: Optional[int] = None,
+        es_admin: bool = False,
+        limite: Optional[int] = None,
+        itersize: int = 1000
+    ):
+        """Versión en streaming de obtener_noticias: genera noticias ya formateadas, sin paginar ni contar"""
+        where_clause, parametros = self._filtros_noticias(fuente_id, categoria, pais, user_id, es_admin)
+        
+        query = f"""
+            SELECT {self._COLUMNAS_NOTICIAS}
+            {self._FROM_NOTICIAS}
+            {where_clause}
+            ORDER BY n.fecha_scraping DESC, n.id DESC
+        """
+        if limite is not None:
+            query += " LIMIT %s"
+            parametros.append(int(limite))
+        
+        for row in self.iterar_consulta(query, parametros, itersize=itersize, lectura=True, user_id=user_id):
+            yield self._formatear_noticia(row)
+    
     def contar_noticias(self, user_id: Optional[int] = None, es_admin: bool = False) -> int:
         """Cuenta el total de noticias en la BD (filtrado por usuario si no es admin)"""
-        connection = self.get_connection()
+        connection = self.get_connection(lectura=True, user_id=user_id)
         if not connection:
             return 0
         
         cursor = connection.cursor()
         try:
-            query = "SELECT COUNT(*) FROM noticias"
+            query = "SELECT COUNT(*) FROM noticias_usuario"
             params = []
             
             if not es_admin and user_id is not None:
@@ -1053,99 +1841,142 @@ class Database:
             cursor.close()
             connection.close()
     
-    def limpiar_noticias(self, user_id: Optional[int] = None, es_admin: bool = False) -> bool:
-        """Elimina noticias (del usuario o todas si es admin)"""
+    def borrar_noticias_lote(self, user_id: Optional[int] = None, es_admin: bool = False, tamano_lote: int = 5000) -> Dict:
+        """
+        Borra como máximo `tamano_lote` noticias (del usuario o de todos si es admin) en una
+        transacción corta, y purga los artículos que quedaron sin usuarios.
+        Retorna {'borradas', 'articulos_purgados'}; borradas == 0 indica que no queda nada.
+        """
+        if not es_admin and user_id is None:
+            raise ValueError("Se requiere user_id o permisos de admin")
+        
         connection = self.get_connection()
         if not connection:
-            return False
+            raise ConnectionError("Sin conexión a la base de datos")
         
         cursor = connection.cursor()
+        
+        try:
+            filtro = "" if es_admin else "WHERE user_id = %s"
+            params = [] if es_admin else [int(user_id)]
+            # (id, fecha_scraping) es la PK de la tabla particionada
+            cursor.execute(f"""
+                DELETE FROM noticias_usuario
+                WHERE (id, fecha_scraping) IN (
+                    SELECT id, fecha_scraping FROM noticias_usuario
+                    {filtro}
+                    LIMIT %s
+                )
+                RETURNING articulo_id
+            """, params + [tamano_lote])
+            articulo_ids = [row[0] for row in cursor.fetchall()]
+            purgados = self._purgar_articulos_huerfanos(cursor, articulo_ids)
+            if articulo_ids:
+                # Sin sus noticias, una portada sin cambios no se puede saltar en el próximo scraping
+                cursor.execute(f"""
+                    DELETE FROM validadores_fuente v USING fuentes f
+                    WHERE f.id = v.fuente_id {'' if es_admin else 'AND f.user_id = %s'}
+                """, params)
+            connection.commit()
+            self.marcar_escritura(user_id)
+            return {'borradas': len(articulo_ids), 'articulos_purgados': purgados}
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def limpiar_noticias(self, user_id: Optional[int] = None, es_admin: bool = False, tamano_lote: int = 5000) -> bool:
+        """
+        Elimina noticias (del usuario o todas si es admin) por lotes de `tamano_lote`.
+        Síncrono: la API usa el trabajo en segundo plano de borrado_noticias.py.
+        """
+        if not es_admin and user_id is None:
+            print("⚠️ No se puede limpiar: falta user_id o permisos de admin")
+            return False
+        
         try:
+            total = 0
+            while True:
+                resultado = self.borrar_noticias_lote(user_id, es_admin, tamano_lote)
+                total += resultado['borradas']
+                if resultado['borradas'] < tamano_lote:
+                    break
             if es_admin:
-                cursor.execute("DELETE FROM noticias")
-                print("✅ Todas las noticias eliminadas (admin)")
-            elif user_id is not None:
-                cursor.execute("DELETE FROM noticias WHERE user_id = %s", (int(user_id),))
-                print(f"✅ Noticias del usuario {user_id} eliminadas")
+                print(f"✅ Todas las noticias eliminadas (admin): {total}")
             else:
-                print("⚠️ No se puede limpiar: falta user_id o permisos de admin")
-                return False
-            
-            connection.commit()
+                print(f"✅ Noticias del usuario {user_id} eliminadas: {total}")
             return True
         except Exception as e:
             print(f"❌ Error limpiando noticias: {e}")
-            connection.rollback()
             return False
-        finally:
-            cursor.close()
-            connection.close()
     
-    def obtener_categorias(self, user_id: Optional[int] = None, es_admin: bool = False) -> List[str]:
-        """Obtiene todas las categorías únicas de noticias (filtrado por usuario si no es admin)"""
-        connection = self.get_connection()
+    def _purgar_articulos_huerfanos(self, cursor, articulo_ids: Optional[List[int]] = None) -> int:
+        """
+        Borra artículos que ya ningún usuario referencia.
+        Con articulo_ids solo revisa esos (los de los vínculos recién borrados).
+        """
+        if articulo_ids is not None and not articulo_ids:
+            return 0
+        query = """
+            DELETE FROM articulos a
+            WHERE NOT EXISTS (SELECT 1 FROM noticias_usuario nu WHERE nu.articulo_id = a.id)
+        """
+        params = []
+        if articulo_ids is not None:
+            query += " AND a.id = ANY(%s)"
+            params.append(list(set(articulo_ids)))
+        cursor.execute(query, params)
+        return cursor.rowcount
+    
+    def _obtener_faceta(self, tipo: str, tabla: str, user_id: Optional[int], es_admin: bool) -> List[str]:
+        """Nombres presentes en las noticias del usuario (o de todos si es admin), desde facetas_usuario"""
+        connection = self.get_connection(lectura=True, user_id=user_id)
         if not connection:
             return []
         
         cursor = connection.cursor()
         
         try:
-            query = """
-                SELECT DISTINCT categoria 
-                FROM noticias 
-                WHERE categoria IS NOT NULL
-            """
-            params = []
-            
             if not es_admin and user_id is not None:
-                query += " AND user_id = %s"
-                params.append(int(user_id))
-            
-            query += " ORDER BY categoria"
-            
-            cursor.execute(query, params)
-            categorias = [row[0] for row in cursor.fetchall()]
-            return categorias
-            
-        except Exception as e:
-            print(f"❌ Error obteniendo categorías: {e}")
-            return []
+                cursor.execute(f"""
+                    SELECT d.nombre
+                    FROM facetas_usuario fu
+                    JOIN {tabla} d ON d.id = fu.valor_id
+                    WHERE fu.user_id = %s AND fu.tipo = %s AND fu.total > 0
+                    ORDER BY d.nombre
+                """, (int(user_id), tipo))
+            else:
+                cursor.execute(f"""
+                    SELECT d.nombre
+                    FROM {tabla} d
+                    WHERE EXISTS (
+                        SELECT 1 FROM facetas_usuario fu
+                        WHERE fu.tipo = %s AND fu.valor_id = d.id AND fu.total > 0
+                    )
+                    ORDER BY d.nombre
+                """, (tipo,))
+            return [row[0] for row in cursor.fetchall()]
         finally:
             cursor.close()
             connection.close()
     
+    def obtener_categorias(self, user_id: Optional[int] = None, es_admin: bool = False) -> List[str]:
+        """Obtiene todas las categorías únicas de noticias (filtrado por usuario si no es admin)"""
+        try:
+            return self._obtener_faceta('categoria', 'categorias', user_id, es_admin)
+        except Exception as e:
+            print(f"❌ Error obteniendo categorías: {e}")
+            return []
+    
     def obtener_paises(self, user_id: Optional[int] = None, es_admin: bool = False) -> List[str]:
         """Obtiene todos los países únicos de noticias (filtrado por usuario si no es admin)"""
-        connection = self.get_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor()
-        
         try:
-            query = """
-                SELECT DISTINCT pais 
-                FROM noticias 
-                WHERE pais IS NOT NULL
-            """
-            params = []
-            
-            if not es_admin and user_id is not None:
-                query += " AND user_id = %s"
-                params.append(int(user_id))
-            
-            query += " ORDER BY pais"
-            
-            cursor.execute(query, params)
-            paises = [row[0] for row in cursor.fetchall()]
-            return paises
-            
+            return self._obtener_faceta('pais', 'paises', user_id, es_admin)
         except Exception as e:
             print(f"❌ Error obteniendo países: {e}")
             return []
-        finally:
-            cursor.close()
-            connection.close()
 
     # ==================== OPERACIONES DE SCRAPING DIARIO ====================
 
@@ -1172,8 +2003,37 @@ class Database:
             cursor.close()
             connection.close()
 
+    # Plan vigente del usuario: su suscripción activa más reciente o, si no tiene,
+    # el plan gratuito. Parámetro: %(user_id)s
+    _CTE_PLAN_USUARIO = """
+        suscrito AS (
+            SELECT p.id AS plan_id, p.nombre AS plan_nombre, p.limite_scraping_diario
+            FROM suscripciones s
+            JOIN planes p ON s.plan_id = p.id
+            WHERE s.user_id = %(user_id)s AND s.activo = TRUE AND s.cancelado = FALSE
+            ORDER BY s.fecha_inicio DESC
+            LIMIT 1
+        ),
+        gratuito AS (
+            SELECT id AS plan_id, nombre AS plan_nombre, limite_scraping_diario
+            FROM planes
+            WHERE (nombre ILIKE '%%gratis%%' OR precio = 0)
+              AND NOT EXISTS (SELECT 1 FROM suscrito)
+            ORDER BY precio ASC
+            LIMIT 1
+        ),
+        plan AS (
+            SELECT *, TRUE AS tiene_suscripcion FROM suscrito
+            UNION ALL
+            SELECT *, FALSE AS tiene_suscripcion FROM gratuito
+        )
+    """
+    
+    # Límite por defecto si no hay suscripción ni plan gratuito en la BD
+    LIMITE_SCRAPING_GRATIS = 30
+
     def incrementar_scraping_diario(self, user_id: int, cantidad: int = 1) -> bool:
-        """Incrementa el contador de scraping diario"""
+        """Incrementa el contador de scraping diario (una sola sentencia)"""
         connection = self.get_connection()
         if not connection:
             return False
@@ -1181,19 +2041,16 @@ class Database:
         cursor = connection.cursor()
         
         try:
-            # Obtener suscripción activa
-            suscripcion = self.obtener_suscripcion_activa(user_id)
-            plan_id = suscripcion['plan_id'] if suscripcion else None
-            
-            # Insertar o actualizar registro de hoy
-            cursor.execute("""
+            # Insertar o actualizar registro de hoy con el plan de la suscripción activa
+            cursor.execute(f"""
+                WITH {self._CTE_PLAN_USUARIO}
                 INSERT INTO scraping_diario (user_id, fecha, cantidad, plan_id)
-                VALUES (%s, CURRENT_DATE, %s, %s)
+                VALUES (%(user_id)s, CURRENT_DATE, %(cantidad)s, (SELECT plan_id FROM suscrito))
                 ON CONFLICT (user_id, fecha) 
                 DO UPDATE SET 
                     cantidad = scraping_diario.cantidad + EXCLUDED.cantidad,
                     fecha_actualizacion = CURRENT_TIMESTAMP
-            """, (user_id, cantidad, plan_id))
+            """, {'user_id': user_id, 'cantidad': cantidad})
             
             connection.commit()
             return True
@@ -1206,7 +2063,10 @@ class Database:
             connection.close()
 
     def verificar_limite_scraping(self, user_id: int, cantidad_a_scrapear: int = 1) -> Dict:
-        """Verifica si el usuario puede hacer scraping según su plan"""
+        """
+        Verifica si el usuario puede hacer scraping según su plan.
+        Plan, límite y uso de hoy se resuelven en una sola consulta.
+        """
         connection = self.get_connection()
         if not connection:
             return {'puede_scrapear': False, 'mensaje': 'Error de conexión'}
@@ -1214,39 +2074,32 @@ class Database:
         cursor = connection.cursor(cursor_factory=RealDictCursor)
         
         try:
-            # Obtener suscripción activa
-            suscripcion = self.obtener_suscripcion_activa(user_id)
-            
-            # ✅ SI NO HAY SUSCRIPCIÓN ACTIVA, USAR PLAN GRATUITO POR DEFECTO
-            if not suscripcion:
-                print(f"ℹ️ Usuario {user_id} sin suscripción activa, aplicando plan Gratuito por defecto")
-                
-                # Obtener plan gratuito de la base de datos
-                cursor.execute("""
-                    SELECT id, nombre, limite_fuentes, limite_scraping_diario
-                    FROM planes 
-                    WHERE nombre ILIKE '%gratis%' OR precio = 0
-                    ORDER BY precio ASC
-                    LIMIT 1
-                """)
-                plan_gratuito = cursor.fetchone()
-                
-                if plan_gratuito:
-                    suscripcion = {
-                        'plan_nombre': plan_gratuito['nombre'],
-                        'limite_scraping_diario': plan_gratuito['limite_scraping_diario']
-                    }
-                    print(f"✅ Aplicando plan '{plan_gratuito['nombre']}' con límite de {plan_gratuito['limite_scraping_diario']} scraping/día")
-                else:
-                    # Fallback: Plan gratuito hardcoded si no existe en BD
-                    suscripcion = {
-                        'plan_nombre': 'Gratis',
-                        'limite_scraping_diario': 30
-                    }
-                    print(f"⚠️ Plan gratuito no encontrado en BD, usando límite por defecto: 30 scraping/día")
+            cursor.execute(f"""
+                WITH {self._CTE_PLAN_USUARIO}
+                SELECT
+                    plan.plan_nombre,
+                    plan.limite_scraping_diario AS limite,
+                    COALESCE(plan.tiene_suscripcion, FALSE) AS tiene_suscripcion,
+                    COALESCE((
+                        SELECT cantidad FROM scraping_diario
+                        WHERE user_id = %(user_id)s AND fecha = CURRENT_DATE
+                    ), 0) AS usado_hoy
+                FROM (SELECT 1) AS uno
+                LEFT JOIN plan ON TRUE
+            """, {'user_id': user_id})
+            fila = cursor.fetchone()
             
-            limite = suscripcion['limite_scraping_diario']
-            plan_nombre = suscripcion['plan_nombre']
+            # ✅ SI NO HAY SUSCRIPCIÓN ACTIVA, SE USA EL PLAN GRATUITO POR DEFECTO
+            if fila['plan_nombre'] is None:
+                # Fallback: Plan gratuito hardcoded si no existe en BD
+                plan_nombre = 'Gratis'
+                limite = self.LIMITE_SCRAPING_GRATIS
+                print(f"⚠️ Plan gratuito no encontrado en BD, usando límite por defecto: {limite} scraping/día")
+            else:
+                plan_nombre = fila['plan_nombre']
+                limite = fila['limite']
+                if not fila['tiene_suscripcion']:
+                    print(f"ℹ️ Usuario {user_id} sin suscripción activa, aplicando plan '{plan_nombre}' ({limite} scraping/día)")
             
             # Si limite es -1, es ilimitado
             if limite == -1:
@@ -1258,9 +2111,7 @@ class Database:
                     'plan': plan_nombre
                 }
             
-            # Obtener scraping de hoy
-            scraping_hoy = self.obtener_scraping_hoy(user_id)
-            usado_hoy = scraping_hoy.get('cantidad', 0)
+            usado_hoy = fila['usado_hoy']
             disponible = max(0, limite - usado_hoy)
             
             puede_scrapear = (usado_hoy + cantidad_a_scrapear) <= limite
@@ -1288,6 +2139,123 @@ class Database:
             cursor.close()
             connection.close()
 
+    # ==================== RESERVA DE CUOTA DE SCRAPING ====================
+    # Protocolo reservar -> confirmar/liberar sobre scraping_diario:
+    #   1. reservar_scraping suma la cantidad pedida solo si cabe en el límite
+    #      (INSERT ... ON CONFLICT DO UPDATE ... WHERE condicional). La fila del
+    #      usuario se bloquea solo durante esa sentencia, así que peticiones
+    #      concurrentes no pueden pasar el límite entre todas.
+    #   2. Al terminar, confirmar_scraping devuelve la parte no usada (lo contado
+    #      nunca supera lo reservado); si la ejecución falla, liberar_scraping
+    #      devuelve toda la reserva.
+    
+    def reservar_scraping(self, user_id: int, cantidad: int) -> Dict:
+        """
+        Reserva atómicamente `cantidad` de la cuota diaria del usuario.
+        Retorna el mismo formato que verificar_limite_scraping; si se concedió,
+        incluye 'reserva' para pasarla luego a confirmar_scraping/liberar_scraping.
+        """
+        cantidad = max(0, int(cantidad))
+        connection = self.get_connection()
+        if not connection:
+            return {'puede_scrapear': False, 'mensaje': 'Error de conexión'}
+        
+        cursor = connection.cursor(cursor_factory=RealDictCursor)
+        
+        try:
+            cursor.execute(f"""
+                WITH {self._CTE_PLAN_USUARIO},
+                lim AS (
+                    SELECT
+                        COALESCE((SELECT limite_scraping_diario FROM plan), %(limite_defecto)s) AS limite,
+                        COALESCE((SELECT plan_nombre FROM plan), 'Gratis') AS plan_nombre
+                )
+                INSERT INTO scraping_diario (user_id, fecha, cantidad, plan_id)
+                SELECT %(user_id)s, CURRENT_DATE, %(cantidad)s, (SELECT plan_id FROM suscrito)
+                FROM lim
+                WHERE lim.limite = -1 OR %(cantidad)s <= lim.limite
+                ON CONFLICT (user_id, fecha)
+                DO UPDATE SET
+                    cantidad = scraping_diario.cantidad + EXCLUDED.cantidad,
+                    fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE (SELECT limite FROM lim) = -1
+                   OR scraping_diario.cantidad + EXCLUDED.cantidad <= (SELECT limite FROM lim)
+                RETURNING
+                    fecha,
+                    cantidad AS usado_hoy,
+                    (SELECT limite FROM lim) AS limite,
+                    (SELECT plan_nombre FROM lim) AS plan_nombre
+            """, {'user_id': user_id, 'cantidad': cantidad, 'limite_defecto': self.LIMITE_SCRAPING_GRATIS})
+            fila = cursor.fetchone()
+            connection.commit()
+        except Exception as e:
+            print(f"❌ Error reservando cuota de scraping: {e}")
+            connection.rollback()
+            return {'puede_scrapear': False, 'mensaje': f'Error verificando límite: {str(e)}'}
+        finally:
+            cursor.close()
+            connection.close()
+        
+        if not fila:
+            # Rechazada: no se tocó el contador, se informa el estado actual
+            return self.verificar_limite_scraping(user_id, cantidad)
+        
+        limite = fila['limite']
+        usado_hoy = fila['usado_hoy']
+        disponible = -1 if limite == -1 else max(0, limite - usado_hoy)
+        return {
+            'puede_scrapear': True,
+            'limite': limite,
+            'usado_hoy': usado_hoy,
+            'disponible': disponible,
+            'plan': fila['plan_nombre'],
+            'mensaje': f'Reservadas {cantidad} noticias. Disponibles: {disponible}',
+            'reserva': {'user_id': user_id, 'fecha': fila['fecha'], 'cantidad': cantidad}
+        }
+    
+    def liberar_scraping(self, reserva: Dict, cantidad: Optional[int] = None) -> bool:
+        """Devuelve a la cuota `cantidad` de una reserva (toda la reserva si es None)"""
+        devolver = reserva['cantidad'] if cantidad is None else min(int(cantidad), reserva['cantidad'])
+        if devolver <= 0:
+            return True
+        
+        connection = self.get_connection()
+        if not connection:
+            return False
+        
+        cursor = connection.cursor()
+        
+        try:
+            # Sobre la fecha de la reserva, aunque la ejecución haya cruzado la medianoche
+            cursor.execute("""
+                UPDATE scraping_diario
+                SET cantidad = GREATEST(cantidad - %s, 0),
+                    fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE user_id = %s AND fecha = %s
+            """, (devolver, reserva['user_id'], reserva['fecha']))
+            connection.commit()
+            return True
+        except Exception as e:
+            print(f"❌ Error liberando cuota de scraping: {e}")
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def confirmar_scraping(self, reserva: Dict, usado: int) -> bool:
+        """
+        Cierra una reserva con lo realmente scrapeado: devuelve la parte no usada.
+        Lo contado nunca supera lo reservado: sumar un exceso sin verificar el límite
+        permitiría que peticiones concurrentes lo rebasen.
+        """
+        usado = max(0, int(usado))
+        if usado > reserva['cantidad']:
+            print(f"⚠️ Scraping usó {usado} de {reserva['cantidad']} reservadas (usuario {reserva['user_id']}); se cuenta lo reservado")
+        if usado < reserva['cantidad']:
+            return self.liberar_scraping(reserva, reserva['cantidad'] - usado)
+        return True
+
     def resetear_scraping_antiguo(self) -> bool:
         """Elimina registros de scraping antiguos (más de 30 días)"""
         connection = self.get_connection()
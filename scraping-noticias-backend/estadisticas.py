@@ -12,7 +12,7 @@ class Estadisticas:
         Si user_id es None o es_admin es True, muestra stats globales
         Si user_id está presente y no es admin, filtra por usuario
         """
-        connection = self.db.get_connection()
+        connection = self.db.get_connection(lectura=True, user_id=user_id)
         if not connection:
             return {}
         
@@ -63,15 +63,17 @@ class Estadisticas:
             ]
             
             # Noticias de las últimas 24 horas
+            # LOCALTIMESTAMP (mismo tipo que fecha_scraping, sin zona horaria) permite
+            # descartar las particiones mensuales fuera de la ventana
             if es_admin or user_id is None:
                 cursor.execute("""
                     SELECT COUNT(*) FROM noticias 
-                    WHERE fecha_scraping >= NOW() - INTERVAL '24 hours'
+                    WHERE fecha_scraping >= LOCALTIMESTAMP - INTERVAL '24 hours'
                 """)
             else:
                 cursor.execute("""
                     SELECT COUNT(*) FROM noticias 
-                    WHERE fecha_scraping >= NOW() - INTERVAL '24 hours'
+                    WHERE fecha_scraping >= LOCALTIMESTAMP - INTERVAL '24 hours'
                     AND user_id = %s
                 """, (user_id,))
             noticias_24h = cursor.fetchone()[0]
@@ -80,12 +82,12 @@ class Estadisticas:
             if es_admin or user_id is None:
                 cursor.execute("""
                     SELECT COUNT(*) FROM noticias 
-                    WHERE fecha_scraping >= NOW() - INTERVAL '7 days'
+                    WHERE fecha_scraping >= LOCALTIMESTAMP - INTERVAL '7 days'
                 """)
             else:
                 cursor.execute("""
                     SELECT COUNT(*) FROM noticias 
-                    WHERE fecha_scraping >= NOW() - INTERVAL '7 days'
+                    WHERE fecha_scraping >= LOCALTIMESTAMP - INTERVAL '7 days'
                     AND user_id = %s
                 """, (user_id,))
             noticias_semana = cursor.fetchone()[0]
@@ -134,7 +136,7 @@ class Estadisticas:
     
     def obtener_tendencias(self, dias: int = 7, user_id: Optional[int] = None, es_admin: bool = False) -> List[Dict]:
         """Obtiene tendencias de scraping por día (filtradas por usuario si no es admin)"""
-        connection = self.db.get_connection()
+        connection = self.db.get_connection(lectura=True, user_id=user_id)
         if not connection:
             return []
         
@@ -147,7 +149,7 @@ class Estadisticas:
                         DATE(fecha_scraping) as fecha,
                         COUNT(*) as total_noticias
                     FROM noticias
-                    WHERE fecha_scraping >= NOW() - INTERVAL '%s days'
+                    WHERE fecha_scraping >= LOCALTIMESTAMP - INTERVAL '%s days'
                     GROUP BY DATE(fecha_scraping)
                     ORDER BY fecha DESC
                 """, (dias,))
@@ -157,7 +159,7 @@ class Estadisticas:
                         DATE(fecha_scraping) as fecha,
                         COUNT(*) as total_noticias
                     FROM noticias
-                    WHERE fecha_scraping >= NOW() - INTERVAL '%s days'
+                    WHERE fecha_scraping >= LOCALTIMESTAMP - INTERVAL '%s days'
                     AND user_id = %s
                     GROUP BY DATE(fecha_scraping)
                     ORDER BY fecha DESC
@@ -181,7 +183,7 @@ class Estadisticas:
     
     def obtener_top_fuentes(self, limite: int = 5, user_id: Optional[int] = None, es_admin: bool = False) -> List[Dict]:
         """Obtiene las fuentes con más noticias (filtradas por usuario si no es admin)"""
-        connection = self.db.get_connection()
+        connection = self.db.get_connection(lectura=True, user_id=user_id)
         if not connection:
             return []
         
@@ -298,7 +300,7 @@ class Estadisticas:
         
         try:
             if cursor is None:
-                connection = self.db.get_connection()
+                connection = self.db.get_connection(lectura=True, user_id=user_id)
                 if not connection:
                     self._log("Error: No hay conexión DB en obtener_datos_ia")
                     return {}
@@ -427,7 +429,7 @@ class Estadisticas:
             # 3. Termómetro y Alertas de Sentimiento
             cursor.execute("""
                 SELECT titulo, categoria FROM noticias 
-                WHERE user_id = %s AND fecha_scraping >= NOW() - INTERVAL '24 hours'
+                WHERE user_id = %s AND fecha_scraping >= LOCALTIMESTAMP - INTERVAL '24 hours'
             """, (user_id,))
             noticias_recientes = cursor.fetchall()
             
@@ -483,7 +485,7 @@ class Estadisticas:
         Incluye predicción de tendencias basada en frecuencia de palabras.
         """
         self._log(f"Iniciando dashboard personalizado para user_id={user_id}")
-        connection = self.db.get_connection()
+        connection = self.db.get_connection(lectura=True, user_id=user_id)
         if not connection:
             self._log("Error: No hay conexión DB en dashboard")
             return {}
@@ -538,7 +540,7 @@ class Estadisticas:
                     EXTRACT(HOUR FROM fecha_scraping) as hora,
                     COUNT(*) as cantidad
                 FROM noticias
-                WHERE user_id = %s AND fecha_scraping >= NOW() - INTERVAL '24 hours'
+                WHERE user_id = %s AND fecha_scraping >= LOCALTIMESTAMP - INTERVAL '24 hours'
                 GROUP BY hora
                 ORDER BY hora
             """, (user_id,))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Script para revisar qué índices usan las consultas de lectura
+Ejecuta los métodos de Database, Estadisticas y BusquedaAvanzada, captura cada
+SELECT y lo pasa por EXPLAIN ANALYZE, reportando índices usados y escaneos secuenciales.
+
+Ejecutar: python explicar_consultas.py [--user-id N]
+"""
+
+import json
+import re
+import sys
+import time
+
+from database import Database
+from estadisticas import Estadisticas
+from busqueda import BusquedaAvanzada
+
+
+class _CursorExplicado:
+    """Cursor que, antes de cada SELECT, ejecuta EXPLAIN ANALYZE con los mismos parámetros"""
+
+    def __init__(self, cursor, connection, registro, etiqueta):
+        self._cursor = cursor
+        self._connection = connection
+        self._registro = registro
+        self._etiqueta = etiqueta
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, parametros=None):
+        if re.match(r'\s*(SELECT|WITH)\b', sql, re.IGNORECASE):
+            self._explicar(sql, parametros)
+        return self._cursor.execute(sql, parametros)
+
+    def _explicar(self, sql, parametros):
+        explain = self._connection.cursor()
+        try:
+            explain.execute("SAVEPOINT explicar")
+            explain.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, parametros)
+            plan = explain.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            explain.execute("RELEASE SAVEPOINT explicar")
+            self._registro.append((self._etiqueta, sql, plan[0]))
+        except Exception as e:
+            explain.execute("ROLLBACK TO SAVEPOINT explicar")
+            self._registro.append((self._etiqueta, sql, {'error': str(e)}))
+        finally:
+            explain.close()
+
+
+class _ConexionExplicada:
+    def __init__(self, connection, registro, etiqueta):
+        self._connection = connection
+        self._registro = registro
+        self._etiqueta = etiqueta
+
+    def __getattr__(self, nombre):
+        return getattr(self._connection, nombre)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._connection.cursor(*args, **kwargs)
+        return _CursorExplicado(cursor, self._connection, self._registro, self._etiqueta[0])
+
+
+def _instrumentar(db: Database, registro: list, etiqueta: list):
+    """Reemplaza get_connection de esta instancia para capturar sus consultas"""
+    original = db.get_connection
+
+    def get_connection(*args, **kwargs):
+        connection = original(*args, **kwargs)
+        if not connection:
+            return None
+        return _ConexionExplicada(connection, registro, etiqueta)
+
+    db.get_connection = get_connection
+
+
+def _recorrer_plan(nodo, indices, secuenciales):
+    tipo = nodo.get('Node Type', '')
+    if 'Index Name' in nodo:
+        indices.add(f"{nodo['Index Name']} ({tipo})")
+    if tipo == 'Seq Scan':
+        secuenciales.add(nodo.get('Relation Name', '?'))
+    for hijo in nodo.get('Plans', []):
+        _recorrer_plan(hijo, indices, secuenciales)
+
+
+# Tablas grandes: noticias es una vista sobre noticias_usuario (particionada por mes) y articulos
+def _es_tabla_grande(relacion: str) -> bool:
+    return relacion == 'articulos' or relacion.startswith('noticias_usuario')
+
+
+def _resumir_sql(sql: str) -> str:
+    return ' '.join(sql.split())[:110]
+
+
+def ejecutar_reporte(user_id: int):
+    registro = []
+    etiqueta = ['']
+
+    db = Database()
+    estadisticas = Estadisticas()
+    busqueda = BusquedaAvanzada()
+    for instancia in (db, estadisticas.db, busqueda.db):
+        _instrumentar(instancia, registro, etiqueta)
+
+    categorias = db.obtener_categorias(user_id=user_id) or [None]
+    paises = db.obtener_paises(user_id=user_id) or [None]
+    fuentes = db.obtener_fuentes(user_id=user_id) or [{}]
+    fuente_id = fuentes[0].get('id')
+
+    casos = [
+        ('Database.obtener_noticias', lambda: db.obtener_noticias(limite=20, user_id=user_id)),
+        ('Database.obtener_noticias [categoria]', lambda: db.obtener_noticias(limite=20, categoria=categorias[0], user_id=user_id)),
+        ('Database.obtener_noticias [pais]', lambda: db.obtener_noticias(limite=20, pais=paises[0], user_id=user_id)),
+        ('Database.obtener_noticias [fuente]', lambda: db.obtener_noticias(limite=20, fuente_id=fuente_id, user_id=user_id)),
+        ('Database.obtener_noticias_por_cursor', lambda: db.obtener_noticias_por_cursor(limite=20, user_id=user_id)),
+        ('Database.contar_noticias', lambda: db.contar_noticias(user_id=user_id)),
+        ('Database.contar_noticias_filtradas [cache]', lambda: db.contar_noticias_filtradas('cache', user_id=user_id)),
+        ('Database.obtener_categorias', lambda: db.obtener_categorias(user_id=user_id)),
+        ('Database.obtener_paises', lambda: db.obtener_paises(user_id=user_id)),
+        ('Database.obtener_fuentes', lambda: db.obtener_fuentes(user_id=user_id)),
+        ('Database.obtener_suscripcion_activa', lambda: db.obtener_suscripcion_activa(user_id)),
+        ('Database.verificar_limite_scraping', lambda: db.verificar_limite_scraping(user_id)),
+        ('Estadisticas.obtener_estadisticas_generales', lambda: estadisticas.obtener_estadisticas_generales(user_id=user_id)),
+        ('Estadisticas.obtener_tendencias', lambda: estadisticas.obtener_tendencias(dias=7, user_id=user_id)),
+        ('Estadisticas.obtener_top_fuentes', lambda: estadisticas.obtener_top_fuentes(user_id=user_id)),
+        ('Estadisticas.obtener_datos_ia', lambda: estadisticas.obtener_datos_ia(user_id)),
+        ('BusquedaAvanzada.buscar_noticias', lambda: busqueda.buscar_noticias(query='gobierno', limite=20)),
+        ('BusquedaAvanzada.buscar_por_palabras_clave', lambda: busqueda.buscar_por_palabras_clave(['economía', 'salud'], limite=20)),
+    ]
+
+    registro.clear()
+    for nombre, caso in casos:
+        etiqueta[0] = nombre
+        inicio = time.perf_counter()
+        try:
+            caso()
+        except Exception as e:
+            print(f"❌ {nombre}: {e}")
+        print(f"⏱️  {nombre}: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    _imprimir_reporte(registro)
+
+
+def _imprimir_reporte(registro: list):
+    print("\n" + "=" * 80)
+    print("📊 REPORTE DE PLANES (EXPLAIN ANALYZE)")
+    print("=" * 80)
+
+    sin_indice = 0
+    for etiqueta, sql, plan in registro:
+        print(f"\n🔎 {etiqueta}")
+        print(f"   SQL: {_resumir_sql(sql)}")
+        if 'error' in plan:
+            print(f"   ❌ No se pudo explicar: {plan['error']}")
+            continue
+
+        indices, secuenciales = set(), set()
+        _recorrer_plan(plan['Plan'], indices, secuenciales)
+        print(f"   Tiempo: {plan.get('Execution Time', 0):.2f} ms | Filas: {plan['Plan'].get('Actual Rows')}")
+        if indices:
+            for indice in sorted(indices):
+                print(f"   ✅ Índice: {indice}")
+        if secuenciales:
+            print(f"   ⚠️ Seq Scan en: {', '.join(sorted(secuenciales))}")
+            if any(_es_tabla_grande(relacion) for relacion in secuenciales):
+                sin_indice += 1
+
+    print("\n" + "=" * 80)
+    print(f"Consultas analizadas: {len(registro)} | Con Seq Scan sobre noticias_usuario/articulos: {sin_indice}")
+    print("(En tablas pequeñas el planificador prefiere Seq Scan aunque exista un índice)")
+
+
+if __name__ == '__main__':
+    user_id = 1
+    if '--user-id' in sys.argv:
+        user_id = int(sys.argv[sys.argv.index('--user-id') + 1])
+    ejecutar_reporte(user_id)
@@ -1,7 +1,37 @@
 import csv
 import json
 from io import StringIO
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator
+
+# Columnas del CSV (en orden lógico para ETL)
+COLUMNAS_CSV = [
+    # Identificadores
+    'id',
+    'fuente_id',
+    
+    # Contenido principal
+    'titulo',
+    'resumen',
+    'url',
+    
+    # Clasificación
+    'categoria',
+    'pais',
+    
+    # Información de fuente
+    'fuente',
+    
+    # Recursos multimedia
+    'imagen_url',
+    
+    # Metadatos temporales
+    'fecha_publicacion',
+    'fecha_scraping',
+    
+    # Otros campos
+    'autor',
+    'tags'
+]
 
 class Exportador:
     def __init__(self):
@@ -13,44 +43,28 @@ class Exportador:
         Incluye todos los campos relevantes en columnas separadas para
         facilitar procesos de extracción, transformación y carga de datos.
         """
-        output = StringIO()
-        
         if not noticias:
             return ""
-        
-        # ✅ COLUMNAS COMPLETAS PARA ETL (en orden lógico)
-        columnas = [
-            # Identificadores
-            'id',
-            'fuente_id',
-            
-            # Contenido principal
-            'titulo',
-            'resumen',
-            'url',
-            
-            # Clasificación
-            'categoria',
-            'pais',
-            
-            # Información de fuente
-            'fuente',
-            
-            # Recursos multimedia
-            'imagen_url',
-            
-            # Metadatos temporales
-            'fecha_publicacion',
-            'fecha_scraping',
-            
-            # Otros campos
-            'autor',
-            'tags'
-        ]
-        
+        return ''.join(self.generar_csv(noticias))
+    
+    def exportar_json(self, noticias: List[Dict]) -> str:
+        """Exporta noticias a formato JSON"""
+        return json.dumps(noticias, indent=2, ensure_ascii=False)
+    
+    def exportar_txt(self, noticias: List[Dict]) -> str:
+        """Exporta noticias a formato TXT legible"""
+        return ''.join(self.generar_txt(noticias))
+    
+    # ==================== EXPORTACIÓN EN STREAMING ====================
+    # Aceptan cualquier iterable (p.ej. Database.iterar_noticias) y generan el
+    # contenido por partes, sin construir la lista completa en memoria.
+    
+    def generar_csv(self, noticias: Iterable[Dict]) -> Iterator[str]:
+        """Genera el CSV fila por fila"""
+        output = StringIO()
         writer = csv.DictWriter(
             output, 
-            fieldnames=columnas, 
+            fieldnames=COLUMNAS_CSV, 
             extrasaction='ignore',
             quoting=csv.QUOTE_MINIMAL,
             lineterminator='\n'
@@ -64,7 +78,7 @@ class Exportador:
             
             # Preparar fila con valores limpios
             fila = {}
-            for col in columnas:
+            for col in COLUMNAS_CSV:
                 valor = noticia.get(col, '')
                 
                 # Limpiar valores para CSV
@@ -77,18 +91,29 @@ class Exportador:
                     fila[col] = str(valor).strip()
             
             writer.writerow(fila)
+            
+            # Entregar lo escrito y vaciar el buffer
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
         
-        return output.getvalue()
+        if output.tell():
+            yield output.getvalue()
     
-    def exportar_json(self, noticias: List[Dict]) -> str:
-        """Exporta noticias a formato JSON"""
-        return json.dumps(noticias, indent=2, ensure_ascii=False)
+    def generar_json(self, noticias: Iterable[Dict]) -> Iterator[str]:
+        """Genera un arreglo JSON elemento por elemento (mismo formato que exportar_json)"""
+        primero = True
+        for noticia in noticias:
+            elemento = json.dumps(noticia, indent=2, ensure_ascii=False, default=str)
+            elemento = '\n'.join('  ' + linea for linea in elemento.split('\n'))
+            yield ('[\n' if primero else ',\n') + elemento
+            primero = False
+        yield '[]' if primero else '\n]'
     
-    def exportar_txt(self, noticias: List[Dict]) -> str:
-        """Exporta noticias a formato TXT legible"""
-        output = []
-        
+    def generar_txt(self, noticias: Iterable[Dict]) -> Iterator[str]:
+        """Genera el TXT noticia por noticia"""
         for i, noticia in enumerate(noticias, 1):
+            output = []
             output.append(f"{'='*80}")
             output.append(f"NOTICIA #{i}")
             output.append(f"{'='*80}")
@@ -98,5 +123,4 @@ class Exportador:
             output.append(f"Fecha: {noticia.get('fecha_scraping', 'N/A')}")
             output.append(f"\nResumen:\n{noticia.get('resumen', 'Sin resumen')}")
             output.append(f"\n")
-        
-        return '\n'.join(output)
\ No newline at end of file
+            yield ('\n' if i > 1 else '') + '\n'.join(output)
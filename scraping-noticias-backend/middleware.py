@@ -4,6 +4,7 @@ Middleware para verificación de roles y límites
 from functools import wraps
 from flask import jsonify
 from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from unidad_trabajo import soltar_conexion_peticion
 
 def admin_required(f):
     """Decorador que requiere rol de administrador"""
@@ -70,13 +71,16 @@ def verificar_limite_fuentes(f):
 
 def verificar_limite_scraping(f):
     """
-    Decorador que verifica si el usuario puede hacer scraping según su plan
+    Decorador que reserva la cuota de scraping del usuario según su plan.
+    La reserva es atómica (peticiones concurrentes no pueden superar el límite).
+    La función decorada informa lo realmente scrapeado en g.scraping_usado;
+    al terminar se devuelve la parte no usada (o toda si la ejecución falló).
     """
     @wraps(f)
     @jwt_required()
     def decorated_function(*args, **kwargs):
         from database import Database
-        from flask import request
+        from flask import request, g
         
         usuario_id = get_jwt_identity()
         db = Database()
@@ -91,12 +95,25 @@ def verificar_limite_scraping(f):
             datos = {}
             cantidad = None
 
-        # Si no hay cantidad en el body, obtener de query params
+        # Si no hay cantidad en el body, obtener de query params (mismo default que el endpoint)
         if cantidad is None:
-            cantidad = request.args.get('limite', type=int, default=50) # Cantidad típica de scraping
+            cantidad = request.args.get('limite', default=5)
+        try:
+            cantidad = int(cantidad)
+            if cantidad < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({
+                'error': 'Parámetro inválido',
+                'mensaje': 'limite debe ser un entero mayor o igual a 0'
+            }), 400
+        
+        # El límite es por fuente: sin fuente_id se scrapean todas las activas del usuario
+        if not request.args.get('fuente_id', type=int):
+            cantidad *= len(db.obtener_fuentes(solo_activas=True, user_id=usuario_id))
         
-        # Verificar límite de scraping
-        resultado = db.verificar_limite_scraping(usuario_id, cantidad)
+        # Reservar cuota de scraping
+        resultado = db.reservar_scraping(usuario_id, cantidad)
         
         if not resultado['puede_scrapear']:
             # Obtener planes disponibles
@@ -113,6 +130,15 @@ def verificar_limite_scraping(f):
                 'accion_requerida': 'upgrade_plan'
             }), 403
         
-        # Si puede scrapear, continuar con la función
-        return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+        reserva = resultado['reserva']
+        g.scraping_usado = 0
+        # El scraping pasa casi todo el tiempo en HTTP: no retener la conexión de la petición
+        soltar_conexion_peticion()
+        try:
+            # Si puede scrapear, continuar con la función
+            return f(*args, **kwargs)
+        finally:
+            usado = g.get('scraping_usado', 0)
+            db.confirmar_scraping(reserva, usado)
+            print(f"📊 Cuota de scraping: reservadas {reserva['cantidad']}, usadas {usado} (usuario {usuario_id})")
+    return decorated_function
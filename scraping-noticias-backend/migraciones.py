@@ -0,0 +1,844 @@
+"""
+Migraciones versionadas del esquema PostgreSQL
+Se aplican en orden, una sola vez, fuera de los procesos que sirven la API:
+
+    python migrar_bd.py            # aplica las pendientes
+    python migrar_bd.py --estado   # muestra la versión actual
+
+Para cambiar el esquema agrega una función nueva al final de MIGRACIONES
+(nunca modifiques una migración ya publicada).
+"""
+from typing import Callable, List, Optional, Tuple
+
+# Clave del advisory lock que serializa ejecuciones concurrentes del runner
+LOCK_MIGRACIONES = 72_410_501
+
+
+# ==================== MIGRACIONES ====================
+
+# Contadores con categoría/país en texto, como existían entre la 003 y la 007.
+# Copia congelada: Database._crear_triggers_conteo ya trabaja con ids (desde la 008).
+def _triggers_conteo_texto(cursor, tabla: str):
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION fn_conteo_noticias() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO conteo_noticias AS c (user_id, fuente_id, categoria, pais, total)
+                SELECT COALESCE(user_id, 0), COALESCE(fuente_id, 0), COALESCE(categoria, ''), COALESCE(pais, ''), COUNT(*)
+                FROM nuevas
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (user_id, fuente_id, categoria, pais)
+                DO UPDATE SET total = c.total + EXCLUDED.total;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO conteo_noticias AS c (user_id, fuente_id, categoria, pais, total)
+                SELECT COALESCE(user_id, 0), COALESCE(fuente_id, 0), COALESCE(categoria, ''), COALESCE(pais, ''), -COUNT(*)
+                FROM viejas
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (user_id, fuente_id, categoria, pais)
+                DO UPDATE SET total = c.total + EXCLUDED.total;
+            ELSE
+                INSERT INTO conteo_noticias AS c (user_id, fuente_id, categoria, pais, total)
+                SELECT u, f, cat, p, SUM(delta)
+                FROM (
+                    SELECT COALESCE(user_id, 0) AS u, COALESCE(fuente_id, 0) AS f,
+                           COALESCE(categoria, '') AS cat, COALESCE(pais, '') AS p, -1 AS delta
+                    FROM viejas
+                    UNION ALL
+                    SELECT COALESCE(user_id, 0), COALESCE(fuente_id, 0),
+                           COALESCE(categoria, ''), COALESCE(pais, ''), 1
+                    FROM nuevas
+                ) cambios
+                GROUP BY u, f, cat, p
+                HAVING SUM(delta) <> 0
+                ON CONFLICT (user_id, fuente_id, categoria, pais)
+                DO UPDATE SET total = c.total + EXCLUDED.total;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    _crear_triggers(cursor, tabla)
+
+
+def _crear_triggers(cursor, tabla: str):
+    """Triggers por sentencia de fn_conteo_noticias sobre `tabla`"""
+    for sufijo in ('ins', 'upd', 'del'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_conteo_noticias_{sufijo} ON {tabla}")
+    cursor.execute(f"""
+        CREATE TRIGGER trg_conteo_noticias_ins AFTER INSERT ON {tabla}
+        REFERENCING NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION fn_conteo_noticias()
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_conteo_noticias_upd AFTER UPDATE ON {tabla}
+        REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+        FOR EACH STATEMENT EXECUTE FUNCTION fn_conteo_noticias()
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_conteo_noticias_del AFTER DELETE ON {tabla}
+        REFERENCING OLD TABLE AS viejas
+        FOR EACH STATEMENT EXECUTE FUNCTION fn_conteo_noticias()
+    """)
+
+
+def _recalcular_conteos_texto(cursor):
+    cursor.execute("LOCK TABLE conteo_noticias IN EXCLUSIVE MODE")
+    cursor.execute("DELETE FROM conteo_noticias")
+    cursor.execute("""
+        INSERT INTO conteo_noticias (user_id, fuente_id, categoria, pais, total)
+        SELECT COALESCE(user_id, 0), COALESCE(fuente_id, 0), COALESCE(categoria, ''), COALESCE(pais, ''), COUNT(*)
+        FROM noticias
+        GROUP BY 1, 2, 3, 4
+    """)
+
+
+# Contadores por id (conteo_noticias + facetas_usuario), como se crearon en la 008.
+# Copia congelada de Database._sql_aplicar_deltas y del recálculo de la 008.
+def _sql_aplicar_deltas_ids(origen: str) -> str:
+    return f"""
+        WITH deltas AS (
+            SELECT COALESCE(user_id, 0) AS u, COALESCE(fuente_id, 0) AS f,
+                   COALESCE(categoria_id, 0) AS cat, COALESCE(pais_id, 0) AS p, SUM(delta) AS total
+            FROM ({origen}) cambios
+            GROUP BY 1, 2, 3, 4
+            HAVING SUM(delta) <> 0
+        ), conteos AS (
+            INSERT INTO conteo_noticias AS c (user_id, fuente_id, categoria_id, pais_id, total)
+            SELECT u, f, cat, p, total FROM deltas
+            ON CONFLICT (user_id, fuente_id, categoria_id, pais_id)
+            DO UPDATE SET total = c.total + EXCLUDED.total
+        )
+        INSERT INTO facetas_usuario AS fu (user_id, tipo, valor_id, total)
+        SELECT u, 'categoria', cat, SUM(total) FROM deltas WHERE cat <> 0 GROUP BY u, cat
+        UNION ALL
+        SELECT u, 'pais', p, SUM(total) FROM deltas WHERE p <> 0 GROUP BY u, p
+        ON CONFLICT (user_id, tipo, valor_id)
+        DO UPDATE SET total = fu.total + EXCLUDED.total
+    """
+
+
+def _triggers_conteo_ids(cursor, tabla: str):
+    columnas = "user_id, fuente_id, categoria_id, pais_id"
+    insertadas = _sql_aplicar_deltas_ids(f"SELECT {columnas}, 1 AS delta FROM nuevas")
+    borradas = _sql_aplicar_deltas_ids(f"SELECT {columnas}, -1 AS delta FROM viejas")
+    # Solo las filas que cambiaron de usuario/fuente/categoría/país mueven contadores
+    actualizadas = _sql_aplicar_deltas_ids(
+        f"SELECT {columnas}, -1 AS delta FROM viejas UNION ALL SELECT {columnas}, 1 FROM nuevas"
+    )
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION fn_conteo_noticias() RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {insertadas};
+            ELSIF TG_OP = 'DELETE' THEN
+                {borradas};
+            ELSE
+                {actualizadas};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    _crear_triggers(cursor, tabla)
+
+
+def _recalcular_conteos_ids(cursor):
+    cursor.execute("LOCK TABLE conteo_noticias, facetas_usuario IN EXCLUSIVE MODE")
+    cursor.execute("DELETE FROM conteo_noticias")
+    cursor.execute("DELETE FROM facetas_usuario")
+    cursor.execute(_sql_aplicar_deltas_ids(
+        "SELECT user_id, fuente_id, categoria_id, pais_id, 1 AS delta FROM noticias_usuario"
+    ))
+
+
+# Particiones mensuales de noticias_usuario, como las crea la 006.
+# Copia congelada de Database._inicio_mes / _crear_particion_noticias.
+def _inicio_mes(fecha, desplazamiento: int = 0):
+    from datetime import date
+
+    indice = fecha.year * 12 + (fecha.month - 1) + desplazamiento
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _crear_particion_mensual(cursor, inicio):
+    nombre = f"noticias_usuario_p{inicio.year:04d}_{inicio.month:02d}"
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (nombre,))
+    if cursor.fetchone()[0]:
+        return
+
+    fin = _inicio_mes(inicio, 1)
+    cursor.execute(f"CREATE TABLE {nombre} (LIKE noticias_usuario INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute("SELECT to_regclass('noticias_usuario_default') IS NOT NULL")
+    if cursor.fetchone()[0]:
+        cursor.execute(f"""
+            WITH movidas AS (
+                DELETE FROM noticias_usuario_default
+                WHERE fecha_scraping >= %s AND fecha_scraping < %s
+                RETURNING *
+            )
+            INSERT INTO {nombre} SELECT * FROM movidas
+        """, (inicio, fin))
+    cursor.execute(f"""
+        ALTER TABLE noticias_usuario ATTACH PARTITION {nombre}
+        FOR VALUES FROM (%s) TO (%s)
+    """, (inicio, fin))
+
+
+# URL canónica de los artículos, como la calculaba la 005.
+# Copia congelada de database.normalizar_url.
+_PARAMETROS_SEGUIMIENTO_005 = ('utm_', 'fbclid', 'gclid', 'ocid', 'ref_src')
+
+
+def _normalizar_url_005(url: str) -> str:
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+    partes = urlsplit(url.strip())
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or '').lower()
+    if partes.port and not ((esquema == 'http' and partes.port == 80) or (esquema == 'https' and partes.port == 443)):
+        host = f"{host}:{partes.port}"
+    ruta = partes.path.rstrip('/') or '/'
+    query = urlencode([
+        (clave, valor) for clave, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if not clave.lower().startswith(_PARAMETROS_SEGUIMIENTO_005)
+    ])
+    return urlunsplit((esquema, host, ruta, query, ''))
+
+
+def _m001_esquema_base(db, cursor):
+    """Tablas e índices originales"""
+    # --- TABLA: usuarios
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id SERIAL PRIMARY KEY,
+            nombre_usuario VARCHAR(100) NOT NULL UNIQUE,
+            email VARCHAR(255) NOT NULL UNIQUE,
+            contrasena_hash VARCHAR(255) NOT NULL,
+            rol VARCHAR(20) DEFAULT 'usuario' CHECK (rol IN ('admin', 'usuario')),
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            activo BOOLEAN DEFAULT TRUE
+        )
+    """)
+
+    # Agregado de columna rol si no existe (para bases de datos existentes)
+    try:
+        cursor.execute("""
+            ALTER TABLE usuarios 
+            ADD COLUMN IF NOT EXISTS rol VARCHAR(20) DEFAULT 'usuario'
+        """)
+        cursor.execute("UPDATE usuarios SET rol = 'usuario' WHERE rol IS NULL")
+        # Solo si no existe: un ADD CONSTRAINT fallido abortaría toda la transacción
+        cursor.execute("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'check_rol') THEN
+                    ALTER TABLE usuarios 
+                    ADD CONSTRAINT check_rol 
+                    CHECK (rol IN ('admin', 'usuario'));
+                END IF;
+            END $$
+        """)
+    except Exception as e:
+        print(f"⚠️ Advertencia al agregar columna rol a usuarios: {e}")
+        pass
+
+    # --- TABLA: planes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS planes (
+            id SERIAL PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL UNIQUE,
+            precio NUMERIC(10, 2) NOT NULL,
+            limite_fuentes INTEGER NOT NULL DEFAULT 5,
+            limite_scraping_diario INTEGER NOT NULL DEFAULT 30,
+            descripcion TEXT,
+            activo BOOLEAN DEFAULT TRUE,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Agregar columna limite_scraping_diario si no existe
+    try:
+        cursor.execute("""
+            ALTER TABLE planes 
+            ADD COLUMN IF NOT EXISTS limite_scraping_diario INTEGER NOT NULL DEFAULT 30
+        """)
+    except Exception as e:
+        print(f"⚠️ Advertencia al agregar columna limite_scraping_diario: {e}")
+        pass
+
+    # --- TABLA: suscripciones
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS suscripciones (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
+            plan_id INTEGER REFERENCES planes(id) ON DELETE RESTRICT,
+            fecha_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_vencimiento TIMESTAMP NOT NULL,
+            activo BOOLEAN DEFAULT TRUE,
+            cancelado BOOLEAN DEFAULT FALSE,
+            UNIQUE(user_id, activo)
+        )
+    """)
+
+    # --- TABLA: pagos
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pagos (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
+            plan_id INTEGER REFERENCES planes(id) ON DELETE RESTRICT,
+            metodo_pago VARCHAR(50) NOT NULL,
+            monto NUMERIC(10, 2) NOT NULL,
+            referencia_pago VARCHAR(255) UNIQUE,
+            datos_pago JSONB,
+            estado VARCHAR(20) DEFAULT 'pendiente' CHECK (estado IN ('pendiente', 'completado', 'fallido', 'reembolsado')),
+            fecha_pago TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_verificacion TIMESTAMP,
+            verificado_por INTEGER REFERENCES usuarios(id) ON DELETE SET NULL
+        )
+    """)
+
+    # --- TABLA: fuentes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fuentes (
+            id SERIAL PRIMARY KEY,
+            nombre VARCHAR(255) NOT NULL,
+            url VARCHAR(512) NOT NULL,
+            selector_contenedor JSONB NOT NULL,
+            selector_titulo JSONB NOT NULL,
+            selector_resumen JSONB NOT NULL,
+            selector_link JSONB,
+            selector_imagen JSONB,
+            selector_categoria JSONB,
+            user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
+            activo BOOLEAN DEFAULT TRUE,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Agregado de columna user_id si no existe a fuentes
+    try:
+        cursor.execute("""
+            ALTER TABLE fuentes 
+            ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE
+        """)
+        cursor.execute("""
+            UPDATE fuentes 
+            SET user_id = (SELECT id FROM usuarios WHERE rol = 'admin' LIMIT 1)
+            WHERE user_id IS NULL AND EXISTS (SELECT 1 FROM usuarios WHERE rol = 'admin')
+        """)
+    except Exception as e:
+        print(f"⚠️ Advertencia al agregar columna user_id a fuentes: {e}")
+        pass
+
+    # --- TABLA: noticias
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS noticias (
+            id SERIAL PRIMARY KEY,
+            titulo VARCHAR(512) NOT NULL,
+            url VARCHAR(1024) NOT NULL,
+            resumen TEXT,
+            imagen_url VARCHAR(1024),
+            categoria VARCHAR(255),
+            pais VARCHAR(100),
+            fuente_id INTEGER REFERENCES fuentes(id) ON DELETE CASCADE,
+            user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
+            fecha_publicacion TIMESTAMP,
+            fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(url, user_id)
+        )
+    """)
+
+    # Agregado de columna user_id y UNIQUE constraint si no existe a noticias
+    try:
+        cursor.execute("""
+            ALTER TABLE noticias 
+            ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE
+        """)
+        try:
+            cursor.execute("""
+                ALTER TABLE noticias 
+                DROP CONSTRAINT IF EXISTS noticias_url_key
+            """)
+        except:
+            pass
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_noticias_url_user 
+            ON noticias(url, user_id)
+        """)
+    except:
+        pass
+
+    # Agregado de columna fecha_publicacion si no existe a noticias
+    try:
+        cursor.execute("""
+            ALTER TABLE noticias 
+            ADD COLUMN IF NOT EXISTS fecha_publicacion TIMESTAMP
+        """)
+    except:
+        pass
+
+    # Agregado de columna pais si no existe a noticias
+    try:
+        cursor.execute("""
+            ALTER TABLE noticias 
+            ADD COLUMN IF NOT EXISTS pais VARCHAR(100)
+        """)
+    except:
+        pass
+
+    # --- TABLA: scraping_diario (✅ NUEVO)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scraping_diario (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
+            fecha DATE NOT NULL DEFAULT CURRENT_DATE,
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            plan_id INTEGER REFERENCES planes(id) ON DELETE SET NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, fecha)
+        )
+    """)
+
+    # --- Índices ---
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_fuentes_user_id ON fuentes(user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_fuente ON noticias(fuente_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_fecha ON noticias(fecha_scraping DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_url ON noticias(url)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_categoria ON noticias(categoria)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_pais ON noticias(pais)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_user_id ON noticias(user_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_nombre_usuario ON usuarios(nombre_usuario)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios(email)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_suscripciones_user_active ON suscripciones(user_id, activo)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scraping_diario_user_fecha ON scraping_diario(user_id, fecha)")
+
+
+def _m002_indices_keyset(db, cursor):
+    """Paginación keyset: ORDER BY fecha_scraping DESC, id DESC (global y por usuario)"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_fecha_id ON noticias(fecha_scraping DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_user_fecha_id ON noticias(user_id, fecha_scraping DESC, id DESC)")
+
+
+def _m003_conteo_noticias(db, cursor):
+    """Contadores por usuario/fuente/categoría/país mantenidos por triggers"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS conteo_noticias (
+            user_id INTEGER NOT NULL,
+            fuente_id INTEGER NOT NULL,
+            categoria VARCHAR(255) NOT NULL,
+            pais VARCHAR(100) NOT NULL,
+            total BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, fuente_id, categoria, pais)
+        )
+    """)
+    _triggers_conteo_texto(cursor, 'noticias')
+    _recalcular_conteos_texto(cursor)
+
+
+def _m004_indices_por_usuario(db, cursor):
+    """
+    Índices compuestos por usuario para las rutas reales de acceso.
+    (user_id, fecha_scraping DESC, id DESC) ya existe desde la 002.
+    """
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_user_categoria ON noticias(user_id, categoria)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_user_pais ON noticias(user_id, pais)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_noticias_user_fuente_fecha ON noticias(user_id, fuente_id, fecha_scraping DESC)")
+    # Prefijo de los compuestos anteriores: solo añade costo de escritura
+    cursor.execute("DROP INDEX IF EXISTS idx_noticias_user_id")
+    cursor.execute("ANALYZE noticias")
+
+
+def _m005_articulos_compartidos(db, cursor):
+    """
+    Almacén compartido de artículos: cada URL (normalizada) se guarda una sola vez
+    en articulos y cada usuario la referencia desde noticias_usuario.
+    noticias pasa a ser una vista con las mismas columnas que la tabla original.
+    """
+    from psycopg2.extras import execute_values
+
+    cursor.execute("""
+        CREATE TABLE articulos (
+            id SERIAL PRIMARY KEY,
+            url VARCHAR(1024) NOT NULL UNIQUE,
+            titulo VARCHAR(512) NOT NULL,
+            resumen TEXT,
+            imagen_url VARCHAR(1024),
+            fecha_publicacion TIMESTAMP,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Categoría y país dependen de la fuente (que es de cada usuario), por eso viven en el vínculo
+    cursor.execute("""
+        CREATE TABLE noticias_usuario (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
+            articulo_id INTEGER NOT NULL REFERENCES articulos(id) ON DELETE CASCADE,
+            fuente_id INTEGER REFERENCES fuentes(id) ON DELETE CASCADE,
+            categoria VARCHAR(255),
+            pais VARCHAR(100),
+            fecha_scraping TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (user_id, articulo_id)
+        )
+    """)
+
+    # Copiar noticias (más recientes primero: ante URLs equivalentes gana la última versión)
+    lectura = cursor.connection.cursor(name='migracion_005_noticias')
+    lectura.itersize = 5000
+    lectura.execute("""
+        SELECT id, titulo, url, resumen, imagen_url, categoria, pais,
+               fuente_id, user_id, fecha_publicacion, fecha_scraping
+        FROM noticias
+        ORDER BY fecha_scraping DESC NULLS LAST, id DESC
+    """)
+    while True:
+        filas = lectura.fetchmany(5000)
+        if not filas:
+            break
+
+        articulos = {}
+        for fila in filas:
+            url = _normalizar_url_005(fila[2])
+            articulos.setdefault(url, (url, fila[1], fila[3], fila[4], fila[9]))
+        execute_values(cursor, """
+            INSERT INTO articulos (url, titulo, resumen, imagen_url, fecha_publicacion)
+            VALUES %s
+            ON CONFLICT (url) DO NOTHING
+        """, list(articulos.values()))
+
+        cursor.execute("SELECT url, id FROM articulos WHERE url = ANY(%s)", (list(articulos),))
+        ids = dict(cursor.fetchall())
+        execute_values(cursor, """
+            INSERT INTO noticias_usuario (id, user_id, articulo_id, fuente_id, categoria, pais, fecha_scraping)
+            VALUES %s
+            ON CONFLICT (user_id, articulo_id) DO NOTHING
+        """, [
+            (fila[0], fila[8], ids[_normalizar_url_005(fila[2])], fila[7], fila[5], fila[6], fila[10])
+            for fila in filas
+        ])
+    lectura.close()
+
+    cursor.execute("""
+        SELECT setval(pg_get_serial_sequence('noticias_usuario', 'id'),
+                      COALESCE((SELECT MAX(id) FROM noticias_usuario), 0) + 1, false)
+    """)
+
+    cursor.execute("DROP TABLE noticias CASCADE")
+    # LEFT JOIN (articulo_id es NOT NULL + FK): mismas filas que un INNER JOIN, pero el
+    # planner elimina el JOIN cuando la consulta no usa columnas de articulos (p.ej. COUNT)
+    cursor.execute("""
+        CREATE VIEW noticias AS
+        SELECT nu.id, a.titulo, a.url, a.resumen, a.imagen_url, nu.categoria, nu.pais,
+               nu.fuente_id, nu.user_id, a.fecha_publicacion, nu.fecha_scraping, nu.articulo_id
+        FROM noticias_usuario nu
+        LEFT JOIN articulos a ON a.id = nu.articulo_id
+    """)
+
+    # Índices equivalentes a los de noticias (002 y 004), ahora sobre el vínculo
+    cursor.execute("CREATE INDEX idx_noticias_usuario_fecha_id ON noticias_usuario(fecha_scraping DESC, id DESC)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_fecha_id ON noticias_usuario(user_id, fecha_scraping DESC, id DESC)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_categoria ON noticias_usuario(user_id, categoria)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_pais ON noticias_usuario(user_id, pais)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_fuente_fecha ON noticias_usuario(user_id, fuente_id, fecha_scraping DESC)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_fuente ON noticias_usuario(fuente_id)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_articulo ON noticias_usuario(articulo_id)")
+
+    _triggers_conteo_texto(cursor, 'noticias_usuario')
+    _recalcular_conteos_texto(cursor)
+    cursor.execute("ANALYZE articulos")
+    cursor.execute("ANALYZE noticias_usuario")
+
+
+def _m006_particionar_noticias_usuario(db, cursor):
+    """
+    noticias_usuario pasa a estar particionada por mes de fecha_scraping.
+    La PK incluye la clave de partición; la unicidad (user_id, articulo_id) ya no
+    puede exigirse con un índice único y la garantiza guardar_noticias_batch.
+    """
+    from datetime import date
+
+    cursor.execute("DROP VIEW noticias")
+    cursor.execute("ALTER TABLE noticias_usuario RENAME TO noticias_usuario_sin_particionar")
+    cursor.execute("ALTER SEQUENCE noticias_usuario_id_seq OWNED BY NONE")
+
+    cursor.execute("""
+        CREATE TABLE noticias_usuario (
+            id INTEGER NOT NULL DEFAULT nextval('noticias_usuario_id_seq'),
+            user_id INTEGER REFERENCES usuarios(id) ON DELETE CASCADE,
+            articulo_id INTEGER NOT NULL REFERENCES articulos(id) ON DELETE CASCADE,
+            fuente_id INTEGER REFERENCES fuentes(id) ON DELETE CASCADE,
+            categoria VARCHAR(255),
+            pais VARCHAR(100),
+            fecha_scraping TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, fecha_scraping)
+        ) PARTITION BY RANGE (fecha_scraping)
+    """)
+    cursor.execute("ALTER SEQUENCE noticias_usuario_id_seq OWNED BY noticias_usuario.id")
+    cursor.execute("CREATE TABLE noticias_usuario_default PARTITION OF noticias_usuario DEFAULT")
+
+    # Una partición por cada mes con datos, más el actual y los 3 siguientes
+    cursor.execute("SELECT MIN(fecha_scraping) FROM noticias_usuario_sin_particionar")
+    minima = cursor.fetchone()[0]
+    hoy = date.today()
+    mes = _inicio_mes(minima.date() if minima else hoy)
+    ultimo = _inicio_mes(hoy, 3)
+    while mes <= ultimo:
+        _crear_particion_mensual(cursor, mes)
+        mes = _inicio_mes(mes, 1)
+
+    cursor.execute("""
+        INSERT INTO noticias_usuario (id, user_id, articulo_id, fuente_id, categoria, pais, fecha_scraping)
+        SELECT id, user_id, articulo_id, fuente_id, categoria, pais, COALESCE(fecha_scraping, CURRENT_TIMESTAMP)
+        FROM noticias_usuario_sin_particionar
+    """)
+    cursor.execute("DROP TABLE noticias_usuario_sin_particionar")
+
+    # Índices sobre la tabla padre (se propagan a cada partición)
+    cursor.execute("CREATE INDEX idx_noticias_usuario_fecha_id ON noticias_usuario(fecha_scraping DESC, id DESC)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_fecha_id ON noticias_usuario(user_id, fecha_scraping DESC, id DESC)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_categoria ON noticias_usuario(user_id, categoria)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_pais ON noticias_usuario(user_id, pais)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_fuente_fecha ON noticias_usuario(user_id, fuente_id, fecha_scraping DESC)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_fuente ON noticias_usuario(fuente_id)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_articulo ON noticias_usuario(articulo_id)")
+    cursor.execute("CREATE INDEX idx_noticias_usuario_user_articulo ON noticias_usuario(user_id, articulo_id)")
+
+    cursor.execute("""
+        CREATE VIEW noticias AS
+        SELECT nu.id, a.titulo, a.url, a.resumen, a.imagen_url, nu.categoria, nu.pais,
+               nu.fuente_id, nu.user_id, a.fecha_publicacion, nu.fecha_scraping, nu.articulo_id
+        FROM noticias_usuario nu
+        LEFT JOIN articulos a ON a.id = nu.articulo_id
+    """)
+    _triggers_conteo_texto(cursor, 'noticias_usuario')
+    cursor.execute("ANALYZE noticias_usuario")
+
+
+def _m007_url_hash(db, cursor):
+    """
+    Deduplicación por hash de 64 bits de la URL normalizada (ver database.hash_url)
+    en lugar del índice único sobre url VARCHAR(1024).
+    """
+    cursor.execute("ALTER TABLE articulos ADD COLUMN url_hash BIGINT")
+    cursor.execute("UPDATE articulos SET url_hash = ('x' || substr(md5(url), 1, 16))::bit(64)::bigint")
+    cursor.execute("ALTER TABLE articulos ALTER COLUMN url_hash SET NOT NULL")
+    cursor.execute("CREATE UNIQUE INDEX idx_articulos_url_hash ON articulos(url_hash)")
+    cursor.execute("ALTER TABLE articulos DROP CONSTRAINT IF EXISTS articulos_url_key")
+    # Restos de la tabla noticias original, por si alguno sobrevivió
+    cursor.execute("DROP INDEX IF EXISTS idx_noticias_url")
+    cursor.execute("DROP INDEX IF EXISTS idx_noticias_url_user")
+    cursor.execute("ANALYZE articulos")
+
+
+def _m008_dimensiones_categoria_pais(db, cursor):
+    """
+    categoria y pais pasan de texto en cada vínculo a ids SMALLINT de las tablas
+    categorias y paises. conteo_noticias se rehace por id y se agrega facetas_usuario
+    (valores presentes por usuario, para los desplegables de filtros).
+    La vista noticias sigue exponiendo los nombres.
+    """
+    cursor.execute("""
+        CREATE TABLE categorias (
+            id SMALLSERIAL PRIMARY KEY,
+            nombre VARCHAR(255) NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE paises (
+            id SMALLSERIAL PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO categorias (nombre)
+        SELECT DISTINCT categoria FROM noticias_usuario WHERE categoria <> '' ORDER BY 1
+    """)
+    cursor.execute("""
+        INSERT INTO paises (nombre)
+        SELECT DISTINCT pais FROM noticias_usuario WHERE pais <> '' ORDER BY 1
+    """)
+
+    cursor.execute("DROP VIEW noticias")
+    for sufijo in ('ins', 'upd', 'del'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS trg_conteo_noticias_{sufijo} ON noticias_usuario")
+
+    # Un solo ALTER ... TYPE reescribe cada partición una vez y deja las filas sin el texto
+    # (un UPDATE + DROP COLUMN lo conservaría en las tuplas existentes). '' pasa a NULL.
+    cursor.execute("""
+        CREATE FUNCTION pg_temp.id_categoria(nombre_categoria VARCHAR) RETURNS SMALLINT
+        LANGUAGE sql STABLE AS 'SELECT id FROM categorias WHERE nombre = nombre_categoria'
+    """)
+    cursor.execute("""
+        CREATE FUNCTION pg_temp.id_pais(nombre_pais VARCHAR) RETURNS SMALLINT
+        LANGUAGE sql STABLE AS 'SELECT id FROM paises WHERE nombre = nombre_pais'
+    """)
+    cursor.execute("""
+        ALTER TABLE noticias_usuario
+            ALTER COLUMN categoria TYPE SMALLINT USING pg_temp.id_categoria(categoria),
+            ALTER COLUMN pais TYPE SMALLINT USING pg_temp.id_pais(pais)
+    """)
+    cursor.execute("ALTER TABLE noticias_usuario RENAME COLUMN categoria TO categoria_id")
+    cursor.execute("ALTER TABLE noticias_usuario RENAME COLUMN pais TO pais_id")
+    cursor.execute("""
+        ALTER TABLE noticias_usuario
+            ADD CONSTRAINT fk_noticias_usuario_categoria FOREIGN KEY (categoria_id) REFERENCES categorias(id),
+            ADD CONSTRAINT fk_noticias_usuario_pais FOREIGN KEY (pais_id) REFERENCES paises(id)
+    """)
+
+    # LEFT JOIN a tablas por PK: el planner los elimina si la consulta no usa los nombres
+    cursor.execute("""
+        CREATE VIEW noticias AS
+        SELECT nu.id, a.titulo, a.url, a.resumen, a.imagen_url, c.nombre AS categoria, p.nombre AS pais,
+               nu.fuente_id, nu.user_id, a.fecha_publicacion, nu.fecha_scraping, nu.articulo_id,
+               nu.categoria_id, nu.pais_id
+        FROM noticias_usuario nu
+        LEFT JOIN articulos a ON a.id = nu.articulo_id
+        LEFT JOIN categorias c ON c.id = nu.categoria_id
+        LEFT JOIN paises p ON p.id = nu.pais_id
+    """)
+
+    cursor.execute("DROP TABLE conteo_noticias")
+    cursor.execute("""
+        CREATE TABLE conteo_noticias (
+            user_id INTEGER NOT NULL,
+            fuente_id INTEGER NOT NULL,
+            categoria_id SMALLINT NOT NULL,
+            pais_id SMALLINT NOT NULL,
+            total BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, fuente_id, categoria_id, pais_id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE facetas_usuario (
+            user_id INTEGER NOT NULL,
+            tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('categoria', 'pais')),
+            valor_id SMALLINT NOT NULL,
+            total BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, tipo, valor_id)
+        )
+    """)
+    _triggers_conteo_ids(cursor, 'noticias_usuario')
+    _recalcular_conteos_ids(cursor)
+    cursor.execute("ANALYZE categorias")
+    cursor.execute("ANALYZE paises")
+    cursor.execute("ANALYZE noticias_usuario")
+
+
+def _m009_validadores_fuente(db, cursor):
+    """
+    Validadores HTTP de la portada de cada fuente (ETag, Last-Modified y hash del cuerpo)
+    para saltar el scraping cuando no cambió desde el último guardado.
+    """
+    cursor.execute("""
+        CREATE TABLE validadores_fuente (
+            fuente_id INTEGER PRIMARY KEY REFERENCES fuentes(id) ON DELETE CASCADE,
+            etag TEXT,
+            last_modified TEXT,
+            hash_contenido CHAR(64) NOT NULL,
+            limite INTEGER NOT NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+MIGRACIONES: List[Tuple[int, str, Callable]] = [
+    (1, 'esquema_base', _m001_esquema_base),
+    (2, 'indices_keyset', _m002_indices_keyset),
+    (3, 'conteo_noticias', _m003_conteo_noticias),
+    (4, 'indices_por_usuario', _m004_indices_por_usuario),
+    (5, 'articulos_compartidos', _m005_articulos_compartidos),
+    (6, 'particionar_noticias_usuario', _m006_particionar_noticias_usuario),
+    (7, 'url_hash', _m007_url_hash),
+    (8, 'dimensiones_categoria_pais', _m008_dimensiones_categoria_pais),
+    (9, 'validadores_fuente', _m009_validadores_fuente),
+]
+
+ULTIMA_VERSION = MIGRACIONES[-1][0]
+
+
+# ==================== RUNNER ====================
+
+def _crear_tabla_migraciones(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migraciones (
+            version INTEGER PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def version_esquema(db) -> Optional[int]:
+    """Retorna la última versión aplicada (0 si nunca se migró, None si hubo error)"""
+    try:
+        with db.conexion() as connection:
+            if not connection:
+                return None
+            cursor = connection.cursor()
+            cursor.execute("SELECT to_regclass('schema_migraciones') IS NOT NULL")
+            if not cursor.fetchone()[0]:
+                return 0
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migraciones")
+            return cursor.fetchone()[0]
+    except Exception as e:
+        print(f"❌ Error al leer versión del esquema: {e}")
+        return None
+
+
+def migraciones_pendientes(db) -> List[Tuple[int, str, Callable]]:
+    """Migraciones aún no aplicadas, en orden"""
+    version = version_esquema(db) or 0
+    return [m for m in MIGRACIONES if m[0] > version]
+
+
+def aplicar_migraciones(db) -> bool:
+    """
+    Aplica en orden las migraciones pendientes, cada una en su propia transacción.
+    Es idempotente y seguro ante ejecuciones simultáneas (advisory lock).
+    """
+    with db.conexion() as connection:
+        if not connection:
+            return False
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (LOCK_MIGRACIONES,))
+            _crear_tabla_migraciones(cursor)
+            connection.commit()
+
+            # Releer dentro del lock: otra ejecución pudo haber avanzado
+            cursor.execute("SELECT version FROM schema_migraciones")
+            aplicadas = {row[0] for row in cursor.fetchall()}
+            connection.commit()
+
+            pendientes = [m for m in MIGRACIONES if m[0] not in aplicadas]
+            if not pendientes:
+                print(f"✅ Esquema al día (versión {ULTIMA_VERSION})")
+                return True
+
+            for version, nombre, migracion in pendientes:
+                print(f"🔄 Aplicando migración {version:03d}_{nombre}...")
+                try:
+                    migracion(db, cursor)
+                    cursor.execute(
+                        "INSERT INTO schema_migraciones (version, nombre) VALUES (%s, %s)",
+                        (version, nombre)
+                    )
+                    connection.commit()
+                except Exception as e:
+                    connection.rollback()
+                    print(f"❌ Error en migración {version:03d}_{nombre}: {e}")
+                    return False
+
+            print(f"✅ Esquema migrado a la versión {ULTIMA_VERSION}")
+            return True
+        except Exception as e:
+            connection.rollback()
+            print(f"❌ Error al aplicar migraciones: {e}")
+            return False
+        finally:
+            try:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (LOCK_MIGRACIONES,))
+                connection.commit()
+            except Exception:
+                pass
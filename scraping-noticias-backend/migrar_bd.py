@@ -1,29 +1,48 @@
 #!/usr/bin/env python3
 """
-Script para migrar la base de datos y agregar la columna pais
+Script para migrar la base de datos
+Aplica en orden las migraciones pendientes (ver migraciones.py).
+Ejecutar en cada despliegue, antes de iniciar la API:
+
+    python migrar_bd.py            # aplica las pendientes
+    python migrar_bd.py --estado   # solo muestra la versión actual
 """
 
 import sys
-sys.path.append('/Users/omarcondori/Documents/PROYECTOS/NOTICIA/scraping-noticias-backend')
 
 from database import Database
+from migraciones import MIGRACIONES, ULTIMA_VERSION, version_esquema, aplicar_migraciones
+
+def mostrar_estado(db):
+    """Muestra la versión aplicada y las migraciones pendientes"""
+    version = version_esquema(db)
+    if version is None:
+        print("❌ No se pudo leer la versión del esquema")
+        return False
+    
+    print(f"📊 Versión del esquema: {version} (última: {ULTIMA_VERSION})")
+    for numero, nombre, _ in MIGRACIONES:
+        estado = "✅" if numero <= version else "⏳"
+        print(f"   {estado} {numero:03d}_{nombre}")
+    return version >= ULTIMA_VERSION
 
 def migrar_bd():
     """Ejecuta las migraciones de la base de datos"""
     print("🔄 Iniciando migración de base de datos...")
     
     db = Database()
-    
-    # Ejecutar crear_tablas que debería agregar la columna pais
-    resultado = db.crear_tablas()
+    resultado = aplicar_migraciones(db)
     
     if resultado:
         print("✅ Migración completada exitosamente")
-        print("✅ La columna 'pais' ha sido agregada a la tabla noticias")
     else:
         print("❌ Error en la migración")
     
     return resultado
 
 if __name__ == '__main__':
-    migrar_bd()
+    if '--estado' in sys.argv:
+        ok = mostrar_estado(Database())
+    else:
+        ok = migrar_bd()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,331 @@
+"""
+Pool de conexiones PostgreSQL
+Reutiliza conexiones entre llamadas a Database en lugar de abrir una nueva por consulta.
+Los cursores que entrega están instrumentados (ver registro_consultas.py).
+"""
+import threading
+import time
+from typing import Dict, List
+
+import psycopg2
+from psycopg2 import extensions
+
+from registro_consultas import cursor_instrumentado
+
+
+class _Entrada:
+    """Conexión física administrada por el pool"""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.usos = 0
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+
+
+class ConexionPool:
+    """
+    Conexión prestada por el pool.
+    Se comporta como una conexión psycopg2, pero close() la devuelve al pool
+    en lugar de cerrarla. También puede usarse como context manager.
+    """
+
+    def __init__(self, pool: 'PoolConexiones', entrada: _Entrada):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_entrada', entrada)
+        object.__setattr__(self, '_liberada', False)
+
+    def __getattr__(self, nombre):
+        return getattr(self._entrada.conexion, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._entrada.conexion, nombre, valor)
+
+    @property
+    def closed(self):
+        return self._liberada or self._entrada.conexion.closed
+
+    def cursor(self, *args, **kwargs):
+        """Cursor instrumentado (tiempos y filas en registro_consultas) de la clase pedida"""
+        conexion = self._entrada.conexion
+        if len(args) > 1:
+            args = list(args)
+            args[1] = cursor_instrumentado(args[1] or conexion.cursor_factory)
+        else:
+            kwargs['cursor_factory'] = cursor_instrumentado(kwargs.get('cursor_factory') or conexion.cursor_factory)
+        return conexion.cursor(*args, **kwargs)
+
+    def close(self):
+        """Devuelve la conexión al pool (idempotente)"""
+        if self._liberada:
+            return
+        object.__setattr__(self, '_liberada', True)
+        self._pool.liberar(self._entrada)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class PoolConexiones:
+    """
+    Pool acotado y thread-safe de conexiones psycopg2.
+
+    Args:
+        config: Parámetros de psycopg2.connect
+        minimo: Conexiones libres que se mantienen abiertas
+        maximo: Conexiones simultáneas como máximo (en uso + libres)
+        timeout: Segundos máximos de espera para obtener una conexión
+        max_usos: Préstamos tras los cuales la conexión se recicla
+        ping_tras: Segundos de inactividad tras los cuales se verifica la conexión antes de prestarla
+        max_inactividad: Segundos tras los cuales se cierran las conexiones libres por encima del mínimo
+    """
+
+    def __init__(
+        self,
+        config: Dict,
+        minimo: int = 1,
+        maximo: int = 10,
+        timeout: float = 10.0,
+        max_usos: int = 500,
+        ping_tras: float = 30.0,
+        max_inactividad: float = 300.0
+    ):
+        if maximo < 1 or minimo < 0 or minimo > maximo:
+            raise ValueError("Se requiere 0 <= minimo <= maximo y maximo >= 1")
+
+        self.config = dict(config)
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout = timeout
+        self.max_usos = max_usos
+        self.ping_tras = ping_tras
+        self.max_inactividad = max_inactividad
+
+        self._condicion = threading.Condition()
+        self._libres: List[_Entrada] = []
+        self._total = 0
+        self._en_uso = 0
+        self._cerrado = False
+
+        self._stats = {
+            'prestamos': 0,
+            'esperas': 0,
+            'timeouts': 0,
+            'creadas': 0,
+            'recicladas': 0,
+            'descartadas': 0,
+            'tiempo_espera_total': 0.0,
+            'tiempo_espera_max': 0.0
+        }
+
+    # ==================== CICLO DE VIDA ====================
+
+    def _conectar(self) -> _Entrada:
+        conexion = psycopg2.connect(**self.config)
+        with self._condicion:
+            self._stats['creadas'] += 1
+        return _Entrada(conexion)
+
+    def _cerrar_silencioso(self, entrada: _Entrada):
+        try:
+            entrada.conexion.close()
+        except Exception:
+            pass
+
+    def _es_saludable(self, entrada: _Entrada) -> bool:
+        """Verifica la conexión antes de prestarla si lleva tiempo inactiva"""
+        if entrada.conexion.closed:
+            return False
+        if time.monotonic() - entrada.ultimo_uso < self.ping_tras:
+            return True
+        try:
+            cursor = entrada.conexion.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            entrada.conexion.rollback()
+            return True
+        except Exception:
+            return False
+
+    def obtener(self) -> ConexionPool:
+        """
+        Presta una conexión del pool, esperando hasta `timeout` segundos si está agotado.
+        Lanza TimeoutError si no hay conexión disponible a tiempo.
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        entrada = None
+        espero = False
+
+        with self._condicion:
+            if self._cerrado:
+                raise RuntimeError("El pool de conexiones está cerrado")
+            while True:
+                if self._libres:
+                    entrada = self._libres.pop()
+                    break
+                if self._total < self.maximo:
+                    self._total += 1
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._stats['timeouts'] += 1
+                    raise TimeoutError(
+                        f"No hay conexiones libres tras {self.timeout}s (máximo {self.maximo})"
+                    )
+                espero = True
+                self._condicion.wait(restante)
+
+            self._en_uso += 1
+            espera = time.monotonic() - inicio
+            self._stats['prestamos'] += 1
+            self._stats['tiempo_espera_total'] += espera
+            self._stats['tiempo_espera_max'] = max(self._stats['tiempo_espera_max'], espera)
+            if espero:
+                self._stats['esperas'] += 1
+
+        try:
+            if entrada is not None and not self._es_saludable(entrada):
+                self._cerrar_silencioso(entrada)
+                with self._condicion:
+                    self._stats['descartadas'] += 1
+                entrada = None
+            if entrada is None:
+                entrada = self._conectar()
+        except Exception:
+            with self._condicion:
+                self._total -= 1
+                self._en_uso -= 1
+                self._condicion.notify()
+            raise
+
+        return ConexionPool(self, entrada)
+
+    def liberar(self, entrada: _Entrada):
+        """Devuelve una conexión al pool, descartándola si quedó inutilizable o agotó sus usos"""
+        entrada.usos += 1
+        entrada.ultimo_uso = time.monotonic()
+        conexion = entrada.conexion
+        descartar = False
+        reciclar = False
+
+        try:
+            if conexion.closed:
+                descartar = True
+            else:
+                # Cerrar cualquier transacción abierta (p.ej. lecturas sin commit)
+                if conexion.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conexion.rollback()
+                if conexion.autocommit:
+                    conexion.autocommit = False
+        except Exception:
+            descartar = True
+
+        if not descartar and self.max_usos and entrada.usos >= self.max_usos:
+            descartar = True
+            reciclar = True
+
+        if descartar:
+            self._cerrar_silencioso(entrada)
+
+        with self._condicion:
+            self._en_uso -= 1
+            if descartar or self._cerrado:
+                self._total -= 1
+                self._stats['recicladas' if reciclar else 'descartadas'] += 1
+                if self._cerrado and not descartar:
+                    self._cerrar_silencioso(entrada)
+            else:
+                self._libres.append(entrada)
+                self._purgar_inactivas()
+            self._condicion.notify()
+
+    def _purgar_inactivas(self):
+        """Cierra conexiones libres inactivas por encima del mínimo (requiere el lock)"""
+        ahora = time.monotonic()
+        while len(self._libres) > self.minimo:
+            entrada = self._libres[0]
+            if ahora - entrada.ultimo_uso < self.max_inactividad:
+                break
+            self._libres.pop(0)
+            self._total -= 1
+            self._cerrar_silencioso(entrada)
+
+    def precalentar(self):
+        """Abre las conexiones mínimas por adelantado (errores se ignoran)"""
+        while True:
+            with self._condicion:
+                if self._cerrado or self._total >= self.minimo:
+                    return
+                self._total += 1
+            try:
+                entrada = self._conectar()
+            except Exception:
+                with self._condicion:
+                    self._total -= 1
+                return
+            with self._condicion:
+                self._libres.append(entrada)
+                self._condicion.notify()
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres; las prestadas se cierran al devolverse"""
+        with self._condicion:
+            self._cerrado = True
+            libres, self._libres = self._libres, []
+            self._total -= len(libres)
+            self._condicion.notify_all()
+        for entrada in libres:
+            self._cerrar_silencioso(entrada)
+
+    # ==================== MONITOREO ====================
+
+    def estadisticas(self) -> Dict:
+        """Retorna el estado del pool (en uso, libres, tiempos de espera, etc.)"""
+        with self._condicion:
+            prestamos = self._stats['prestamos']
+            return {
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'total': self._total,
+                'en_uso': self._en_uso,
+                'libres': len(self._libres),
+                'prestamos': prestamos,
+                'esperas': self._stats['esperas'],
+                'timeouts': self._stats['timeouts'],
+                'creadas': self._stats['creadas'],
+                'recicladas': self._stats['recicladas'],
+                'descartadas': self._stats['descartadas'],
+                'espera_promedio_ms': round(self._stats['tiempo_espera_total'] * 1000 / prestamos, 3) if prestamos else 0.0,
+                'espera_max_ms': round(self._stats['tiempo_espera_max'] * 1000, 3)
+            }
+
+
+# ==================== REGISTRO DE POOLS ====================
+
+_pools: Dict[tuple, PoolConexiones] = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool(config: Dict, **opciones) -> PoolConexiones:
+    """Retorna el pool compartido para una configuración (uno por proceso y base de datos)"""
+    clave = tuple(sorted(config.items()))
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = PoolConexiones(config, **opciones)
+            _pools[clave] = pool
+        return pool
+
+
+def cerrar_pools():
+    """Cierra todos los pools del proceso"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.cerrar()
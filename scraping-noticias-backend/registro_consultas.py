@@ -0,0 +1,237 @@
+"""
+Instrumentación de consultas SQL
+Los cursores prestados por el pool miden cada sentencia: tiempo, filas y una huella
+normalizada (sin literales ni parámetros) que agrupa las ejecuciones de la misma consulta.
+Las que superan el umbral van a un registro de consultas lentas con los parámetros redactados.
+Es por proceso y en memoria; se consulta en GET /api/v1/admin/db/consultas.
+"""
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+
+from psycopg2 import extensions
+
+# Límites superiores (ms) de los tramos del histograma de latencias
+TRAMOS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+_ETIQUETAS_TRAMOS = [f"<={limite}ms" for limite in TRAMOS_MS] + [f">{TRAMOS_MS[-1]}ms"]
+
+_RE_COMENTARIOS = re.compile(r'--[^\n]*')
+_RE_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_RE_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s')
+_RE_NUMEROS = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_RE_LITERALES_LISTA = re.compile(r'(?<=[(,])\s*(?:NULL|TRUE|FALSE)\b(?=\s*(?:::[\w ]+)?\s*[,)])', re.IGNORECASE)
+_RE_ARRAYS = re.compile(r'ARRAY\[[^\]]*\]', re.IGNORECASE)
+_RE_TUPLAS = re.compile(r'\((?:\s*\?(?:::[\w ]+)?\s*,)*\s*\?(?:::[\w ]+)?\s*\)')
+_RE_TUPLAS_REPETIDAS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+def huella_sql(sql) -> str:
+    """
+    Normaliza una sentencia para agrupar sus ejecuciones: quita comentarios y literales,
+    y colapsa listas de valores (VALUES de execute_values, IN, ARRAY) a un solo marcador.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', errors='replace')
+    sql = _RE_COMENTARIOS.sub(' ', sql)
+    sql = _RE_CADENAS.sub('?', sql)
+    sql = _RE_PLACEHOLDERS.sub('?', sql)
+    sql = _RE_NUMEROS.sub('?', sql)
+    sql = _RE_LITERALES_LISTA.sub('?', sql)
+    sql = _RE_ARRAYS.sub('ARRAY[...]', sql)
+    sql = _RE_TUPLAS.sub('(...)', sql)
+    sql = _RE_TUPLAS_REPETIDAS.sub('(...), ...', sql)
+    return _RE_ESPACIOS.sub(' ', sql).strip()
+
+
+def redactar_parametros(parametros):
+    """Reemplaza cada valor por su tipo (y largo): el registro nunca guarda datos de usuarios"""
+    def redactar(valor):
+        if valor is None or isinstance(valor, bool):
+            return valor
+        if isinstance(valor, (str, bytes)):
+            return f"<{type(valor).__name__}:{len(valor)}>"
+        if isinstance(valor, (list, tuple)):
+            return f"<{type(valor).__name__}:{len(valor)}>"
+        return f"<{type(valor).__name__}>"
+
+    if parametros is None:
+        return None
+    if isinstance(parametros, dict):
+        return {clave: redactar(valor) for clave, valor in parametros.items()}
+    return [redactar(valor) for valor in parametros]
+
+
+# Criterios de orden aceptados por RegistroConsultas.estadisticas
+ORDENES = ('total_ms', 'promedio_ms', 'max_ms', 'llamadas', 'filas', 'lentas', 'errores')
+
+
+class RegistroConsultas:
+    """
+    Histograma en memoria por huella de consulta y registro de consultas lentas (thread-safe).
+
+    Args:
+        umbral_lenta_ms: Duración a partir de la cual una ejecución se registra como lenta
+        max_lentas: Consultas lentas que se conservan (las más recientes)
+        max_huellas: Huellas distintas que se siguen; el resto se agrupa en '<otras>'
+    """
+
+    def __init__(self, umbral_lenta_ms: float = 200.0, max_lentas: int = 100, max_huellas: int = 500):
+        self.umbral_lenta_ms = umbral_lenta_ms
+        self.max_huellas = max_huellas
+        self.activo = True
+        self._lock = threading.Lock()
+        self._huellas: Dict[str, Dict] = {}
+        self._lentas = deque(maxlen=max_lentas)
+        self._cache_huellas: Dict[str, str] = {}
+        self._desde = datetime.now()
+
+    def _huella(self, sql) -> str:
+        # Las sentencias de texto fijo se repiten: normalizar cada una una sola vez
+        if isinstance(sql, bytes):
+            return huella_sql(sql)
+        huella = self._cache_huellas.get(sql)
+        if huella is None:
+            if len(self._cache_huellas) >= 2000:
+                self._cache_huellas.clear()
+            huella = self._cache_huellas[sql] = huella_sql(sql)
+        return huella
+
+    def registrar(self, sql, parametros, segundos: float, filas: int, error: bool = False):
+        if not self.activo:
+            return
+        huella = self._huella(sql)
+        ms = segundos * 1000
+        tramo = next((i for i, limite in enumerate(TRAMOS_MS) if ms <= limite), len(TRAMOS_MS))
+
+        with self._lock:
+            datos = self._huellas.get(huella)
+            if datos is None:
+                if len(self._huellas) >= self.max_huellas:
+                    huella = '<otras>'
+                    datos = self._huellas.get(huella)
+                if datos is None:
+                    datos = self._huellas[huella] = {
+                        'llamadas': 0, 'errores': 0, 'filas': 0,
+                        'total_ms': 0.0, 'max_ms': 0.0, 'lentas': 0,
+                        'tramos': [0] * (len(TRAMOS_MS) + 1)
+                    }
+            datos['llamadas'] += 1
+            datos['filas'] += max(filas or 0, 0)
+            datos['total_ms'] += ms
+            datos['max_ms'] = max(datos['max_ms'], ms)
+            datos['tramos'][tramo] += 1
+            if error:
+                datos['errores'] += 1
+            lenta = ms >= self.umbral_lenta_ms
+            if lenta:
+                datos['lentas'] += 1
+                self._lentas.append({
+                    'momento': datetime.now().isoformat(),
+                    'duracion_ms': round(ms, 2),
+                    'filas': max(filas or 0, 0),
+                    'error': error,
+                    'consulta': huella,
+                    'parametros': redactar_parametros(parametros)
+                })
+
+        if lenta:
+            print(f"🐢 Consulta lenta ({ms:.0f} ms): {huella[:150]}")
+
+    @staticmethod
+    def _percentil(tramos: List[int], llamadas: int, percentil: float):
+        """Cota superior (ms) del tramo donde cae el percentil; None si supera el último tramo"""
+        objetivo = llamadas * percentil
+        acumulado = 0
+        for i, cantidad in enumerate(tramos):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return TRAMOS_MS[i] if i < len(TRAMOS_MS) else None
+        return None
+
+    def estadisticas(self, orden: str = 'total_ms', limite: int = 20) -> Dict:
+        """
+        Huellas ordenadas por `orden` (uno de ORDENES) y consultas lentas más recientes primero.
+        Lanza ValueError si el orden no existe.
+        """
+        if orden not in ORDENES:
+            raise ValueError(f"Orden no válido: {orden}. Opciones: {', '.join(ORDENES)}")
+        with self._lock:
+            consultas = []
+            for huella, datos in self._huellas.items():
+                llamadas = datos['llamadas']
+                consultas.append({
+                    'consulta': huella,
+                    'llamadas': llamadas,
+                    'errores': datos['errores'],
+                    'filas': datos['filas'],
+                    'total_ms': round(datos['total_ms'], 2),
+                    'promedio_ms': round(datos['total_ms'] / llamadas, 3),
+                    'max_ms': round(datos['max_ms'], 2),
+                    'p95_ms_hasta': self._percentil(datos['tramos'], llamadas, 0.95),
+                    'lentas': datos['lentas'],
+                    'histograma': dict(zip(_ETIQUETAS_TRAMOS, datos['tramos']))
+                })
+            lentas = list(self._lentas)
+            desde = self._desde
+
+        consultas.sort(key=lambda c: c[orden], reverse=True)
+        return {
+            'desde': desde.isoformat(),
+            'umbral_lenta_ms': self.umbral_lenta_ms,
+            'huellas': len(consultas),
+            'llamadas': sum(c['llamadas'] for c in consultas),
+            'total_ms': round(sum(c['total_ms'] for c in consultas), 2),
+            'consultas': consultas[:limite],
+            'lentas': lentas[::-1]
+        }
+
+    def reiniciar(self):
+        with self._lock:
+            self._huellas.clear()
+            self._lentas.clear()
+            self._desde = datetime.now()
+
+
+# Registro compartido por todas las conexiones del proceso
+registro_consultas = RegistroConsultas()
+
+
+class _MixinCursorInstrumentado:
+    """Mide execute/executemany; execute_values pasa por execute una vez por página"""
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            resultado = super().execute(query, vars)
+        except Exception:
+            registro_consultas.registrar(query, vars, time.perf_counter() - inicio, 0, error=True)
+            raise
+        registro_consultas.registrar(query, vars, time.perf_counter() - inicio, self.rowcount)
+        return resultado
+
+    def executemany(self, query, vars_list):
+        inicio = time.perf_counter()
+        try:
+            resultado = super().executemany(query, vars_list)
+        except Exception:
+            registro_consultas.registrar(query, None, time.perf_counter() - inicio, 0, error=True)
+            raise
+        registro_consultas.registrar(query, None, time.perf_counter() - inicio, self.rowcount)
+        return resultado
+
+
+_clases_instrumentadas: Dict[type, type] = {}
+
+
+def cursor_instrumentado(clase_base=None) -> type:
+    """Subclase instrumentada de `clase_base` (cursor, RealDictCursor, ...), creada una vez por clase"""
+    clase_base = clase_base or extensions.cursor
+    clase = _clases_instrumentadas.get(clase_base)
+    if clase is None:
+        clase = type(f"{clase_base.__name__}Instrumentado", (_MixinCursorInstrumentado, clase_base), {})
+        _clases_instrumentadas[clase_base] = clase
+    return clase
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Retención y archivo de noticias por particiones mensuales
+Crea las particiones de los próximos meses y archiva las que superan la retención:
+las desvincula de noticias_usuario, las exporta a CSV comprimido (gzip) y las elimina.
+
+Ejecutar periódicamente (p.ej. cron mensual), fuera de los procesos de la API:
+
+    python retencion.py                    # retención por defecto (12 meses)
+    python retencion.py --meses 6          # conservar 6 meses
+    python retencion.py --simular          # solo mostrar qué se archivaría
+"""
+import gzip
+import os
+import re
+import sys
+from datetime import date
+from typing import Dict, List
+
+from database import Database
+
+DIRECTORIO_ARCHIVO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archivo_noticias')
+# Espera máxima por el lock de noticias_usuario al desvincular (se reintenta en la próxima ejecución)
+LOCK_TIMEOUT_DETACH = '5s'
+
+
+class RetencionNoticias:
+    def __init__(self, db: Database = None, directorio: str = DIRECTORIO_ARCHIVO):
+        self.db = db or Database()
+        self.directorio = directorio
+
+    def particiones_vencidas(self, meses_retencion: int) -> List[Dict]:
+        """Particiones mensuales cuyo mes terminó antes del inicio de la ventana de retención"""
+        limite = self.db._inicio_mes(date.today(), -meses_retencion)
+        vencidas = []
+        for particion in self.db.listar_particiones_noticias():
+            coincidencia = re.match(r'noticias_usuario_p(\d{4})_(\d{2})$', particion['nombre'])
+            if not coincidencia:
+                continue  # default u otras
+            inicio = date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1)
+            if self.db._inicio_mes(inicio, 1) <= limite:
+                particion['inicio'] = inicio
+                vencidas.append(particion)
+        return vencidas
+
+    def archivar_particion(self, nombre: str) -> Dict:
+        """
+        Desvincula una partición, la exporta a <directorio>/<nombre>.csv.gz (con los datos
+        del artículo) y la elimina, descontando sus filas de conteo_noticias y facetas_usuario.
+        El DETACH va en su propia transacción corta: bloquea noticias_usuario (ACCESS EXCLUSIVE)
+        solo mientras se desvincula, no durante la exportación. Si la exportación falla,
+        la partición se vuelve a adjuntar.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = os.path.join(self.directorio, f"{nombre}.csv.gz")
+
+        connection = self.db.get_connection()
+        if not connection:
+            return {'success': False, 'particion': nombre, 'error': 'Sin conexión'}
+
+        cursor = connection.cursor()
+
+        # 1) Desvincular. Sin CONCURRENTLY: PostgreSQL no lo admite con partición default.
+        # lock_timeout evita quedar en cola delante de las consultas de la API si hay una larga.
+        try:
+            cursor.execute("""
+                SELECT pg_get_expr(c.relpartbound, c.oid)
+                FROM pg_class c
+                WHERE c.oid = to_regclass(%s)
+            """, (nombre,))
+            limites = cursor.fetchone()[0]
+            cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT_DETACH}'")
+            cursor.execute(f"ALTER TABLE noticias_usuario DETACH PARTITION {nombre}")
+            connection.commit()
+        except Exception as e:
+            print(f"❌ Error desvinculando {nombre}: {e}")
+            connection.rollback()
+            cursor.close()
+            connection.close()
+            return {'success': False, 'particion': nombre, 'error': str(e)}
+
+        # 2) Exportar y eliminar la tabla, ya independiente: no bloquea noticias_usuario
+        try:
+            with gzip.open(ruta, 'wt', encoding='utf-8') as archivo:
+                cursor.copy_expert(f"""
+                    COPY (
+                        SELECT p.id, p.user_id, p.fuente_id, c.nombre AS categoria, pa.nombre AS pais, p.fecha_scraping,
+                               a.url, a.titulo, a.resumen, a.imagen_url, a.fecha_publicacion
+                        FROM {nombre} p
+                        JOIN articulos a ON a.id = p.articulo_id
+                        LEFT JOIN categorias c ON c.id = p.categoria_id
+                        LEFT JOIN paises pa ON pa.id = p.pais_id
+                        ORDER BY p.fecha_scraping, p.id
+                    ) TO STDOUT WITH CSV HEADER
+                """, archivo)
+
+            # Fuera de noticias_usuario los triggers de conteo no se disparan: descontar a mano
+            self.db._descontar_conteos(cursor, nombre)
+            cursor.execute(f"SELECT array_agg(DISTINCT articulo_id), COUNT(*) FROM {nombre}")
+            articulo_ids, filas = cursor.fetchone()
+            cursor.execute(f"DROP TABLE {nombre}")
+            articulos_borrados = self.db._purgar_articulos_huerfanos(cursor, articulo_ids or [])
+
+            connection.commit()
+            print(f"📦 {nombre}: {filas} noticias archivadas en {ruta} ({articulos_borrados} artículos purgados)")
+            return {
+                'success': True,
+                'particion': nombre,
+                'filas': filas,
+                'articulos_purgados': articulos_borrados,
+                'archivo': ruta
+            }
+        except Exception as e:
+            print(f"❌ Error archivando {nombre}: {e}")
+            connection.rollback()
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            # Los contadores no se tocaron: al volver a adjuntarla todo queda como antes
+            try:
+                cursor.execute(f"ALTER TABLE noticias_usuario ATTACH PARTITION {nombre} {limites}")
+                connection.commit()
+            except Exception as e_adjuntar:
+                connection.rollback()
+                print(f"⚠️ {nombre} quedó desvinculada ({limites}); adjúntala a mano: {e_adjuntar}")
+            return {'success': False, 'particion': nombre, 'error': str(e)}
+        finally:
+            cursor.close()
+            connection.close()
+
+    def ejecutar(self, meses_retencion: int = 12, meses_adelante: int = 3, simular: bool = False) -> Dict:
+        """Crea particiones futuras y archiva las vencidas"""
+        print(f"🔄 Retención de noticias: conservar {meses_retencion} meses")
+
+        creadas = [] if simular else self.db.asegurar_particiones_noticias(meses_adelante)
+        vencidas = self.particiones_vencidas(meses_retencion)
+
+        if not vencidas:
+            print("✅ No hay particiones para archivar")
+
+        resultados = []
+        for particion in vencidas:
+            if simular:
+                print(f"   • {particion['nombre']} (~{particion['filas_estimadas']} filas, {particion['bytes'] // 1024} KB)")
+                continue
+            resultados.append(self.archivar_particion(particion['nombre']))
+
+        return {
+            'particiones_creadas': creadas,
+            'particiones_vencidas': [p['nombre'] for p in vencidas],
+            'archivadas': resultados
+        }
+
+
+if __name__ == '__main__':
+    meses = 12
+    if '--meses' in sys.argv:
+        meses = int(sys.argv[sys.argv.index('--meses') + 1])
+    resultado = RetencionNoticias().ejecutar(meses_retencion=meses, simular='--simular' in sys.argv)
+    sys.exit(0 if all(r['success'] for r in resultado['archivadas']) else 1)
@@ -1,23 +1,47 @@
 import requests
 from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
+import hashlib
+import os
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from urllib.parse import urljoin, urlparse
+from cliente_http import cliente_http
+from cortesia_hosts import CortesiaHosts
 from database import Database
 
+# Plazo total (s) para descargar las páginas del scraping profundo de una fuente
+PLAZO_PROFUNDO = 60
+
 class NewsScraper:
-    def __init__(self):
-        """Inicializa el scraper con la base de datos"""
+    def __init__(self, max_paralelo: Optional[int] = None, profundo_paralelo: Optional[bool] = None):
+        """
+        Inicializa el scraper con la base de datos
+        
+        Args:
+            max_paralelo: Fuentes scrapeadas a la vez en scrape_todas_fuentes
+                          (por defecto SCRAPING_PARALELO o 4; 1 = secuencial)
+            profundo_paralelo: Descargar en paralelo las páginas del scraping profundo
+                               (por defecto SCRAPING_PROFUNDO_PARALELO, activado salvo '0';
+                               False = una por una con pausa de 0.3 s)
+        """
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         self.db = Database()
+        self.max_paralelo = max_paralelo or int(os.getenv('SCRAPING_PARALELO', '4'))
+        if profundo_paralelo is None:
+            profundo_paralelo = os.getenv('SCRAPING_PROFUNDO_PARALELO', '1') != '0'
+        self.profundo_paralelo = profundo_paralelo
+        # Pausa entre peticiones a la portada de un mismo host (antes era global entre fuentes);
+        # el tope de descargas simultáneas por host lo pone cliente_http
+        self.cortesia = CortesiaHosts(intervalo=2.0)
         
-        # Crear tablas si no existen
+        # Solo se verifica la versión del esquema; las migraciones se aplican con migrar_bd.py
         print("📊 Verificando base de datos...")
-        self.db.crear_tablas()
+        self.db.verificar_esquema()
         
         # Nota: Ya no agregamos fuentes de ejemplo automáticamente
         # Cada usuario debe agregar sus propias fuentes
@@ -76,13 +100,17 @@ class NewsScraper:
     
     # ==================== SCRAPING PROFUNDO ====================
     
-    def _scrapear_pagina_individual(self, url: str, titulo_parcial: str = None) -> Dict:
+    def _scrapear_pagina_individual(self, url: str, titulo_parcial: str = None, response=None) -> Dict:
         """
         Hace scraping profundo de una página individual de noticia
         Retorna un dict con titulo, resumen, imagen_url, fecha_publicacion
+        `response`: la página ya descargada (o el error) de cliente_http.get_varios; si no, se descarga
         """
         try:
-            response = requests.get(url, headers=self.headers, timeout=15)
+            if response is None:
+                response = cliente_http.get(url, headers=self.headers, timeout=15)
+            elif isinstance(response, Exception):
+                raise response
             response.raise_for_status()
             soup = BeautifulSoup(response.content, 'html.parser')
             
@@ -358,18 +386,109 @@ class NewsScraper:
     
     # ==================== SCRAPING ====================
     
+    def _aplicar_datos_profundos(self, noticia: Dict, datos_profundos: Dict):
+        """Completa la noticia con los datos del scraping profundo que sean mejores"""
+        titulo = noticia['titulo']
+        resumen = noticia['resumen']
+        
+        if datos_profundos.get('titulo') and (not titulo or titulo == "Sin título" or len(titulo) < 5):
+            noticia['titulo'] = datos_profundos['titulo']
+            print(f"         ✓ Título obtenido del scraping profundo")
+        
+        if datos_profundos.get('imagen_url') and not noticia['imagen_url']:
+            noticia['imagen_url'] = datos_profundos['imagen_url']
+            print(f"         ✓ Imagen obtenida del scraping profundo")
+        
+        if datos_profundos.get('resumen') and (not resumen or resumen == "Sin resumen" or len(resumen) < 20):
+            noticia['resumen'] = datos_profundos['resumen']
+            print(f"         ✓ Resumen obtenido del scraping profundo: {noticia['resumen'][:50]}...")
+        
+        if datos_profundos.get('fecha_publicacion'):
+            noticia['fecha_publicacion'] = datos_profundos['fecha_publicacion']
+            print(f"         ✓ Fecha obtenida del scraping profundo")
+    
+    def _enriquecer_noticias(self, pendientes: List[Dict]):
+        """
+        Segunda etapa del scraping: completa las noticias a las que les faltan datos.
+        Primero reutiliza los artículos ya guardados en la base compartida; el resto de páginas
+        se descarga a la vez con cliente_http (self.profundo_paralelo) o una por una con una pausa.
+        """
+        # Si otro usuario ya guardó el artículo, se reutiliza sin volver a descargarlo
+        guardados = self.db.obtener_articulos_por_urls([noticia['url'] for noticia in pendientes])
+        por_descargar = []
+        for noticia in pendientes:
+            datos_profundos = guardados.get(noticia['url'])
+            if datos_profundos:
+                print(f"      ♻️ Artículo ya en la base compartida, se omite el scraping profundo: {noticia['url'][:60]}...")
+                self._aplicar_datos_profundos(noticia, datos_profundos)
+            else:
+                por_descargar.append(noticia)
+        
+        if not por_descargar:
+            return
+        
+        if not self.profundo_paralelo:
+            for noticia in por_descargar:
+                print(f"      🔍 Datos incompletos, haciendo scraping profundo de: {noticia['url'][:60]}...")
+                self._aplicar_datos_profundos(noticia, self._scrapear_pagina_individual(
+                    noticia['url'],
+                    noticia['titulo'] if noticia['titulo'] and noticia['titulo'] != "Sin título" else None
+                ))
+                # Pequeña pausa para no sobrecargar el servidor
+                time.sleep(0.3)
+            return
+        
+        print(f"      🔍 Scraping profundo en paralelo de {len(por_descargar)} páginas...")
+        respuestas = cliente_http.get_varios(
+            [noticia['url'] for noticia in por_descargar],
+            headers=self.headers,
+            timeout=15,
+            plazo_total=PLAZO_PROFUNDO
+        )
+        for noticia, respuesta in zip(por_descargar, respuestas):
+            titulo = noticia['titulo']
+            self._aplicar_datos_profundos(noticia, self._scrapear_pagina_individual(
+                noticia['url'],
+                titulo if titulo and titulo != "Sin título" else None,
+                response=respuesta
+            ))
+    
     def scrape_fuente(self, fuente: Dict, limite: int = 5, guardar: bool = True, user_id: Optional[int] = None) -> List[Dict]:
-        """Scrapea noticias de una fuente específica"""
-        # Guardar user_id temporalmente para usar en guardar_noticia
-        self._current_user_id = user_id
+        """
+        Scrapea noticias de una fuente específica (thread-safe: no guarda estado en la instancia)
+        Con guardar=True la portada se pide condicional (If-None-Match / If-Modified-Since): si no
+        cambió desde el último guardado (304 o mismo hash del cuerpo) se retorna [] sin parsear.
+        """
         noticias = []
+        pendientes = []   # Noticias con datos incompletos, para el scraping profundo
+        por_guardar = []  # Se guardan en lote al terminar la fuente
         
         print(f"🔍 Scrapeando: {fuente['nombre']}")
         
         try:
-            response = requests.get(fuente['url'], headers=self.headers, timeout=15)
+            # Con un límite mayor que el del último guardado la portada sí puede aportar noticias nuevas
+            validadores = self.db.obtener_validadores_fuente(fuente['id']) if guardar else None
+            if validadores and limite > validadores['limite']:
+                validadores = None
+            
+            headers = dict(self.headers)
+            if validadores and validadores['etag']:
+                headers['If-None-Match'] = validadores['etag']
+            if validadores and validadores['last_modified']:
+                headers['If-Modified-Since'] = validadores['last_modified']
+            
+            self.cortesia.esperar(fuente['url'])
+            response = cliente_http.get(fuente['url'], headers=headers, timeout=15)
+            if response.status_code == 304 and validadores:
+                print(f"⏭️  {fuente['nombre']}: portada sin cambios (304), se omite\n")
+                return noticias
             response.raise_for_status()
             
+            hash_contenido = hashlib.sha256(response.content).hexdigest()
+            if validadores and validadores['hash_contenido'] == hash_contenido:
+                print(f"⏭️  {fuente['nombre']}: portada idéntica a la última guardada, se omite\n")
+                return noticias
+            
             soup = BeautifulSoup(response.content, 'html.parser')
             contenedor = fuente['selector_contenedor']
             
@@ -844,8 +963,6 @@ class NewsScraper:
                                         break
                     
                     # <--- ¡MEJORADO! Siempre intentar scraping profundo si faltan datos críticos
-                    fecha_publicacion = None
-                    
                     # Determinar si necesitamos scraping profundo
                     necesita_scraping_profundo = (
                         (not titulo or titulo == "Sin título" or len(titulo) < 5) or
@@ -853,44 +970,6 @@ class NewsScraper:
                         (not resumen or resumen == "Sin resumen" or len(resumen) < 20)
                     )
                     
-                    # Hacer scraping profundo SIEMPRE que tengamos una URL válida y falten datos
-                    if necesita_scraping_profundo and url and url != fuente['url'] and url.startswith('http'):
-                        print(f"      🔍 Datos incompletos, haciendo scraping profundo de: {url[:60]}...")
-                        try:
-                            datos_profundos = self._scrapear_pagina_individual(url, titulo if titulo and titulo != "Sin título" else None)
-                            
-                            # Usar datos del scraping profundo si son mejores
-                            if datos_profundos.get('titulo') and (not titulo or titulo == "Sin título" or len(titulo) < 5):
-                                titulo = datos_profundos['titulo']
-                                print(f"         ✓ Título obtenido del scraping profundo")
-                            
-                            if datos_profundos.get('imagen_url') and not imagen_url:
-                                imagen_url = datos_profundos['imagen_url']
-                                print(f"         ✓ Imagen obtenida del scraping profundo")
-                            
-                            if datos_profundos.get('resumen') and (not resumen or resumen == "Sin resumen" or len(resumen) < 20):
-                                resumen = datos_profundos['resumen']
-                                print(f"         ✓ Resumen obtenido del scraping profundo: {resumen[:50]}...")
-                            
-                            if datos_profundos.get('fecha_publicacion'):
-                                fecha_publicacion = datos_profundos['fecha_publicacion']
-                                print(f"         ✓ Fecha obtenida del scraping profundo")
-                            
-                            # Pequeña pausa para no sobrecargar el servidor
-                            time.sleep(0.3)
-                        except Exception as e:
-                            print(f"         ⚠️ Error en scraping profundo: {e}")
-                    
-                    # Si aún no hay título válido, usar fallback
-                    if not titulo or titulo == "Sin título" or len(titulo) < 3:
-                        titulo = "Sin título"
-                    
-                    # Si aún no hay resumen válido, usar fallback
-                    if not resumen or resumen == "Sin resumen" or len(resumen) < 5:
-                        resumen = "Sin resumen"
-                    else:
-                        resumen = resumen[:500] if len(resumen) > 500 else resumen
-                    
                     # Detectar país de la fuente
                     pais = self._detectar_pais(fuente['url'])
                     
@@ -901,26 +980,17 @@ class NewsScraper:
                         'imagen_url': imagen_url,
                         'categoria': categoria,
                         'pais': pais,
-                        'fecha_publicacion': fecha_publicacion,
+                        'fecha_publicacion': None,
                         'fuente': fuente['nombre'],
                         'fuente_id': fuente['id']
                     }
                     
-                    if guardar:
-                        # user_id debe ser pasado desde el endpoint
-                        # Por ahora, si no hay user_id, no guardamos (o lanzamos error)
-                        if not hasattr(self, '_current_user_id'):
-                            print(f"   ⚠️ No hay user_id configurado, saltando guardado")
-                        else:
-                            noticia_id = self.db.guardar_noticia(noticia, self._current_user_id)
-                            if noticia_id:
-                                noticia['id'] = noticia_id
+                    # El scraping profundo (SIEMPRE que haya una URL válida y falten datos) se hace
+                    # después, para todas las noticias de la fuente a la vez
+                    if necesita_scraping_profundo and url and url != fuente['url'] and url.startswith('http'):
+                        pendientes.append(noticia)
                     
                     noticias.append(noticia)
-                    imagen_info = f" [Imagen: {'✓' if imagen_url else '✗'}]"
-                    categoria_info = f" [Categoría: {categoria or 'N/A'}]"
-                    fecha_info = f" [Fecha: {'✓' if fecha_publicacion else '✗'}]"
-                    print(f"   ✓ Artículo {idx}: {titulo[:50]}...{imagen_info}{categoria_info}{fecha_info}")
                     
                 except Exception as e:
                     print(f"   ✗ Error procesando artículo {idx}: {e}")
@@ -928,6 +998,48 @@ class NewsScraper:
                     traceback.print_exc()
                     continue
             
+            if pendientes:
+                self._enriquecer_noticias(pendientes)
+            
+            for idx, noticia in enumerate(noticias, 1):
+                # Si aún no hay título válido, usar fallback
+                titulo = noticia['titulo']
+                if not titulo or titulo == "Sin título" or len(titulo) < 3:
+                    noticia['titulo'] = "Sin título"
+                
+                # Si aún no hay resumen válido, usar fallback
+                resumen = noticia['resumen']
+                if not resumen or resumen == "Sin resumen" or len(resumen) < 5:
+                    noticia['resumen'] = "Sin resumen"
+                else:
+                    noticia['resumen'] = resumen[:500]
+                
+                if guardar:
+                    por_guardar.append(noticia)
+                
+                imagen_info = f" [Imagen: {'✓' if noticia['imagen_url'] else '✗'}]"
+                categoria_info = f" [Categoría: {noticia['categoria'] or 'N/A'}]"
+                fecha_info = f" [Fecha: {'✓' if noticia['fecha_publicacion'] else '✗'}]"
+                print(f"   ✓ Artículo {idx}: {noticia['titulo'][:50]}...{imagen_info}{categoria_info}{fecha_info}")
+            
+            if por_guardar:
+                resultado = self.db.guardar_noticias_lote(por_guardar, user_id)
+                for noticia, noticia_id, estado in zip(por_guardar, resultado['ids'], resultado['estados']):
+                    if noticia_id:
+                        noticia['id'] = noticia_id
+                        noticia['estado_guardado'] = estado
+                print(f"   💾 Lote guardado: {resultado['insertadas']} nuevas, {resultado['actualizadas']} actualizadas, "
+                      f"{resultado['sin_cambios']} sin cambios, {resultado['errores']} errores")
+                # Solo una portada guardada completa se puede saltar la próxima vez
+                if not resultado['errores'] and len(noticias) == len(articulos):
+                    self.db.guardar_validadores_fuente(
+                        fuente['id'],
+                        response.headers.get('ETag'),
+                        response.headers.get('Last-Modified'),
+                        hash_contenido,
+                        limite
+                    )
+            
             print(f"✅ {fuente['nombre']}: {len(noticias)} noticias obtenidas\n")
             
         except requests.exceptions.Timeout:
@@ -939,10 +1051,19 @@ class NewsScraper:
         
         return noticias
     
-    def scrape_todas_fuentes(self, limite: int = 5, guardar: bool = True, solo_activas: bool = True, user_id: Optional[int] = None) -> List[Dict]:
-        """Scrapea todas las fuentes activas"""
-        # Guardar user_id temporalmente para usar en guardar_noticia
-        self._current_user_id = user_id
+    def scrape_todas_fuentes(
+        self,
+        limite: int = 5,
+        guardar: bool = True,
+        solo_activas: bool = True,
+        user_id: Optional[int] = None,
+        max_paralelo: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Scrapea todas las fuentes activas, hasta `max_paralelo` a la vez (por defecto self.max_paralelo).
+        La cortesía es por host, así que fuentes de sitios distintos no se esperan entre sí;
+        las noticias se juntan a medida que termina cada fuente.
+        """
         print("\n" + "="*60)
         print("🚀 INICIANDO SCRAPING DE NOTICIAS")
         print("="*60 + "\n")
@@ -962,15 +1083,28 @@ class NewsScraper:
             print(f"⚠️ No hay fuentes disponibles para el usuario {user_id}")
             return []
         
-        print(f"📋 Total de fuentes a scrapear: {len(fuentes)}\n")
+        hilos = max(1, min(max_paralelo or self.max_paralelo, len(fuentes)))
+        print(f"📋 Total de fuentes a scrapear: {len(fuentes)} ({hilos} en paralelo)\n")
         
-        for idx, fuente in enumerate(fuentes, 1):
-            print(f"[{idx}/{len(fuentes)}] ", end="")
-            noticias = self.scrape_fuente(fuente, limite, guardar, user_id)
-            todas.extend(noticias)
-            
-            if idx < len(fuentes):
-                time.sleep(2)
+        if hilos == 1:
+            for idx, fuente in enumerate(fuentes, 1):
+                print(f"[{idx}/{len(fuentes)}] ", end="")
+                todas.extend(self.scrape_fuente(fuente, limite, guardar, user_id))
+        else:
+            with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='scraping') as executor:
+                futuros = {
+                    executor.submit(self.scrape_fuente, fuente, limite, guardar, user_id): fuente
+                    for fuente in fuentes
+                }
+                for idx, futuro in enumerate(as_completed(futuros), 1):
+                    fuente = futuros[futuro]
+                    try:
+                        noticias = futuro.result()
+                    except Exception as e:
+                        print(f"❌ Error inesperado en {fuente['nombre']}: {e}")
+                        noticias = []
+                    todas.extend(noticias)
+                    print(f"[{idx}/{len(fuentes)}] {fuente['nombre']}: {len(noticias)} noticias")
         
         print("="*60)
         print(f"✅ SCRAPING COMPLETADO: {len(todas)} noticias totales")
@@ -988,10 +1122,24 @@ class NewsScraper:
         categoria: Optional[str] = None,
         pais: Optional[str] = None,
         user_id: Optional[int] = None,
-        es_admin: bool = False
+        es_admin: bool = False,
+        conteo: str = 'exacto'
     ):
         """Obtiene noticias guardadas en la BD. Retorna (noticias, total)"""
-        return self.db.obtener_noticias(limite, offset, fuente_id, categoria, pais, user_id, es_admin)
+        return self.db.obtener_noticias(limite, offset, fuente_id, categoria, pais, user_id, es_admin, conteo)
+    
+    def obtener_noticias_por_cursor(
+        self,
+        limite: int = 50,
+        cursor: Optional[str] = None,
+        fuente_id: Optional[int] = None,
+        categoria: Optional[str] = None,
+        pais: Optional[str] = None,
+        user_id: Optional[int] = None,
+        es_admin: bool = False
+    ):
+        """Obtiene noticias guardadas con paginación por cursor. Retorna (noticias, siguiente_cursor)"""
+        return self.db.obtener_noticias_por_cursor(limite, cursor, fuente_id, categoria, pais, user_id, es_admin)
     
     def contar_noticias(self, user_id: Optional[int] = None, es_admin: bool = False) -> int:
         """Cuenta el total de noticias guardadas (filtrado por usuario si no es admin)"""
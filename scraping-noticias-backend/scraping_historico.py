@@ -2,12 +2,12 @@
 Módulo INDEPENDIENTE para scraping histórico usando sitemaps XML
 VERSIÓN CORREGIDA - Manejo correcto de timezones
 """
-import requests
 import xml.etree.ElementTree as ET
 from urllib.parse import urljoin
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional
-import time
+from typing import List, Dict, Optional, Tuple
+
+from cliente_http import cliente_http
 
 class ScrapingHistorico:
     def __init__(self, db, scraper=None):
@@ -17,21 +17,72 @@ class ScrapingHistorico:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
     
-    def url_ya_existe(self, url: str) -> bool:
-        """Verifica si una URL ya está en la base de datos"""
-        connection = self.db.get_connection()
-        if not connection:
+    def url_ya_existe(self, url: str, user_id: Optional[int] = None) -> bool:
+        """Verifica si una URL ya está guardada (para el usuario si se indica, o por cualquiera)"""
+        articulo = self.db.obtener_articulo_por_url(url, user_id)
+        if not articulo:
             return False
+        return articulo['vinculado'] if user_id is not None else True
+    
+    def _parsear_sitemap(
+        self,
+        contenido: bytes,
+        fecha_desde: datetime = None,
+        fecha_hasta: datetime = None
+    ) -> Tuple[List[str], List[Dict]]:
+        """
+        Parsea un sitemap XML: retorna (sub-sitemaps si es un índice, URLs filtradas por fecha)
+        ✅ VERSIÓN CORREGIDA: Manejo correcto de timezones
+        """
+        root = ET.fromstring(contenido)
+        ns = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
         
-        cursor = connection.cursor()
-        try:
-            cursor.execute("SELECT id FROM noticias WHERE url = %s LIMIT 1", (url,))
-            return cursor.fetchone() is not None
-        except:
-            return False
-        finally:
-            cursor.close()
-            connection.close()
+        sub_sitemaps = []
+        urls = []
+        
+        # Verificar si es un índice de sitemaps
+        for sitemap in root.findall('ns:sitemap', ns):
+            loc = sitemap.find('ns:loc', ns)
+            if loc is not None:
+                sub_sitemaps.append(loc.text)
+        
+        # Buscar URLs individuales
+        for url_elem in root.findall('ns:url', ns):
+            loc = url_elem.find('ns:loc', ns)
+            lastmod = url_elem.find('ns:lastmod', ns)
+            
+            if loc is not None:
+                url_data = {'url': loc.text, 'lastmod': None}
+                
+                if lastmod is not None:
+                    try:
+                        # Parsear fecha y asegurar que tenga timezone
+                        fecha_str = lastmod.text.replace('Z', '+00:00')
+                        fecha_dt = datetime.fromisoformat(fecha_str)
+                        
+                        # ✅ Si no tiene timezone, agregar UTC
+                        if fecha_dt.tzinfo is None:
+                            fecha_dt = fecha_dt.replace(tzinfo=timezone.utc)
+                        
+                        url_data['lastmod'] = fecha_dt
+                    except:
+                        pass
+                
+                # ✅ FILTRO CON MANEJO CORRECTO DE TIMEZONES
+                if url_data['lastmod']:
+                    # Verificar fecha_desde
+                    if fecha_desde and url_data['lastmod'] < fecha_desde:
+                        continue
+                    
+                    # Verificar fecha_hasta
+                    if fecha_hasta and url_data['lastmod'] > fecha_hasta:
+                        continue
+                    
+                    urls.append(url_data)
+                elif not fecha_desde and not fecha_hasta:
+                    urls.append(url_data)
+        
+        return sub_sitemaps, urls
     
     def obtener_sitemap_urls(
         self, 
@@ -41,65 +92,31 @@ class ScrapingHistorico:
     ) -> List[Dict]:
         """
         Extrae URLs de un sitemap XML filtradas por fecha
-        ✅ VERSIÓN CORREGIDA: Manejo correcto de timezones
+        Si es un índice, sus sub-sitemaps se descargan a la vez (nivel por nivel)
         """
-        try:
-            response = requests.get(sitemap_url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            
-            root = ET.fromstring(response.content)
-            ns = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            
-            urls = []
-            
-            # Verificar si es un índice de sitemaps
-            for sitemap in root.findall('ns:sitemap', ns):
-                loc = sitemap.find('ns:loc', ns)
-                if loc is not None:
-                    sub_urls = self.obtener_sitemap_urls(loc.text, fecha_desde, fecha_hasta)
-                    urls.extend(sub_urls)
-            
-            # Buscar URLs individuales
-            for url_elem in root.findall('ns:url', ns):
-                loc = url_elem.find('ns:loc', ns)
-                lastmod = url_elem.find('ns:lastmod', ns)
-                
-                if loc is not None:
-                    url_data = {'url': loc.text, 'lastmod': None}
-                    
-                    if lastmod is not None:
-                        try:
-                            # Parsear fecha y asegurar que tenga timezone
-                            fecha_str = lastmod.text.replace('Z', '+00:00')
-                            fecha_dt = datetime.fromisoformat(fecha_str)
-                            
-                            # ✅ Si no tiene timezone, agregar UTC
-                            if fecha_dt.tzinfo is None:
-                                fecha_dt = fecha_dt.replace(tzinfo=timezone.utc)
-                            
-                            url_data['lastmod'] = fecha_dt
-                        except:
-                            pass
-                    
-                    # ✅ FILTRO CON MANEJO CORRECTO DE TIMEZONES
-                    if url_data['lastmod']:
-                        # Verificar fecha_desde
-                        if fecha_desde and url_data['lastmod'] < fecha_desde:
-                            continue
-                        
-                        # Verificar fecha_hasta
-                        if fecha_hasta and url_data['lastmod'] > fecha_hasta:
-                            continue
-                        
-                        urls.append(url_data)
-                    elif not fecha_desde and not fecha_hasta:
-                        urls.append(url_data)
-            
-            return urls
+        urls = []
+        vistos = set()
+        pendientes = [sitemap_url]
+        
+        while pendientes:
+            pendientes = [url for url in dict.fromkeys(pendientes) if url not in vistos]
+            vistos.update(pendientes)
+            respuestas = cliente_http.get_varios(pendientes, headers=self.headers, timeout=30)
             
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
-            return []
+            siguientes = []
+            for respuesta in respuestas:
+                try:
+                    if isinstance(respuesta, Exception):
+                        raise respuesta
+                    respuesta.raise_for_status()
+                    sub_sitemaps, encontradas = self._parsear_sitemap(respuesta.content, fecha_desde, fecha_hasta)
+                    siguientes.extend(sub_sitemaps)
+                    urls.extend(encontradas)
+                except Exception as e:
+                    print(f"   ❌ Error: {e}")
+            pendientes = siguientes
+        
+        return urls
     
     def detectar_sitemap(self, url_base: str) -> Optional[str]:
         """Detecta la URL del sitemap de un sitio"""
@@ -109,18 +126,16 @@ class ScrapingHistorico:
             urljoin(url_base, '/news-sitemap.xml'),
         ]
         
-        for sitemap_url in posibles:
-            try:
-                response = requests.head(sitemap_url, headers=self.headers, timeout=5)
-                if response.status_code == 200:
-                    return sitemap_url
-            except:
-                continue
+        # Se consultan a la vez; gana el primero de la lista que exista
+        respuestas = cliente_http.get_varios(posibles, headers=self.headers, timeout=5, metodo='HEAD')
+        for sitemap_url, response in zip(posibles, respuestas):
+            if not isinstance(response, Exception) and response.status_code == 200:
+                return sitemap_url
         
         # Buscar en robots.txt
         try:
             robots_url = urljoin(url_base, '/robots.txt')
-            response = requests.get(robots_url, headers=self.headers, timeout=5)
+            response = cliente_http.get(robots_url, headers=self.headers, timeout=5)
             if response.status_code == 200:
                 for line in response.text.split('\n'):
                     if line.lower().startswith('sitemap:'):
@@ -136,11 +151,13 @@ class ScrapingHistorico:
         dias_desde: int = 15,
         dias_hasta: int = 3,
         limite_urls: int = 500,
-        user_id: int = None
+        user_id: int = None,
+        tamano_lote: int = 50
     ) -> Dict:
         """
         Scrapea noticias HISTÓRICAS de una fuente usando su sitemap
         ✅ VERSIÓN CORREGIDA
+        Las noticias se guardan en lotes de `tamano_lote` (una transacción por lote)
         """
         print(f"\n{'='*70}")
         print(f"🕒 SCRAPING HISTÓRICO: {fuente['nombre']}")
@@ -185,69 +202,96 @@ class ScrapingHistorico:
             'ya_existian': 0,
             'scrapeadas': 0,
             'guardadas': 0,
+            'actualizadas': 0,
+            'sin_cambios': 0,
             'errores': 0
         }
         
         print(f"\n   🚀 Iniciando scraping...")
         
-        # Procesar URLs
-        for idx, url_data in enumerate(urls, 1):
+        lote = []
+        
+        def guardar_lote():
+            if not lote:
+                return
+            resultado = self.db.guardar_noticias_lote(lote, user_id)
+            stats['guardadas'] += resultado['insertadas']
+            stats['actualizadas'] += resultado['actualizadas']
+            stats['sin_cambios'] += resultado['sin_cambios']
+            stats['errores'] += resultado['errores']
+            lote.clear()
+        
+        # Procesar URLs por bloques: las páginas de cada bloque se descargan a la vez
+        for inicio in range(0, len(urls), tamano_lote):
+            bloque = urls[inicio:inicio + tamano_lote]
             try:
-                url = url_data['url']
-                
-                # Verificar duplicado
-                if self.url_ya_existe(url):
-                    stats['ya_existian'] += 1
-                    if idx % 50 == 0:
-                        print(f"   [{idx}/{len(urls)}] {stats['guardadas']} nuevas | {stats['ya_existian']} duplicadas")
-                    continue
+                # Verificar duplicado: el usuario ya la tiene
+                guardados = self.db.obtener_articulos_por_urls([url_data['url'] for url_data in bloque], user_id)
+                candidatas = []
+                for url_data in bloque:
+                    articulo = guardados.get(url_data['url'])
+                    if articulo and (articulo['vinculado'] or user_id is None):
+                        stats['ya_existian'] += 1
+                    else:
+                        candidatas.append((url_data, articulo))
                 
-                # Scrapear
+                # Descargar las que ningún usuario guardó todavía
+                respuestas = {}
                 if self.scraper:
-                    datos = self.scraper._scrapear_pagina_individual(url)
-                else:
-                    datos = {
-                        'titulo': url.split('/')[-1].replace('-', ' ').title(),
-                        'resumen': 'Noticia histórica',
-                        'imagen_url': None,
-                        'fecha_publicacion': url_data.get('lastmod')
-                    }
+                    por_descargar = [url_data['url'] for url_data, articulo in candidatas if not articulo]
+                    respuestas = dict(zip(por_descargar, cliente_http.get_varios(
+                        por_descargar, headers=self.headers, timeout=15
+                    )))
                 
-                if datos and datos.get('titulo'):
-                    stats['scrapeadas'] += 1
-                    
-                    noticia = {
-                        'titulo': datos['titulo'],
-                        'url': url,
-                        'resumen': datos.get('resumen', 'Sin resumen'),
-                        'imagen_url': datos.get('imagen_url'),
-                        'categoria': None,
-                        'fecha_publicacion': datos.get('fecha_publicacion') or url_data.get('lastmod'),
-                        'fuente': fuente['nombre'],
-                        'fuente_id': fuente['id']
-                    }
-                    
+                for url_data, articulo in candidatas:
                     try:
-                        noticia_id = self.db.guardar_noticia(noticia, user_id)
-                        if noticia_id:
-                            stats['guardadas'] += 1
-                    except Exception as e:
-                        if 'duplicate' in str(e).lower() or 'unique' in str(e).lower():
-                            stats['ya_existian'] += 1
+                        url = url_data['url']
+                        
+                        # Scrapear (o reutilizar el artículo si otro usuario ya lo guardó)
+                        if articulo:
+                            datos = articulo
+                        elif self.scraper:
+                            datos = self.scraper._scrapear_pagina_individual(url, response=respuestas[url])
                         else:
-                            stats['errores'] += 1
-                
-                if idx % 50 == 0:
-                    print(f"   [{idx}/{len(urls)}] ✅ {stats['guardadas']} nuevas | ⏭️  {stats['ya_existian']} duplicadas | ❌ {stats['errores']} errores")
+                            datos = {
+                                'titulo': url.split('/')[-1].replace('-', ' ').title(),
+                                'resumen': 'Noticia histórica',
+                                'imagen_url': None,
+                                'fecha_publicacion': url_data.get('lastmod')
+                            }
+                        
+                        if datos and datos.get('titulo'):
+                            stats['scrapeadas'] += 1
+                            
+                            noticia = {
+                                'titulo': datos['titulo'],
+                                'url': url,
+                                'resumen': datos.get('resumen', 'Sin resumen'),
+                                'imagen_url': datos.get('imagen_url'),
+                                'categoria': None,
+                                'fecha_publicacion': datos.get('fecha_publicacion') or url_data.get('lastmod'),
+                                'fuente': fuente['nombre'],
+                                'fuente_id': fuente['id']
+                            }
+                            lote.append(noticia)
+                    except Exception as e:
+                        print(f"   ⚠️ Error procesando {url_data['url'][:60]}: {e}")
+                        stats['errores'] += 1
+                        continue
                 
-                time.sleep(0.3)
+                guardar_lote()
+                print(f"   [{inicio + len(bloque)}/{len(urls)}] ✅ {stats['guardadas']} nuevas | ⏭️  {stats['ya_existian']} duplicadas | ❌ {stats['errores']} errores")
                 
             except KeyboardInterrupt:
                 print(f"\n   ⚠️ Interrumpido por el usuario")
                 break
             except Exception as e:
+                print(f"   ❌ Error en el bloque {inicio + 1}-{inicio + len(bloque)}: {e}")
                 stats['errores'] += 1
-                continue
+                lote.clear()
+        
+        # Guardar lo que quedó pendiente
+        guardar_lote()
         
         # Resumen
         print(f"\n   {'='*66}")
@@ -255,6 +299,7 @@ class ScrapingHistorico:
         print(f"   📊 Estadísticas:")
         print(f"      • URLs procesadas: {stats['total_urls']}")
         print(f"      • Noticias nuevas guardadas: {stats['guardadas']}")
+        print(f"      • Actualizadas: {stats['actualizadas']} | Sin cambios: {stats['sin_cambios']}")
         print(f"      • Ya existían: {stats['ya_existian']}")
         print(f"      • Errores: {stats['errores']}")
         print(f"   {'='*66}\n")
@@ -0,0 +1,145 @@
+"""
+Unidad de trabajo por petición
+Presta una única conexión del pool a todas las llamadas de datos de una petición Flask
+(Database, Estadisticas, BusquedaAvanzada, middleware...) y la devuelve en teardown_appcontext.
+
+Cada llamada sigue abriendo y cerrando "su" conexión como siempre; dentro de una petición
+ese close() solo cierra la transacción pendiente y la conexión física sigue prestada.
+Fuera de una petición (scripts, hilos en segundo plano) todo va directo al pool.
+"""
+from typing import Dict, Optional
+
+from psycopg2 import extensions
+
+try:
+    from flask import current_app, g, has_app_context
+except ImportError:  # scripts sin Flask instalado
+    has_app_context = lambda: False
+
+CLAVE_EXTENSION = 'unidad_trabajo'
+
+
+class ConexionPrestada:
+    """
+    Conexión de la unidad de trabajo para una llamada.
+    close() deja la conexión como la dejaría el pool (sin transacción abierta ni autocommit)
+    pero no la devuelve: la reutiliza la siguiente llamada de la misma petición.
+    """
+
+    def __init__(self, unidad: 'UnidadTrabajo', conexion):
+        object.__setattr__(self, '_unidad', unidad)
+        object.__setattr__(self, '_conexion', conexion)
+        object.__setattr__(self, '_liberada', False)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._conexion, nombre, valor)
+
+    @property
+    def closed(self):
+        return self._liberada or self._conexion.closed
+
+    def close(self):
+        if self._liberada:
+            return
+        object.__setattr__(self, '_liberada', True)
+        self._unidad.devolver(self._conexion)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class UnidadTrabajo:
+    """
+    Conexión del pool compartida por las llamadas secuenciales de una petición.
+    Si se pide una conexión mientras otra llamada aún tiene la suya (p.ej. un método
+    que llama a otro), la anidada se atiende directamente desde el pool.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._conexion = None
+        self._en_uso = False
+        self.prestamos = 0
+        self.anidadas = 0
+
+    def prestar(self) -> Optional[ConexionPrestada]:
+        """Retorna la conexión de la petición, o None si ya está en uso"""
+        if self._en_uso:
+            self.anidadas += 1
+            return None
+        if self._conexion is None or self._conexion.closed:
+            self._conexion = self.pool.obtener()
+        self._en_uso = True
+        self.prestamos += 1
+        return ConexionPrestada(self, self._conexion)
+
+    def devolver(self, conexion):
+        """Fin de una llamada: cerrar la transacción que haya quedado abierta"""
+        self._en_uso = False
+        try:
+            if conexion.closed:
+                return
+            if conexion.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conexion.rollback()
+            if conexion.autocommit:
+                conexion.autocommit = False
+        except Exception:
+            # Conexión inutilizable: que el pool la descarte y la próxima llamada pida otra
+            self.soltar(forzar=True)
+
+    def soltar(self, forzar: bool = False):
+        """Devuelve la conexión física al pool (la siguiente llamada pedirá otra)"""
+        if self._conexion is None or (self._en_uso and not forzar):
+            return
+        conexion, self._conexion = self._conexion, None
+        self._en_uso = False
+        conexion.close()
+
+
+def _unidades() -> Optional[Dict[int, UnidadTrabajo]]:
+    if not has_app_context() or CLAVE_EXTENSION not in current_app.extensions:
+        return None
+    if 'unidades_trabajo' not in g:
+        g.unidades_trabajo = {}
+    return g.unidades_trabajo
+
+
+def conexion_peticion(pool) -> Optional[ConexionPrestada]:
+    """
+    Conexión de la unidad de trabajo de la petición actual para `pool`.
+    None fuera de una petición, si la app no registró la unidad de trabajo o si ya está en uso.
+    """
+    unidades = _unidades()
+    if unidades is None:
+        return None
+    unidad = unidades.get(id(pool))
+    if unidad is None:
+        unidad = unidades[id(pool)] = UnidadTrabajo(pool)
+    return unidad.prestar()
+
+
+def soltar_conexion_peticion():
+    """
+    Devuelve ya al pool las conexiones de la petición actual.
+    Para handlers que, tras leer la BD, pasan mucho tiempo en otra cosa (p.ej. HTTP al scrapear):
+    así no retienen una conexión ociosa; si vuelven a consultar, se presta otra.
+    """
+    for unidad in (_unidades() or {}).values():
+        unidad.soltar()
+
+
+def registrar_unidad_trabajo(app):
+    """Activa la unidad de trabajo por petición en `app`"""
+    app.extensions[CLAVE_EXTENSION] = True
+
+    @app.teardown_appcontext
+    def _liberar_unidades_trabajo(excepcion=None):
+        for unidad in g.pop('unidades_trabajo', {}).values():
+            unidad.soltar(forzar=True)
@@ -79,18 +79,17 @@ def verificar_y_corregir():
                     print("✅ Usuarios actualizados")
         
         # Verificar estructura de la tabla
-        cursor.execute("""
+        connection.commit()
+        columnas = db.iterar_consulta("""
             SELECT column_name, data_type, column_default
             FROM information_schema.columns
             WHERE table_name = 'usuarios'
             ORDER BY ordinal_position
-        """)
-        columnas = cursor.fetchall()
+        """, como_dict=False)
         print("\n📋 Estructura de la tabla 'usuarios':")
         for col in columnas:
             print(f"   - {col[0]}: {col[1]} (default: {col[2]})")
-        
-        connection.commit()
+
         print("\n✅ Verificación completada")
         return True
         